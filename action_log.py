@@ -0,0 +1,268 @@
+# action_log.py
+import os
+import struct
+import sys
+import time
+
+"""
+Journal d'actions compact d'une partie, et rejeu sans affichage.
+
+Une partie est entièrement déterminée par sa graine et la suite de ses
+actions : le journal ne contient que cela, plus le hash de l'état final
+(engine.state_hash) pour vérifier le rejeu.
+
+Format (entiers en varint LEB128 : 1 octet en dessous de 128) :
+    b"BPL1" | graine | options | entrées... | FINISH nb_actions checksum(8 octets, LE)
+
+Entrées :
+- 0..15         action élémentaire (engine.py, MOVE_N ... CANCEL), via apply_action
+- TRAVEL r c    engine.travel_to(r, c) (clic sur une salle)
+- UNDO / REDO   mode entraînement (options & OPT_HISTORY : historique actif)
+- FINISH        fin de partie ; absent si la partie a été quittée en cours
+                (le journal se rejoue alors sans vérification)
+
+Une action a donc 1 octet, un trajet 3. Le rejeu (replay) relance la partie
+avec GameEngine.new_game(graine) et réapplique les entrées à la suite,
+sans pygame ni pause.
+
+    python action_log.py --games 500            # enregistre + rejoue (vérification)
+    python action_log.py replays/ --workers 4   # rejoue un corpus de fichiers .bpl
+"""
+
+MAGIC = b"BPL1"
+LOG_SUFFIX = ".bpl"
+
+# Codes d'entrée après les actions élémentaires (engine.NUM_ACTIONS = 16)
+TRAVEL = 16
+UNDO = 17
+REDO = 18
+FINISH = 19
+
+OPT_HISTORY = 1
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError(f"varint négatif : {value}")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, i: int) -> tuple[int, int]:
+    """(valeur, position suivante) du varint commençant en data[i]."""
+    byte = data[i]
+    if byte < 0x80:
+        return byte, i + 1
+    value, shift = 0, 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+
+class ActionLog:
+    """Graine + entrées encodées au fil de la partie (voir GameEngine.enable_action_log)."""
+
+    __slots__ = ("seed", "options", "entries", "count", "checksum")
+
+    def __init__(self, seed: int, options: int = 0):
+        self.seed = seed
+        self.options = options
+        self.entries = bytearray()
+        self.count = 0                      # actions enregistrées
+        self.checksum: int | None = None    # hash de l'état final (finish)
+
+    def append(self, code: int, *args: int) -> None:
+        entries = self.entries
+        entries.append(code)
+        for value in args:
+            write_varint(entries, value)
+        self.count += 1
+
+    def finish(self, engine) -> None:
+        """Clôt le journal sur l'état final de engine."""
+        self.checksum = engine.state_hash()
+
+    def encode(self) -> bytes:
+        out = bytearray(MAGIC)
+        write_varint(out, self.seed)
+        write_varint(out, self.options)
+        out += self.entries
+        if self.checksum is not None:
+            out.append(FINISH)
+            write_varint(out, self.count)
+            out += struct.pack("<Q", self.checksum)
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "ActionLog":
+        if data[:4] != MAGIC:
+            raise ValueError("pas un journal d'actions (en-tête BPL1 absent)")
+        seed, i = read_varint(data, 4)
+        options, i = read_varint(data, i)
+        log = cls(seed, options)
+
+        # Parcours des entrées seulement pour trouver FINISH (les arguments
+        # de TRAVEL sont < 128 en pratique mais restent des varints)
+        start, n = i, len(data)
+        count = 0
+        while i < n:
+            code = data[i]
+            if code == FINISH:
+                log.entries = bytearray(data[start:i])
+                total, j = read_varint(data, i + 1)
+                if total != count or j + 8 != n:
+                    raise ValueError("journal d'actions corrompu (fin)")
+                log.checksum = struct.unpack_from("<Q", data, j)[0]
+                log.count = count
+                return log
+            i += 1
+            if code == TRAVEL:
+                _, i = read_varint(data, i)
+                _, i = read_varint(data, i)
+            elif code > FINISH:
+                raise ValueError(f"entrée inconnue {code} à l'octet {i - 1}")
+            count += 1
+
+        log.entries = bytearray(data[start:])
+        log.count = count
+        return log
+
+
+# ---------- Rejeu ----------
+
+def replay(log: ActionLog):
+    """Rejoue log depuis sa graine ; retourne la partie dans son état final."""
+    engine = start(log)
+    data = log.entries
+    i, n = 0, len(data)
+    while i < n:
+        i = step(engine, data, i)
+    return engine
+
+
+def start(log: ActionLog):
+    """Partie au début du journal (avant la première entrée)."""
+    from engine import GameEngine
+
+    engine = GameEngine.new_game(log.seed)
+    if log.options & OPT_HISTORY:
+        engine.enable_history()
+    return engine
+
+
+def step(engine, data, i: int) -> int:
+    """Applique l'entrée qui commence en data[i] ; retourne la position de la suivante."""
+    code = data[i]
+    i += 1
+    if code < TRAVEL:
+        engine.apply_action(code)
+    elif code == TRAVEL:
+        r, i = read_varint(data, i)
+        c, i = read_varint(data, i)
+        engine.travel_to(r, c)
+    elif code == UNDO:
+        engine.undo()
+    elif code == REDO:
+        engine.redo()
+    else:
+        raise ValueError(f"entrée inconnue {code} à l'octet {i - 1}")
+    return i
+
+
+def verify(data: bytes) -> tuple[bool | None, int]:
+    """
+    Rejoue un journal encodé. Retourne (checksum correct, nombre d'actions) ;
+    None au lieu d'un booléen si le journal n'a pas de fin (partie quittée).
+    """
+    log = ActionLog.decode(data)
+    engine = replay(log)
+    if log.checksum is None:
+        return None, log.count
+    return engine.state_hash() == log.checksum, log.count
+
+
+def _verify_file(path: str) -> tuple[str, bool | None, int]:
+    with open(path, "rb") as f:
+        ok, count = verify(f.read())
+    return path, ok, count
+
+
+def record_game(seed: int, policy=None, max_actions: int = 2000) -> bytes:
+    """Partie jouée par un bot (hasard par défaut), enregistrée et encodée."""
+    from engine import GameEngine
+    from bots import RandomPolicy, play_game
+
+    engine = GameEngine.new_game(seed)
+    engine.enable_action_log(seed)
+    play_game(engine, policy or RandomPolicy(seed), max_actions)
+    engine.action_log.finish(engine)
+    return engine.action_log.encode()
+
+
+def _log_paths(paths: list[str]) -> list[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.endswith(LOG_SUFFIX))
+        else:
+            found.append(path)
+    return found
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rejeu de journaux d'actions (.bpl).")
+    parser.add_argument("paths", nargs="*", help="fichiers .bpl ou dossiers à rejouer")
+    parser.add_argument("--games", type=int, default=200,
+                        help="sans fichier : parties au hasard enregistrées puis rejouées")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="dossier où écrire les journaux enregistrés")
+    parser.add_argument("--workers", type=int, default=1, help="processus de rejeu")
+    args = parser.parse_args(argv)
+
+    if args.paths:
+        paths = _log_paths(args.paths)
+        t0 = time.perf_counter()
+        if args.workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(args.workers) as pool:
+                results = list(pool.map(_verify_file, paths, chunksize=16))
+        else:
+            results = [_verify_file(path) for path in paths]
+        elapsed = time.perf_counter() - t0
+    else:
+        logs = [record_game(seed) for seed in range(args.seed, args.seed + args.games)]
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            for seed, data in zip(range(args.seed, args.seed + args.games), logs):
+                with open(os.path.join(args.out, f"game_{seed}{LOG_SUFFIX}"), "wb") as f:
+                    f.write(data)
+        size = sum(len(data) for data in logs)
+        t0 = time.perf_counter()
+        results = [(f"graine {seed}", *verify(data))
+                   for seed, data in zip(range(args.seed, args.seed + args.games), logs)]
+        elapsed = time.perf_counter() - t0
+        print(f"{len(logs)} journaux, {size} octets "
+              f"({size / max(1, sum(count for _, _, count in results)):.2f} octet par action)")
+
+    failures = [name for name, ok, _ in results if ok is False]
+    unchecked = sum(ok is None for _, ok, _ in results)
+    actions = sum(count for _, _, count in results)
+    for name in failures:
+        print(f"{name} : état final différent du checksum")
+    print(f"Rejeu : {len(results) - len(failures) - unchecked}/{len(results)} parties vérifiées"
+          f"{f', {unchecked} sans fin' if unchecked else ''} ; {actions} actions en {elapsed:.2f} s "
+          f"({actions / max(elapsed, 1e-9):,.0f} actions/s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
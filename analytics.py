@@ -0,0 +1,441 @@
+# analytics.py
+import os
+import struct
+import sys
+import time
+from array import array
+
+import numpy as np
+
+import snapshot
+from manoir import DIR_VECTORS
+from metrics import ANALYTICS_EVENTS, ANALYTICS_FLUSH_LATENCY
+
+"""
+Événements de partie pour l'analyse hors ligne, en colonnes NumPy.
+
+Le moteur signale (voir GameEngine.enable_analytics) : salles proposées,
+salle choisie et son coût, porte ouverte et son niveau, résultat d'une
+fouille, achat en boutique, fin de partie (victoire ou cause de lose()).
+Chaque événement est une ligne de COLUMNS ; les lignes s'accumulent en
+mémoire (une liste, quelques µs par événement) et sont écrites par lots de
+batch_events.
+
+Sur disque, un dossier par tranche (shard_000001, ...) et un fichier .npy
+par colonne. Les fichiers de la tranche ouverte sont complétés à chaque
+lot : données ajoutées en fin de fichier, puis en-tête réécrit avec le
+nouveau nombre de lignes (en-tête de taille fixe). Une tranche est fermée
+dès qu'elle atteint shard_events lignes ; une nouvelle session d'écriture
+commence toujours une nouvelle tranche. Les fichiers sont des .npy
+ordinaires : load_shards les ouvre en mmap_mode="r", sans copie, pour
+agréger des millions de parties avec NumPy.
+
+Colonnes (une ligne par événement) :
+    game     identifiant de partie (EventSink.game, unique dans le dossier)
+    kind     OFFERED, PICKED, DOOR, SEARCH, PURCHASE, END
+    steps    pas restants après l'événement
+    r, c     case (destination de la pose, départ de la porte, joueur)
+    room     modèle de salle de la case (indice + 1 dans snapshot.TEMPLATES, 0 : aucun)
+    value    OFFERED / PICKED : coût en gemmes ; DOOR : niveau (0-2) ;
+             PURCHASE : choix (1-4) ; END : indice dans END_CAUSES
+    detail   OFFERED / PICKED : rang de la carte ; DOOR : direction (DIRS) ;
+             SEARCH / PURCHASE : objet obtenu (ITEM_*), NONE sinon
+    d_steps, d_gold, d_gems, d_keys, d_dice
+             variation des ressources due à l'événement : SEARCH, PURCHASE ;
+             PICKED : la pose seule (-1 pas, -coût), sans l'effet d'entrée
+
+    python analytics.py --games 2000    # écriture, relecture et agrégats vérifiés
+"""
+
+OFFERED, PICKED, DOOR, SEARCH, PURCHASE, END = range(6)
+KINDS = ("offered", "picked", "door", "search", "purchase", "end")
+
+# (nom, message de lose()) ; l'indice est la valeur de l'événement END
+END_CAUSES = (
+    ("win", None),
+    ("no_steps", "Plus de pas !"),
+    ("no_path", "Le manoir est bloqué : plus aucun chemin possible."),
+    ("no_door", "Tu ne peux ouvrir aucune porte : le manoir est bloqué."),
+    ("no_room", "Le manoir est bloqué : plus aucune pièce ne peut être posée."),
+    ("blocked", "Le manoir est bloqué : plus aucune porte ouvrable ni nouvelle salle à poser."),
+    ("other", None),
+)
+_CAUSE_CODES = {message: i for i, (_, message) in enumerate(END_CAUSES) if message}
+CAUSE_OTHER = len(END_CAUSES) - 1
+
+# Objets obtenus : consommables (snapshot.CONSUMABLES), puis permanents
+ITEM_PERMANENT = 16     # + indice dans snapshot.PERMANENTS
+NONE = 0xFF
+
+DIRS = tuple(DIR_VECTORS)
+
+# (nom, type NumPy sur disque)
+COLUMNS = (
+    ("game", "<u4"),
+    ("kind", "u1"),
+    ("steps", "<i2"),
+    ("r", "u1"),
+    ("c", "u1"),
+    ("room", "u1"),
+    ("value", "<i2"),
+    ("detail", "u1"),
+    ("d_steps", "i1"),
+    ("d_gold", "i1"),
+    ("d_gems", "i1"),
+    ("d_keys", "i1"),
+    ("d_dice", "i1"),
+)
+
+BATCH_EVENTS = 1 << 16
+SHARD_EVENTS = 1 << 22
+SHARD_PREFIX = "shard_"
+
+# En-tête .npy (version 1.0) de taille fixe, pour être réécrit sur place
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_HEADER_BYTES = 128
+
+_TEMPLATE_IDS = {tpl.name: i + 1 for i, tpl in enumerate(snapshot.TEMPLATES)}
+_NO_DELTA = (0, 0, 0, 0, 0)
+
+
+def _npy_header(dtype: str, rows: int) -> bytes:
+    text = f"{{'descr': '{np.dtype(dtype).str}', 'fortran_order': False, 'shape': ({rows},), }}"
+    size = _NPY_HEADER_BYTES - len(_NPY_MAGIC) - 2
+    return _NPY_MAGIC + struct.pack("<H", size) + (text.ljust(size - 1) + "\n").encode("latin1")
+
+
+def _room_id(room) -> int:
+    return 0 if room is None else _TEMPLATE_IDS.get(room.name, 0)
+
+
+def resources(engine) -> tuple:
+    """Ressources et objets du joueur (GameEvents.before)."""
+    inv = engine.player.inventory
+    return (inv.steps, inv.gold, inv.gems, inv.keys, inv.dice,
+            len(inv.items), frozenset(inv.permanent_items))
+
+
+def _gained(engine, before: tuple) -> tuple[int, tuple]:
+    """(objet obtenu, variations des ressources) depuis resources(engine) == before."""
+    after = resources(engine)
+    inv = engine.player.inventory
+    item = NONE
+    if after[5] > before[5]:
+        try:
+            item = snapshot.item_code(inv.items[-1])
+        except ValueError:
+            pass
+    else:
+        new = after[6] - before[6]
+        if new:
+            item = ITEM_PERMANENT + snapshot.PERMANENTS.index(next(iter(new)))
+    return item, tuple(max(-128, min(127, a - b)) for a, b in zip(after[:5], before[:5]))
+
+
+class GameEvents:
+    """Événements d'une partie (GameEngine.analytics), ajoutés au tampon du sink."""
+
+    __slots__ = ("sink", "game")
+
+    def __init__(self, sink: "EventSink", game: int):
+        self.sink = sink
+        self.game = game
+
+    def _row(self, engine, kind: int, rc, room, value: int, detail: int = NONE,
+             deltas: tuple = _NO_DELTA) -> None:
+        self.sink.append(self.game, kind, engine.player.steps, rc[0], rc[1],
+                         _room_id(room), value, detail, *deltas)
+
+    @staticmethod
+    def before(engine) -> tuple:
+        """État à passer à search / purchase, relevé avant la fouille ou l'achat."""
+        return resources(engine)
+
+    def offered(self, engine, rooms: list, dest_rc: tuple[int, int]) -> None:
+        for rank, room in enumerate(rooms):
+            self._row(engine, OFFERED, dest_rc, room, room.gem_cost, rank)
+
+    def picked(self, engine, room, dest_rc: tuple[int, int], rank: int) -> None:
+        self._row(engine, PICKED, dest_rc, room, room.gem_cost, rank, (-1, 0, -room.gem_cost, 0, 0))
+
+    def door(self, engine, src_rc: tuple[int, int], dir_: str, level) -> None:
+        self._row(engine, DOOR, src_rc, engine.manor.get_room(*src_rc), level.value, DIRS.index(dir_))
+
+    def search(self, engine, before: tuple) -> None:
+        rc = (engine.player.r, engine.player.c)
+        item, deltas = _gained(engine, before)
+        self._row(engine, SEARCH, rc, engine.manor.get_room(*rc), 0, item, deltas)
+
+    def purchase(self, engine, choice: int, before: tuple) -> None:
+        rc = (engine.player.r, engine.player.c)
+        item, deltas = _gained(engine, before)
+        self._row(engine, PURCHASE, rc, engine.manor.get_room(*rc), choice, item, deltas)
+
+    def end(self, engine, cause: str | None) -> None:
+        rc = (engine.player.r, engine.player.c)
+        code = 0 if cause is None else _CAUSE_CODES.get(cause, CAUSE_OTHER)
+        self._row(engine, END, rc, engine.manor.get_room(*rc), code)
+
+
+class EventSink:
+    """
+    Tampon d'événements et écriture par lots dans des tranches de colonnes .npy.
+    À fermer (close) pour écrire le dernier lot.
+    """
+
+    def __init__(self, directory: str, batch_events: int = BATCH_EVENTS,
+                 shard_events: int = SHARD_EVENTS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_events = batch_events
+        self.shard_events = shard_events
+        self._new_buffers()
+        self.written = 0
+        self._files = None
+        self._shard_rows = 0
+        self._shard = 0
+        self._next_game = 0
+        # Reprise d'un dossier existant : nouvelle tranche, identifiants à la suite
+        for path in shard_paths(directory):
+            self._shard = max(self._shard, int(os.path.basename(path)[len(SHARD_PREFIX):]))
+            games = load_shard(path)["game"]
+            if len(games):
+                self._next_game = max(self._next_game, int(games.max()) + 1)
+
+    def game(self) -> GameEvents:
+        """Nouvelle partie : identifiant suivant."""
+        self._next_game += 1
+        return GameEvents(self, self._next_game - 1)
+
+    def append(self, *row) -> None:
+        self._rows.extend(row)
+        self.pending += 1
+        if self.pending >= self.batch_events:
+            self.flush()
+
+    # ---------- Écriture ----------
+
+    def flush(self) -> None:
+        """Écrit les événements en attente dans la tranche ouverte (puis la ferme si pleine)."""
+        if not self.pending:
+            return
+        t0 = time.perf_counter()
+        if self._files is None:
+            self._open_shard()
+        rows = np.frombuffer(array("q", self._rows), dtype=np.int64).reshape(-1, len(COLUMNS))
+        arrays = [rows[:, i].astype(dtype) for i, (_, dtype) in enumerate(COLUMNS)]
+        # Données d'abord, en-têtes ensuite : un lecteur ne voit jamais de ligne incomplète
+        for f, values in zip(self._files, arrays):
+            f.seek(0, os.SEEK_END)
+            f.write(values.tobytes())
+            f.flush()
+        self._shard_rows += self.pending
+        for f, (_, dtype) in zip(self._files, COLUMNS):
+            f.seek(0)
+            f.write(_npy_header(dtype, self._shard_rows))
+            f.flush()
+        counts = np.bincount(arrays[1], minlength=len(KINDS))
+        for kind, count in zip(KINDS, counts):
+            ANALYTICS_EVENTS.inc(kind, amount=int(count))
+        self.written += self.pending
+        self._new_buffers()
+        if self._shard_rows >= self.shard_events:
+            self._close_shard()
+        ANALYTICS_FLUSH_LATENCY.observe(time.perf_counter() - t0)
+
+    def _new_buffers(self) -> None:
+        # Lignes bout à bout dans une liste (un seul extend par événement),
+        # converties en colonnes au moment d'écrire le lot
+        self._rows = []
+        self.pending = 0
+
+    def _open_shard(self) -> None:
+        self._shard += 1
+        path = os.path.join(self.directory, f"{SHARD_PREFIX}{self._shard:06d}")
+        os.makedirs(path)
+        self._files = []
+        for name, dtype in COLUMNS:
+            f = open(os.path.join(path, f"{name}.npy"), "w+b")
+            f.write(_npy_header(dtype, 0))
+            self._files.append(f)
+        self._shard_rows = 0
+
+    def _close_shard(self) -> None:
+        for f in self._files:
+            f.close()
+        self._files = None
+
+    def close(self) -> None:
+        self.flush()
+        if self._files is not None:
+            self._close_shard()
+
+
+# ---------- Lecture ----------
+
+def shard_paths(directory: str) -> list[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith(SHARD_PREFIX))
+
+
+def load_shard(path: str) -> dict[str, np.ndarray]:
+    """Colonnes d'une tranche, projetées en mémoire (lecture seule)."""
+    columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+               for name, _ in COLUMNS}
+    # Tranche en cours d'écriture : seulement les lignes présentes dans toutes les colonnes
+    rows = min(len(values) for values in columns.values())
+    return {name: values[:rows] for name, values in columns.items()}
+
+
+def load_shards(directory: str):
+    """Itère sur les tranches du dossier (dictionnaires de colonnes en mmap)."""
+    for path in shard_paths(directory):
+        yield load_shard(path)
+
+
+def load(directory: str, columns: tuple[str, ...] | None = None) -> dict[str, np.ndarray]:
+    """Colonnes demandées de toutes les tranches, bout à bout (copie en mémoire)."""
+    names = columns or tuple(name for name, _ in COLUMNS)
+    shards = list(load_shards(directory))
+    return {name: np.concatenate([shard[name] for shard in shards]) if shards
+            else np.empty(0, dtype=dict(COLUMNS)[name])
+            for name in names}
+
+
+def summary(directory: str) -> dict:
+    """Agrégats courants, tranche par tranche (sans tout charger en mémoire)."""
+    kinds = np.zeros(len(KINDS), dtype=np.int64)
+    causes = np.zeros(len(END_CAUSES), dtype=np.int64)
+    templates = len(snapshot.TEMPLATES) + 1
+    offered = np.zeros(templates, dtype=np.int64)
+    picked = np.zeros(templates, dtype=np.int64)
+    doors = np.zeros(3, dtype=np.int64)
+    found = np.zeros(NONE + 1, dtype=np.int64)
+    purchases = np.zeros(5, dtype=np.int64)
+    end_steps = 0
+    for shard in load_shards(directory):
+        kind = shard["kind"]
+        kinds += np.bincount(kind, minlength=len(KINDS))[:len(KINDS)]
+        ends = kind == END
+        causes += np.bincount(shard["value"][ends], minlength=len(END_CAUSES))[:len(END_CAUSES)]
+        end_steps += int(shard["steps"][ends].astype(np.int64).sum())
+        offered += np.bincount(shard["room"][kind == OFFERED], minlength=templates)
+        picked += np.bincount(shard["room"][kind == PICKED], minlength=templates)
+        doors += np.bincount(shard["value"][kind == DOOR], minlength=3)[:3]
+        found += np.bincount(shard["detail"][kind == SEARCH], minlength=NONE + 1)
+        purchases += np.bincount(shard["value"][kind == PURCHASE], minlength=5)[:5]
+
+    games = int(kinds[END])
+    names = ["-"] + [tpl.name for tpl in snapshot.TEMPLATES]
+    return {
+        "events": int(kinds.sum()),
+        "kinds": dict(zip(KINDS, kinds.tolist())),
+        "games": games,
+        "win_rate": causes[0] / games if games else 0.0,
+        "causes": {name: int(n) for (name, _), n in zip(END_CAUSES, causes) if n},
+        "mean_end_steps": end_steps / games if games else 0.0,
+        # Part des propositions retenues, par salle
+        "pick_rate": {names[i]: picked[i] / offered[i] for i in np.flatnonzero(offered)},
+        "door_levels": doors.tolist(),
+        "search_items": {int(i): int(found[i]) for i in np.flatnonzero(found)},
+        "purchases": purchases[1:].tolist(),
+    }
+
+
+# ---------- Vérification : python analytics.py ----------
+
+def _engine_counts() -> dict:
+    """Compteurs du moteur (metrics.py) correspondant aux événements."""
+    from metrics import GAME_OUTCOMES, DOOR_OPENS, SEARCHES, SHOP_PURCHASES
+    from door import DoorLockLevel
+    from engine import SHOP_ITEMS
+    return {
+        "win": GAME_OUTCOMES.get("win"),
+        "end": GAME_OUTCOMES.get("win") + GAME_OUTCOMES.get("lose"),
+        "search": SEARCHES.get(),
+        "door": sum(DOOR_OPENS.get(level.name) for level in DoorLockLevel),
+        "purchase": sum(SHOP_PURCHASES.get(label) for _, label in SHOP_ITEMS.values()),
+    }
+
+
+def main(argv=None) -> int:
+    import argparse
+    import tempfile
+    from bots import RandomPolicy, play_game
+    from engine import GameEngine
+
+    parser = argparse.ArgumentParser(description="Événements de partie écrits puis relus.")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=BATCH_EVENTS)
+    parser.add_argument("--shard", type=int, default=1 << 18, help="lignes par tranche")
+    parser.add_argument("--dir", default=None, help="dossier conservé (temporaire sinon)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or tmp
+        sink = EventSink(directory, args.batch, args.shard)
+        first = sink._next_game
+        before = _engine_counts()
+        actions = 0
+        plain = recorded = 0.0
+        for seed in range(args.games):
+            # Même partie sans puis avec événements : coût de l'enregistrement
+            t0 = time.perf_counter()
+            play_game(GameEngine.new_game(seed), RandomPolicy(seed))
+            plain += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            engine = GameEngine.new_game(seed)
+            engine.enable_analytics(sink)
+            actions += play_game(engine, RandomPolicy(seed))
+            recorded += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        sink.close()
+        close = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        stats = summary(directory)
+        scan = time.perf_counter() - t0
+
+        # Chaque graine est jouée deux fois : la moitié des compteurs du moteur
+        expected = {key: (count - before[key]) // 2 for key, count in _engine_counts().items()}
+        for kind in ("end", "search", "door", "purchase"):
+            if stats["kinds"][kind] < expected[kind] or (args.dir is None and stats["kinds"][kind] != expected[kind]):
+                print(f"{kind} : {stats['kinds'][kind]} événements, {expected[kind]} attendus")
+                failures += 1
+        data = load(directory, ("game", "kind", "value"))
+        ends = data["kind"] == END
+        games = data["game"][ends]
+        games = games[games >= first]
+        if len(games) != args.games or len(np.unique(games)) != args.games:
+            print(f"{len(games)} fins de partie relues, {args.games} attendues")
+            failures += 1
+        wins = int(np.count_nonzero(data["value"][ends][data["game"][ends] >= first] == 0))
+        if wins != expected["win"]:
+            print(f"{wins} victoires relues, {expected['win']} attendues")
+            failures += 1
+        if stats["kinds"]["picked"] > stats["kinds"]["offered"]:
+            print("plus de salles choisies que proposées")
+            failures += 1
+
+        shards = shard_paths(directory)
+        size = sum(os.path.getsize(os.path.join(path, name)) for path in shards for name in os.listdir(path))
+
+    events = stats["events"]
+    print(f"{args.games} parties, {actions} actions : {events} événements "
+          f"({events / args.games:.1f} par partie), {size / 2**20:.2f} Mio en {len(shards)} tranches "
+          f"({size / max(1, events):.1f} octets par événement)")
+    print(f"Enregistrement : {(recorded - plain) / max(1, events) * 1e6:.2f} µs par événement "
+          f"({(recorded - plain) / plain:+.1%} sur le temps de jeu) ; écriture "
+          f"{ANALYTICS_FLUSH_LATENCY.sum / max(1, ANALYTICS_FLUSH_LATENCY.count) * 1e3:.2f} ms par lot "
+          f"(dernier lot {close * 1e3:.2f} ms) ; agrégats relus en {scan * 1e3:.1f} ms")
+    print(f"Victoires {stats['win_rate']:.1%} ; fins {stats['causes']} ; "
+          f"portes par niveau {stats['door_levels']} ; achats {stats['purchases']}")
+    print(f"{failures} erreurs")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+# autosave.py
+import os
+import queue
+import sys
+import threading
+import time
+
+from metrics import AUTOSAVE_REQUESTS, AUTOSAVE_COALESCED, AUTOSAVE_ERRORS, AUTOSAVE_WRITE_LATENCY
+
+"""
+Sauvegarde automatique sans bloquer la boucle de jeu.
+
+Le thread principal prend le snapshot (snapshot.save, quelques dizaines de
+µs) et le dépose dans une file bornée, sans jamais attendre. Un thread
+d'écriture vide la file : seules les données les plus récentes sont
+écrites (les sauvegardes intermédiaires sont fusionnées), dans un fichier
+temporaire renommé ensuite (jamais de sauvegarde à moitié écrite, même si
+le jeu s'arrête pendant l'écriture).
+
+Si la file est pleine (disque très lent), la plus ancienne sauvegarde en
+attente est remplacée par la nouvelle.
+
+    python autosave.py --delay-ms 50    # disque lent simulé : aucune attente côté jeu
+"""
+
+AUTOSAVE_QUEUE_SIZE = 4
+
+_STOP = object()
+
+
+class AutoSaver:
+    """Écrit en arrière-plan la dernière sauvegarde reçue par submit()."""
+
+    def __init__(self, path: str, queue_size: int = AUTOSAVE_QUEUE_SIZE, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.written = 0
+        self.last_error: OSError | None = None
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def submit(self, data: bytes) -> None:
+        """Dépose une sauvegarde sans attendre (thread du jeu)."""
+        AUTOSAVE_REQUESTS.inc()
+        while True:
+            try:
+                self._queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    AUTOSAVE_COALESCED.inc()
+                except queue.Empty:
+                    pass
+
+    def flush(self) -> None:
+        """Attend que tout ce qui a été déposé soit écrit (fin de partie, tests)."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Écrit la dernière sauvegarde en attente puis arrête le thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    # ---------- Thread d'écriture ----------
+
+    def _run(self) -> None:
+        while True:
+            data = self._queue.get()
+            done = 1
+            # Fusion : on ne garde que la plus récente des sauvegardes en attente
+            while data is not _STOP:
+                try:
+                    newer = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                done += 1
+                if newer is _STOP:
+                    self._save(data)
+                    data = _STOP
+                else:
+                    AUTOSAVE_COALESCED.inc()
+                    data = newer
+            if data is _STOP:
+                for _ in range(done):
+                    self._queue.task_done()
+                return
+            self._save(data)
+            for _ in range(done):
+                self._queue.task_done()
+
+    def _save(self, data: bytes) -> None:
+        t0 = time.perf_counter()
+        try:
+            self._write(data)
+        except OSError as e:
+            self.last_error = e
+            AUTOSAVE_ERRORS.inc()
+            return
+        self.written += 1
+        AUTOSAVE_WRITE_LATENCY.observe(time.perf_counter() - t0)
+
+    def _write(self, data: bytes) -> None:
+        """Fichier temporaire puis renommage atomique."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+# ---------- Vérification : python autosave.py ----------
+
+class _SlowSaver(AutoSaver):
+    """Disque lent simulé (délai avant chaque écriture)."""
+
+    def __init__(self, path: str, delay_s: float):
+        self.delay_s = delay_s
+        super().__init__(path)
+
+    def _write(self, data: bytes) -> None:
+        time.sleep(self.delay_s)
+        super()._write(data)
+
+
+def main(argv=None) -> int:
+    import argparse
+    import tempfile
+    import snapshot
+    from engine import GameEngine
+    from bots import RandomPolicy
+
+    parser = argparse.ArgumentParser(description="Sauvegarde automatique sur disque lent simulé.")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=50.0, help="durée simulée d'une écriture")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    worst = 0.0
+    submitted = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "autosave.sav")
+        saver = _SlowSaver(path, args.delay_ms / 1000)
+        for seed in range(args.games):
+            engine = GameEngine.new_game(seed)
+            policy = RandomPolicy(seed)
+            saved = engine.checkpoints
+            data = None
+            while engine.state != "END":
+                engine.apply_action(policy.choose(engine))
+                if engine.checkpoints != saved:
+                    saved = engine.checkpoints
+                    t0 = time.perf_counter()
+                    data = snapshot.save(engine)
+                    saver.submit(data)
+                    worst = max(worst, time.perf_counter() - t0)
+                    submitted += 1
+            if data is not None:
+                saver.flush()
+                with open(path, "rb") as f:
+                    if f.read() != data:
+                        print(f"graine {seed} : le fichier n'est pas la dernière sauvegarde")
+                        failures += 1
+        saver.close()
+
+    print(f"{submitted} sauvegardes demandées, {saver.written} écrites "
+          f"({args.delay_ms:.0f} ms par écriture) ; pire attente côté jeu "
+          f"{worst * 1000:.2f} ms (snapshot compris) ; {failures} erreurs")
+    return 1 if failures or worst > args.delay_ms / 1000 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
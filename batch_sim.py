@@ -0,0 +1,647 @@
+# batch_sim.py
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from config import ROWS, COLS
+from room import Room, RoomType
+from room_data import ALL_ROOMS
+from door import DoorLockLevel
+from engine import (
+    GameEngine,
+    MOVE_N, MOVE_S, MOVE_E, MOVE_W,
+    PICK_0, PICK_1, PICK_2, REROLL, CANCEL,
+)
+from items import Shovel, Hammer, LockpickKit, MetalDetector, RabbitFoot
+
+"""
+Simulateur vectorisé (NumPy) : des milliers de manoirs avancés en même temps.
+
+L'état de toutes les parties tient dans quelques tableaux indexés par partie
+(dimension B), et chaque pas applique les règles de Manor / GameEngine à
+toutes les parties d'un coup :
+
+- grid      (B, R, C)      : id de modèle de salle par case (-1 = vide)
+- visited   (B, R, C)      : effet d'entrée déjà appliqué
+- lock      (B, R, C, 4)   : niveau de la porte (0/1/2) vue depuis chaque case
+- opened    (B, R, C, 4)   : porte ouverte (les deux côtés sont tenus à jour)
+- inv       (B, 5)         : pas, or, gemmes, clés, dés
+- perms     (B,)           : objets permanents (bits)
+- stock     (B, T)         : exemplaires restants par modèle
+- pos       (B, 2)         : position du joueur
+- offres en attente (PICK) et cache d'offres par case (comme offers.py)
+
+Règles couvertes : déplacements et murs, ouverture des portes (clé / kit de
+crochetage), tirage des 3 salles et règle de la salle gratuite, placement,
+pioche finie, effets d'entrée, coût en pas, victoire / défaite / blocage.
+Actions supportées : MOVE_*, PICK_*, REROLL, CANCEL (voir BATCH_ACTIONS).
+Les fouilles, interactions, repas et boutique restent dans GameEngine.
+
+Le cache d'offres n'est pas borné ici (au plus R × C cases), contrairement
+à OfferCache : les parties qui laissent plus de OFFER_CACHE_SIZE offres en
+suspens peuvent donc diverger de la référence.
+
+Vérification différentielle contre le moteur de référence :
+    python batch_sim.py --check 200
+"""
+
+BATCH_ACTIONS = (MOVE_N, MOVE_S, MOVE_E, MOVE_W, PICK_0, PICK_1, PICK_2, REROLL, CANCEL)
+NOOP = -1
+
+# Directions dans l'ordre des actions MOVE_* : N, S, E, W (opposée = d ^ 1)
+DIRS = ("N", "S", "E", "W")
+DR = np.array([-1, 1, 0, 0])
+DC = np.array([0, 0, 1, -1])
+
+# États
+PLAY, PICK, END = 0, 1, 2
+
+# Colonnes de l'inventaire
+STEPS, GOLD, GEMS, KEYS, DICE = range(5)
+
+# Objets permanents (bits)
+PERM_BITS = {Shovel: 1, Hammer: 2, LockpickKit: 4, MetalDetector: 8, RabbitFoot: 16}
+SHOVEL, HAMMER, LOCKPICK = PERM_BITS[Shovel], PERM_BITS[Hammer], PERM_BITS[LockpickKit]
+
+START_INVENTORY = (70, 0, 2, 0, 0)   # comme Inventory()
+
+
+class TemplateTable:
+    """
+    Modèles de salles en tableaux : id 0 = Entrée, 1 = Antechambre, puis les
+    modèles de la pioche dans l'ordre de GameEngine.room_templates.
+    Chaque tableau a une case de plus à la fin : l'indice -1 (case vide)
+    tombe dessus et vaut 0 partout.
+    """
+
+    def __init__(self, rows: int = ROWS, cols: int = COLS):
+        catalog = {tpl.name: tpl for tpl in ALL_ROOMS}   # même dédoublonnage que GameEngine
+        self.rooms: list[Room] = (
+            [Room.from_type(RoomType.ENTRANCE), Room.from_type(RoomType.ANTECHAMBER)]
+            + list(catalog.values())
+        )
+        self.ids = {room.name: i for i, room in enumerate(self.rooms)}
+        self.entrance, self.antechamber = 0, 1
+        n = len(self.rooms)
+        self.n = n
+
+        self.door_mask = np.zeros(n + 1, dtype=np.uint8)
+        self.gem_cost = np.zeros(n + 1, dtype=np.int32)
+        self.stock0 = np.zeros(n, dtype=np.int32)
+
+        # Effets d'entrée (miroir de GameEngine.apply_room_entry_effect)
+        self.eff = np.zeros((n + 1, 5), dtype=np.int32)   # ajouts d'inventaire
+        self.eff_perm = np.zeros(n + 1, dtype=np.uint8)    # permanent trouvé
+        self.trap = np.zeros(n + 1, dtype=np.int32)        # dégâts sans marteau
+        self.trap_hammer = np.zeros(n + 1, dtype=np.int32) # dégâts avec marteau
+
+        for i, room in enumerate(self.rooms):
+            for d, name in enumerate(DIRS):
+                if name in room.doors:
+                    self.door_mask[i] |= 1 << d
+            self.gem_cost[i] = room.gem_cost
+            if i >= 2:
+                self.stock0[i] = 1 if room.name in ("Veranda", "Suite royale") else 3
+
+            short = room.short
+            if short == "BED":
+                self.eff[i, STEPS] = 2
+            elif short == "SUI":
+                self.eff[i, STEPS] = 10
+            elif short == "VLT":
+                self.eff[i, GOLD], self.eff[i, GEMS] = 2, 1
+            elif short == "TRS":
+                self.eff[i, GOLD], self.eff[i, KEYS], self.eff[i, GEMS] = 2, 1, 1
+            elif short == "VRN":
+                self.eff_perm[i] = SHOVEL
+            elif short == "TRP":
+                self.trap[i], self.trap_hammer[i] = 5, 2
+            elif short == "CHN":
+                self.trap[i], self.trap_hammer[i] = 3, 1
+
+        # placeable[r, c, d, t] : le modèle t peut être posé en (r, c) quand on
+        # arrive par la direction d (Manor.can_place_room, hors case vide / stock)
+        self.placeable = np.zeros((rows, cols, 4, n), dtype=bool)
+        for r in range(rows):
+            for c in range(cols):
+                is_edge = r == 0 or r == rows - 1 or c == 0 or c == cols - 1
+                for t, room in enumerate(self.rooms):
+                    if t < 2 or (room.edge_only and not is_edge):
+                        continue
+                    if any(not (0 <= r + DR[d] < rows and 0 <= c + DC[d] < cols)
+                           for d, name in enumerate(DIRS) if name in room.doors):
+                        continue
+                    for d in range(4):
+                        if DIRS[d ^ 1] in room.doors:
+                            self.placeable[r, c, d, t] = True
+        # (T, R*C*4) en flottants : produit matriciel rapide avec le stock
+        self.placeable_flat = self.placeable.reshape(-1, n).T.astype(np.float32)
+
+    def id_of(self, room: Room | None) -> int:
+        """Id de modèle d'une Room du manoir (-1 pour une case vide)."""
+        if room is None:
+            return -1
+        if room.room_type == RoomType.ENTRANCE:
+            return self.entrance
+        if room.room_type == RoomType.ANTECHAMBER:
+            return self.antechamber
+        return self.ids[room.name]
+
+
+class BatchSimulator:
+    """B parties avancées en parallèle, une action par partie et par pas."""
+
+    def __init__(self, n_games: int, seed: int | None = None, rows: int = ROWS, cols: int = COLS,
+                 table: TemplateTable | None = None):
+        self.B, self.R, self.C = n_games, rows, cols
+        self.table = table if table is not None else TemplateTable(rows, cols)
+        self.np_random = np.random.default_rng(seed)
+
+        self.start = (rows - 1, cols // 2)
+        self.antechamber_rc = (0, cols // 2)
+
+        rr, cc = np.meshgrid(np.arange(rows), np.arange(cols), indexing="ij")
+        # inbounds[r, c, d] : la case voisine dans la direction d existe
+        self.inbounds = np.stack(
+            [(0 <= rr + DR[d]) & (rr + DR[d] < rows) & (0 <= cc + DC[d]) & (cc + DC[d] < cols)
+             for d in range(4)], axis=-1)
+
+        # Offres imposées (vérification différentielle) : partie -> ids de modèles
+        self.scripted_offers: dict[int, list[int]] | None = None
+        self.reset()
+
+    # ----------------------------
+    # Initialisation
+    # ----------------------------
+
+    def reset(self, draw_doors: bool = True) -> None:
+        B, R, C = self.B, self.R, self.C
+        t = self.table
+
+        self.grid = np.full((B, R, C), -1, dtype=np.int16)
+        self.grid[:, self.start[0], self.start[1]] = t.entrance
+        self.grid[:, self.antechamber_rc[0], self.antechamber_rc[1]] = t.antechamber
+        self.visited = np.zeros((B, R, C), dtype=bool)
+
+        self.lock = np.full((B, R, C, 4), -1, dtype=np.int8)
+        self.opened = np.zeros((B, R, C, 4), dtype=bool)
+        if draw_doors:
+            self._draw_lock_levels()
+
+        self.inv = np.tile(np.array(START_INVENTORY, dtype=np.int32), (B, 1))
+        self.perms = np.zeros(B, dtype=np.uint8)
+        self.stock = np.tile(t.stock0, (B, 1))
+        self.pos = np.tile(np.array(self.start, dtype=np.int32), (B, 1))
+
+        self.state = np.full(B, PLAY, dtype=np.int8)
+        self.win = np.zeros(B, dtype=bool)
+
+        self.pend_ids = np.full((B, 3), -1, dtype=np.int16)
+        self.pend_cost = np.zeros((B, 3), dtype=np.int32)
+        self.pend_dest = np.zeros((B, 2), dtype=np.int32)
+        self.pend_dir = np.zeros(B, dtype=np.int8)
+
+        self.cache_ids = np.full((B, R, C, 3), -1, dtype=np.int16)
+        self.cache_cost = np.zeros((B, R, C, 3), dtype=np.int32)
+
+        # Effet d'entrée de la salle de départ (l'Entrée n'en a pas)
+        self._entry_effect(np.arange(B))
+
+    def _draw_lock_levels(self) -> None:
+        """Tire tous les niveaux de portes d'avance (même loi que Manor.ensure_door)."""
+        B, R, C = self.B, self.R, self.C
+        ante_row = self.antechamber_rc[0]
+        bottom = max(self.start[0], ante_row)
+        top = min(self.start[0], ante_row)
+        special = {self.start, self.antechamber_rc}
+
+        for r in range(R):
+            for c in range(C):
+                for d in (1, 2):   # S et E : chaque arête une seule fois
+                    nr, nc = r + DR[d], c + DC[d]
+                    if not (nr < R and nc < C):
+                        continue
+
+                    avg = (r + nr) / 2
+                    if (r, c) in special or (nr, nc) in special:
+                        level = np.zeros(B, dtype=np.int8)
+                    elif int(avg) == ante_row:
+                        level = np.full(B, 2, dtype=np.int8)
+                    else:
+                        tt = 0.5 if bottom == top else min(1.0, max(0.0, (bottom - avg) / (bottom - top)))
+                        locked = self.np_random.random(B) <= 0.20
+                        double = self.np_random.random(B) < 0.10 + 0.70 * tt
+                        level = np.where(locked, np.where(double, 2, 1), 0).astype(np.int8)
+
+                    self.lock[:, r, c, d] = level
+                    self.lock[:, nr, nc, d ^ 1] = level
+                    self.opened[:, r, c, d] = level == 0
+                    self.opened[:, nr, nc, d ^ 1] = level == 0
+
+    # ----------------------------
+    # Pas de simulation
+    # ----------------------------
+
+    def step(self, actions) -> None:
+        """Applique une action par partie (NOOP = -1 pour ne rien faire)."""
+        a = np.asarray(actions)
+        play = self.state == PLAY
+        pick = self.state == PICK
+
+        g = np.nonzero(play & (a >= MOVE_N) & (a <= MOVE_W))[0]
+        if g.size:
+            self._move(g, a[g].astype(np.int64))
+
+        g = np.nonzero(pick & (a >= PICK_0) & (a <= PICK_2))[0]
+        if g.size:
+            self._pick(g, a[g] - PICK_0)
+
+        g = np.nonzero(pick & (a == REROLL))[0]
+        if g.size:
+            self._reroll(g)
+
+        g = np.nonzero(pick & (a == CANCEL))[0]
+        if g.size:
+            self.state[g] = PLAY
+            self.pend_ids[g] = -1
+
+    def random_actions(self) -> np.ndarray:
+        """Politique aléatoire vectorisée (déplacement en PLAY, carte en PICK)."""
+        moves = self.np_random.integers(MOVE_N, MOVE_W + 1, self.B)
+        picks = PICK_0 + self.np_random.integers(0, 3, self.B)
+        return np.where(self.state == PLAY, moves, np.where(self.state == PICK, picks, NOOP))
+
+    # ----------------------------
+    # Règles
+    # ----------------------------
+
+    def _can_open(self, level, opened, g):
+        keys = self.inv[g, KEYS]
+        lockpick = (self.perms[g] & LOCKPICK) != 0
+        if level.ndim > 1:
+            keys = keys.reshape((-1,) + (1,) * (level.ndim - 1))
+            lockpick = lockpick.reshape(keys.shape)
+        return (opened | (level == 0)
+                | ((level == 1) & ((keys > 0) | lockpick))
+                | ((level == 2) & (keys > 0)))
+
+    def _lose(self, g) -> None:
+        self.state[g] = END
+        self.win[g] = False
+
+    def _lose_if_blocked(self, g) -> None:
+        if g.size:
+            self._lose(g[self._blocked(g)])
+
+    def _move(self, g, d) -> None:
+        t = self.table
+
+        dead = self.inv[g, STEPS] <= 0
+        self._lose(g[dead])
+        g, d = g[~dead], d[~dead]
+
+        r, c = self.pos[g, 0], self.pos[g, 1]
+        has_door = ((t.door_mask[self.grid[g, r, c]] >> d) & 1).astype(bool)
+        wall = ~(has_door & self.inbounds[r, c, d])
+        self._lose_if_blocked(g[wall])
+        g, d, r, c = g[~wall], d[~wall], r[~wall], c[~wall]
+
+        # Porte : ouverture (clé consommée sauf niveau 1 + kit)
+        level = self.lock[g, r, c, d]
+        need = ~self.opened[g, r, c, d]
+        can = self._can_open(level, self.opened[g, r, c, d], g)
+        fail = need & ~can
+        self._lose_if_blocked(g[fail])
+
+        opening = need & can
+        lockpick = (self.perms[g] & LOCKPICK) != 0
+        pay = opening & (((level == 1) & ~lockpick & (self.inv[g, KEYS] > 0)) | (level == 2))
+        self.inv[g[pay], KEYS] -= 1
+        nr, nc = r + DR[d], c + DC[d]
+        self.opened[g[opening], r[opening], c[opening], d[opening]] = True
+        self.opened[g[opening], nr[opening], nc[opening], d[opening] ^ 1] = True
+
+        g, d, nr, nc = g[~fail], d[~fail], nr[~fail], nc[~fail]
+        empty = self.grid[g, nr, nc] < 0
+
+        # Salle connue : 1 pas, effet d'entrée, fin de partie ?
+        k = ~empty
+        gk = g[k]
+        self.inv[gk, STEPS] -= 1
+        self.pos[gk, 0], self.pos[gk, 1] = nr[k], nc[k]
+        self._entry_effect(gk)
+        self._check_end(gk)
+
+        # Case vide : offre mémorisée (filtrée pour cette porte) ou nouveau tirage
+        ge, de, er, ec = g[empty], d[empty], nr[empty], nc[empty]
+        if ge.size == 0:
+            return
+
+        ids = self.cache_ids[ge, er, ec]
+        costs = self.cache_cost[ge, er, ec]
+        ok = (ids >= 0) & t.placeable[er[:, None], ec[:, None], de[:, None], np.maximum(ids, 0)]
+        # Réutilisée aux prix d'origine seulement si la salle gratuite se raccorde
+        reuse = (ok & (costs == 0)).any(axis=1)
+        if reuse.any():
+            order = np.argsort(~ok[reuse], axis=1, kind="stable")
+            kept = np.take_along_axis(ok[reuse], order, axis=1)
+            rid = np.where(kept, np.take_along_axis(ids[reuse], order, axis=1), -1)
+            rcost = np.where(kept, np.take_along_axis(costs[reuse], order, axis=1), 0)
+            self._start_pick(ge[reuse], rid, rcost, de[reuse], er[reuse], ec[reuse])
+
+        roll = ~reuse
+        if roll.any():
+            gr = ge[roll]
+            has = self._roll(gr, de[roll], er[roll], ec[roll])
+            self._lose_if_blocked(gr[~has])
+
+    def _roll(self, g, d, dr, dc) -> np.ndarray:
+        """Tire jusqu'à 3 salles posables ; retourne True pour les parties servies."""
+        t = self.table
+        candidates = t.placeable[dr, dc, d] & (self.stock[g] > 0)
+
+        keys = self.np_random.random(candidates.shape)
+        if self.scripted_offers is not None:
+            keys = np.zeros(candidates.shape)
+            for row, game in enumerate(g):
+                for rank, tid in enumerate(self.scripted_offers.pop(int(game), [])):
+                    keys[row, tid] = 3 - rank
+        keys = np.where(candidates, keys, -1.0)
+        if self.scripted_offers is not None:
+            keys[keys == 0] = -1.0
+
+        order = np.argsort(-keys, axis=1, kind="stable")[:, :3]
+        valid = np.take_along_axis(keys, order, axis=1) >= 0
+        ids = np.where(valid, order, -1).astype(np.int16)
+        costs = np.where(valid, t.gem_cost[ids], 0).astype(np.int32)
+        self._ensure_free_room(ids, costs)
+
+        has = valid[:, 0]
+        gh = g[has]
+        self.cache_ids[gh, dr[has], dc[has]] = ids[has]
+        self.cache_cost[gh, dr[has], dc[has]] = costs[has]
+        self._start_pick(gh, ids[has], costs[has], d[has], dr[has], dc[has])
+        return has
+
+    @staticmethod
+    def _ensure_free_room(ids, costs) -> None:
+        valid = ids >= 0
+        all_paid = valid[:, 0] & np.all(~valid | (costs > 0), axis=1)
+        costs[all_paid, 0] = 0
+
+    def _start_pick(self, g, ids, costs, d, dr, dc) -> None:
+        self.pend_ids[g] = ids
+        self.pend_cost[g] = costs
+        self.pend_dir[g] = d
+        self.pend_dest[g, 0], self.pend_dest[g, 1] = dr, dc
+        self.state[g] = PICK
+
+    def _reroll(self, g) -> None:
+        g = g[self.inv[g, DICE] > 0]
+        self.inv[g, DICE] -= 1
+        d = self.pend_dir[g].astype(np.int64)
+        dr, dc = self.pend_dest[g, 0], self.pend_dest[g, 1]
+        has = self._roll(g, d, dr, dc)
+        # Comme la référence : sans candidate, on reste en PICK sans carte
+        self.pend_ids[g[~has]] = -1
+
+    def _pick(self, g, i) -> None:
+        t = self.table
+        tid = self.pend_ids[g, i]
+        cost = self.pend_cost[g, i]
+        ok = (tid >= 0) & (cost <= self.inv[g, GEMS])
+        g, tid, cost = g[ok], tid[ok].astype(np.int64), cost[ok]
+
+        self.inv[g, GEMS] -= cost
+        r, c = self.pend_dest[g, 0], self.pend_dest[g, 1]
+        self.grid[g, r, c] = tid
+        self.visited[g, r, c] = False
+        self.cache_ids[g, r, c] = -1
+
+        in_stock = self.stock[g, tid] > 0
+        self.stock[g[in_stock], tid[in_stock]] -= 1
+        out = in_stock & (self.stock[g, tid] == 0)
+        if out.any():
+            go, to = g[out], tid[out]
+            sub = self.cache_ids[go]
+            stale = (sub == to[:, None, None, None]).any(axis=-1)
+            sub[stale] = -1
+            self.cache_ids[go] = sub
+
+        self.state[g] = PLAY
+        self.pend_ids[g] = -1
+        self.inv[g, STEPS] -= 1
+        self.pos[g, 0], self.pos[g, 1] = r, c
+        self._entry_effect(g)
+        self._check_end(g)
+
+    def _entry_effect(self, g) -> None:
+        t = self.table
+        r, c = self.pos[g, 0], self.pos[g, 1]
+        first = ~self.visited[g, r, c]
+        g, r, c = g[first], r[first], c[first]
+        self.visited[g, r, c] = True
+
+        tid = self.grid[g, r, c]
+        self.inv[g] += t.eff[tid]
+        self.perms[g] |= t.eff_perm[tid]
+
+        hammer = (self.perms[g] & HAMMER) != 0
+        dmg = np.where(hammer, t.trap_hammer[tid], t.trap[tid])
+        self.inv[g, STEPS] = np.where(dmg > 0, np.maximum(0, self.inv[g, STEPS] - dmg), self.inv[g, STEPS])
+
+    def _check_end(self, g) -> None:
+        at_ante = (self.pos[g, 0] == self.antechamber_rc[0]) & (self.pos[g, 1] == self.antechamber_rc[1])
+        self.state[g[at_ante]] = END
+        self.win[g[at_ante]] = True
+        g = g[~at_ante]
+
+        dead = self.inv[g, STEPS] <= 0
+        self._lose(g[dead])
+        self._lose_if_blocked(g[~dead])
+
+    def _blocked(self, g) -> np.ndarray:
+        """Version vectorisée de GameEngine.is_player_blocked (parcours par inondation)."""
+        t = self.table
+        n = g.size
+        blocked = self.inv[g, STEPS] <= 0
+
+        grid = self.grid[g]
+        has_room = grid >= 0
+        door_bits = t.door_mask[grid]
+        passable = np.stack(
+            [((door_bits >> d) & 1).astype(bool) & self.inbounds[..., d] for d in range(4)], axis=-1
+        ) & self._can_open(self.lock[g], self.opened[g], g)
+
+        # placeable_now[n, r, c, d] : au moins un modèle en stock posable en (r, c) depuis d
+        in_stock = (self.stock[g] > 0).astype(np.float32)
+        placeable_now = (in_stock @ t.placeable_flat).reshape(n, self.R, self.C, 4) > 0
+
+        reach = np.zeros((n, self.R, self.C), dtype=bool)
+        reach[np.arange(n), self.pos[g, 0], self.pos[g, 1]] = True
+        frontier = ~has_room[..., None] & placeable_now
+        found = np.zeros(n, dtype=bool)
+
+        # On ne garde à chaque tour que les parties encore indécises
+        active = np.arange(n)
+        while active.size:
+            cur = reach[active]
+            new = cur.copy()
+            hit = np.zeros(active.size, dtype=bool)
+            for d in range(4):
+                src = cur & passable[active, ..., d]
+                dest = np.zeros_like(src)
+                rs = slice(max(0, -DR[d]), self.R - max(0, DR[d]))
+                cs = slice(max(0, -DC[d]), self.C - max(0, DC[d]))
+                rd = slice(max(0, DR[d]), self.R + min(0, DR[d]))
+                cd = slice(max(0, DC[d]), self.C + min(0, DC[d]))
+                dest[:, rd, cd] = src[:, rs, cs]
+
+                hit |= (dest & frontier[active, ..., d]).any(axis=(1, 2))
+                new |= dest & has_room[active]
+            found[active[hit]] = True
+            grew = (new != cur).any(axis=(1, 2)) & ~hit
+            reach[active] = new
+            active = active[grew]
+
+        return blocked | ~found
+
+
+# ---------- Vérification différentielle contre GameEngine ----------
+
+class _RecordingEngine(GameEngine):
+    """GameEngine qui note chaque tirage de salles (pour l'imposer au simulateur)."""
+
+    def __init__(self, *args, **kwargs):
+        self.rolls: list[list[str]] = []
+        super().__init__(*args, **kwargs)
+
+    def roll_three_rooms(self, dir_, dest_rc):
+        super().roll_three_rooms(dir_, dest_rc)
+        if self.state == "PICK" and self._pending_dest == dest_rc:
+            self.rolls.append([room.name for room in self.pick_rooms])
+        else:
+            self.rolls.append([])
+
+
+def _sync_from_reference(sim: BatchSimulator, b: int, engine: _RecordingEngine, synced: set) -> None:
+    """Recopie les portes nouvellement créées et les tirages de la référence."""
+    for (r, c, dir_), door in engine.manor.doors.items():
+        if (r, c, dir_) in synced:
+            continue
+        synced.add((r, c, dir_))
+        d = DIRS.index(dir_)
+        if sim.lock[b, r, c, d] < 0:
+            level = door.lock_level.value
+            sim.lock[b, r, c, d] = level
+            sim.opened[b, r, c, d] = level == DoorLockLevel.UNLOCKED.value
+
+    if engine.rolls:
+        sim.scripted_offers[b] = [sim.table.ids[name] for name in engine.rolls.pop(0)]
+
+
+def _compare(sim: BatchSimulator, b: int, engine: GameEngine) -> list[str]:
+    """Différences entre la partie b du simulateur et la référence."""
+    errors = []
+    t = sim.table
+    for r in range(sim.R):
+        for c in range(sim.C):
+            room = engine.manor.get_room(r, c)
+            expected = t.id_of(room)
+            if sim.grid[b, r, c] != expected:
+                errors.append(f"case {(r, c)} : {sim.grid[b, r, c]} au lieu de {expected}")
+            elif room is not None and sim.visited[b, r, c] != room.visited:
+                errors.append(f"visited {(r, c)}")
+
+    for (r, c, dir_), door in engine.manor.doors.items():
+        if sim.opened[b, r, c, DIRS.index(dir_)] != door.is_open:
+            errors.append(f"porte {(r, c, dir_)} ouverte={door.is_open}")
+
+    inv = engine.player.inventory
+    expected_inv = (inv.steps, inv.gold, inv.gems, inv.keys, inv.dice)
+    if tuple(sim.inv[b]) != expected_inv:
+        errors.append(f"inventaire {tuple(sim.inv[b])} au lieu de {expected_inv}")
+    perms = sum(bit for cls, bit in PERM_BITS.items() if inv.has_perm(cls))
+    if sim.perms[b] != perms:
+        errors.append(f"permanents {sim.perms[b]} au lieu de {perms}")
+    for name, count in engine.room_stock.items():
+        if sim.stock[b, t.ids[name]] != count:
+            errors.append(f"stock {name}")
+    if tuple(sim.pos[b]) != (engine.player.r, engine.player.c):
+        errors.append(f"position {tuple(sim.pos[b])} au lieu de {(engine.player.r, engine.player.c)}")
+    state = {"PLAY": PLAY, "PICK": PICK, "END": END}[engine.state]
+    if sim.state[b] != state or (state == END and sim.win[b] != engine.win):
+        errors.append(f"état {sim.state[b]} au lieu de {engine.state}")
+    return errors
+
+
+def differential_check(seeds, max_steps: int = 400) -> dict[int, list[str]]:
+    """
+    Joue les mêmes actions (au hasard parmi BATCH_ACTIONS) sur GameEngine et sur
+    le simulateur, en imposant au simulateur les portes et tirages de la référence,
+    et compare l'état complet après chaque pas.
+    Retourne {graine: erreurs} pour les parties qui divergent.
+    """
+    seeds = list(seeds)
+    engines = [_RecordingEngine.new_game(seed) for seed in seeds]
+    policies = [np.random.default_rng(seed) for seed in seeds]
+    synced = [set() for _ in seeds]
+
+    sim = BatchSimulator(len(seeds))
+    sim.reset(draw_doors=False)
+    sim.scripted_offers = {}
+
+    failures: dict[int, list[str]] = {}
+    for _ in range(max_steps):
+        actions = np.full(len(seeds), NOOP)
+        for b, engine in enumerate(engines):
+            if engine.state == "END" or seeds[b] in failures:
+                continue
+            legal = [a for a in engine.legal_actions() if a in BATCH_ACTIONS]
+            actions[b] = legal[policies[b].integers(len(legal))]
+            engine.apply_action(int(actions[b]))
+            _sync_from_reference(sim, b, engine, synced[b])
+
+        sim.step(actions)
+
+        for b, engine in enumerate(engines):
+            if actions[b] != NOOP and seeds[b] not in failures:
+                errors = _compare(sim, b, engine)
+                if errors:
+                    failures[seeds[b]] = errors
+
+        if all(engine.state == "END" for engine in engines):
+            break
+
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulateur vectorisé de parties.")
+    parser.add_argument("--games", type=int, default=4096, help="parties pour le banc d'essai")
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--check", type=int, default=0, help="nb de graines à comparer à GameEngine")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = differential_check(range(args.check))
+        for seed, errors in failures.items():
+            print(f"graine {seed} : {errors[:3]}")
+        print(f"Vérification différentielle : {args.check - len(failures)}/{args.check} parties identiques")
+        return 1 if failures else 0
+
+    sim = BatchSimulator(args.games, seed=0)
+    t0 = time.perf_counter()
+    for _ in range(args.steps):
+        sim.step(sim.random_actions())
+    elapsed = time.perf_counter() - t0
+    print(f"{args.games} parties × {args.steps} pas en {elapsed:.2f} s "
+          f"({args.games * args.steps / elapsed:,.0f} pas/s), "
+          f"victoires : {int(sim.win.sum())}, terminées : {int((sim.state == END).sum())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
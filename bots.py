@@ -0,0 +1,100 @@
+# bots.py
+import argparse
+import random
+import sys
+import time
+
+from engine import GameEngine
+
+"""
+Joueurs automatiques (bots) pour le moteur sans affichage.
+
+Une "policy" est un objet avec une méthode choose(engine) -> action
+(voir les actions élémentaires de engine.py).
+
+Séries de parties (taux de victoire par graine) :
+    python bots.py --policy random --games 200
+    python bots.py --policy mcts --games 20 --budget 0.1
+"""
+
+POLICIES = ("random", "mcts")
+
+
+class RandomPolicy:
+    """Joue une action légale au hasard (référence minimale)."""
+
+    def __init__(self, seed: int | None = None):
+        self.random = random.Random(seed)
+
+    def choose(self, engine: GameEngine) -> int:
+        return self.random.choice(engine.legal_actions())
+
+
+def make_policy(name: str, seed: int | None = None, **kwargs):
+    """Crée une policy par son nom (voir POLICIES) ; kwargs : options MCTS."""
+    if name == "random":
+        return RandomPolicy(seed)
+    if name == "mcts":
+        from mcts import MCTSPolicy
+        return MCTSPolicy(seed=seed, **kwargs)
+    raise ValueError(f"policy inconnue : {name}")
+
+
+def play_game(engine: GameEngine, policy, max_actions: int = 2000) -> int:
+    """
+    Fait jouer policy jusqu'à la fin de la partie (ou max_actions).
+    Retourne le nombre d'actions jouées.
+    """
+    n = 0
+    while engine.state != "END" and n < max_actions:
+        engine.apply_action(policy.choose(engine))
+        n += 1
+    return n
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Série de parties jouées par un bot.")
+    parser.add_argument("--policy", choices=POLICIES, default="random")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="graine de la première partie")
+    parser.add_argument("--budget", type=float, default=None, help="MCTS : secondes par décision")
+    parser.add_argument("--workers", type=int, default=None, help="MCTS : processus (0 = aucun)")
+    parser.add_argument("--events-dir", default=None, help="événements des parties (analytics.py)")
+    args = parser.parse_args(argv)
+
+    options = {}
+    if args.budget is not None:
+        options["budget_s"] = args.budget
+    if args.workers is not None:
+        options["workers"] = args.workers
+    policy = make_policy(args.policy, args.seed, **options)
+    sink = None
+    if args.events_dir is not None:
+        from analytics import EventSink
+        sink = EventSink(args.events_dir)
+
+    wins = 0
+    t0 = time.perf_counter()
+    try:
+        for seed in range(args.seed, args.seed + args.games):
+            engine = GameEngine.new_game(seed)
+            if sink is not None:
+                engine.enable_analytics(sink)
+            actions = play_game(engine, policy)
+            wins += engine.win
+            print(f"graine {seed:5d} : {'victoire' if engine.win else 'défaite '} "
+                  f"en {actions:4d} actions, {engine.player.steps:3d} pas restants")
+    finally:
+        if hasattr(policy, "close"):
+            policy.close()
+        if sink is not None:
+            sink.close()
+
+    elapsed = time.perf_counter() - t0
+    print(f"{args.policy} : {wins}/{args.games} victoires ({wins / max(1, args.games):.0%}), "
+          f"{elapsed / max(1, args.games):.2f} s par partie")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
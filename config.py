@@ -0,0 +1,65 @@
+# config.py
+import os
+
+"""
+Réglages qui ne dépendent pas de l'affichage : taille de la grille et
+options BLUEPRINCE_*. Importé par le moteur (manoir, engine) et les outils
+sans fenêtre (server.py, bots.py, workers de mcts / pick_estimates / solver),
+qui ne chargent donc ni pygame ni ses polices. constants.py le réexporte.
+"""
+
+# -------- Grille --------
+# Orientation : 5 colonnes (horizontal) x 9 lignes (vertical)
+COLS, ROWS = 5, 9          # Grille 5 x 9
+
+# -------- Diagnostic : chien de garde des frames lentes --------
+# Activable sans toucher au code : BLUEPRINCE_WATCHDOG=1 python game.py
+WATCHDOG_ENABLED = os.environ.get("BLUEPRINCE_WATCHDOG") == "1"
+WATCHDOG_BUDGET_FACTOR = 2.0   # budget d'une frame = facteur × (1 / FPS)
+WATCHDOG_SAMPLE_MS = 5         # période d'échantillonnage de la pile (ms)
+WATCHDOG_DIR = "slow_frames"   # dossier des flamegraphs (.folded)
+
+# -------- Diagnostic : ramasse-miettes (GC) --------
+# BLUEPRINCE_GC_MONITOR=1 : histogrammes des pauses GC par frame
+# BLUEPRINCE_GC_DEFER=1   : gc.freeze() après chargement + collectes en frames creuses
+GC_MONITOR_ENABLED = os.environ.get("BLUEPRINCE_GC_MONITOR") == "1"
+GC_DEFERRED_MODE = os.environ.get("BLUEPRINCE_GC_DEFER") == "1"
+GC_IDLE_MIN_MS = 4             # marge minimale restante dans la frame pour collecter
+
+# -------- Métriques (metrics.py) --------
+# BLUEPRINCE_METRICS_DIR=... : export Prometheus + instantané JSON en fin de session
+METRICS_DIR = os.environ.get("BLUEPRINCE_METRICS_DIR")
+
+# -------- Mode entraînement --------
+# BLUEPRINCE_PRACTICE=1 : chaque action peut être annulée (U) / rétablie (Y)
+PRACTICE_MODE = os.environ.get("BLUEPRINCE_PRACTICE") == "1"
+
+# -------- Pilote automatique (bot MCTS, mcts.py) --------
+# BLUEPRINCE_AUTOPLAY=1 : la partie démarre en pilote automatique (P pour basculer)
+AUTOPLAY_ENABLED = os.environ.get("BLUEPRINCE_AUTOPLAY") == "1"
+AUTOPLAY_BUDGET_S = float(os.environ.get("BLUEPRINCE_AUTOPLAY_BUDGET", "0.5"))   # réflexion par coup
+
+# -------- Journal d'actions (action_log.py) --------
+# BLUEPRINCE_ACTION_LOG_DIR=... : chaque partie y est enregistrée (.bpl) pour le rejeu
+ACTION_LOG_DIR = os.environ.get("BLUEPRINCE_ACTION_LOG_DIR")
+
+# -------- Événements d'analyse (analytics.py) --------
+# BLUEPRINCE_ANALYTICS_DIR=... : événements des parties en colonnes .npy
+ANALYTICS_DIR = os.environ.get("BLUEPRINCE_ANALYTICS_DIR")
+
+# -------- Profils et classements (profiles.py) --------
+# BLUEPRINCE_PROFILES=0 : résultats non enregistrés
+PROFILES_ENABLED = os.environ.get("BLUEPRINCE_PROFILES", "1") != "0"
+PROFILE_DB_PATH = os.environ.get("BLUEPRINCE_PROFILE_DB", "profiles.db")
+PLAYER_NAME = os.environ.get("BLUEPRINCE_PLAYER") or os.environ.get("USER") or "joueur"
+
+# -------- Sauvegarde (snapshot.py) --------
+SAVE_PATH = os.environ.get("BLUEPRINCE_SAVE_PATH", "blueprince.sav")
+# Sauvegarde automatique (autosave.py) après chaque pose, porte ouverte et achat ;
+# BLUEPRINCE_AUTOSAVE=0 : désactivée
+AUTOSAVE_ENABLED = os.environ.get("BLUEPRINCE_AUTOSAVE", "1") != "0"
+AUTOSAVE_PATH = os.environ.get("BLUEPRINCE_AUTOSAVE_PATH", "autosave.sav")
+
+# -------- Estimations sur les cartes du choix de salle (pick_estimates.py) --------
+# BLUEPRINCE_PICK_ESTIMATES=1 : parties simulées en arrière-plan (un processus par cœur moins un)
+PICK_ESTIMATES_ENABLED = os.environ.get("BLUEPRINCE_PICK_ESTIMATES") == "1"
@@ -2,6 +2,9 @@
 import pygame
 import os
 
+# Grille et réglages sans affichage (importables sans pygame)
+from config import *
+
 # -------- Dossiers / chemins --------
 ASSETS_DIR = "assets"
 
@@ -21,15 +24,13 @@ Constantes du jeu :
 # -------- Fenêtre / Grille --------
 TILE = 85                # Taille d'une case en pixels
 
-# Orientation : 5 colonnes (horizontal) x 9 lignes (vertical)
-COLS, ROWS = 5, 9          # Grille 5 x 9
-
 # Largeur réservée au HUD sur la droite
 HUD_WIDTH = 500
 
 # Taille de la fenêtre :
 WIDTH  = COLS * TILE + HUD_WIDTH
 HEIGHT = ROWS * TILE
+TIMELINE_HEIGHT = 40      # Frise de la visionneuse de rejeu (replay_viewer.py)
 
 FPS = 60                   # Images par seconde
 
@@ -64,6 +65,12 @@ KEY_RIGHT = pygame.K_d
 KEY_CONFIRM = pygame.K_RETURN   # Valider (Entrée)
 KEY_CANCEL  = pygame.K_ESCAPE   # Annuler / quitter un menu (Échap)
 KEY_USE     = pygame.K_SPACE    # Action contextuelle
+KEY_UNDO    = pygame.K_u        # Mode entraînement : annuler la dernière action
+KEY_REDO    = pygame.K_y        # Mode entraînement : rétablir
+KEY_AUTOPLAY = pygame.K_p       # Pilote automatique (bot MCTS) : activer / reprendre la main
+KEY_SAVE    = pygame.K_F5       # Sauvegarde rapide (snapshot.py)
+KEY_LOAD    = pygame.K_F9       # Chargement de la sauvegarde rapide
+KEY_RESUME  = pygame.K_F10      # Chargement de la sauvegarde automatique
 
 # -------- Images Futur options (pour le prochain patch si y'a le temps) --------
 IMG_ROOMS = {}  
\ No newline at end of file
@@ -0,0 +1,1130 @@
+# engine.py
+import random
+from collections import deque
+from typing import Dict, Tuple, List, Set
+
+from manoir import Manor
+from room import Room, RoomType
+from room_data import ALL_ROOMS, clone_room
+from door import DoorLockLevel
+from player import Player
+from random_manager import RandomManager, LazyRandom
+from offers import OfferCache, build_offer_rooms
+from history import CommandLog, recorded, DOOR_OPEN, VISITED, STOCK, SEARCHED, DUG
+from action_log import ActionLog, TRAVEL, UNDO, REDO, OPT_HISTORY
+from planner import RoutePlanner, RoutePlan
+from zobrist import TranspositionTable, zkey, stock_key, K_PLAYER, K_RES, K_PHASE, K_PICK, K_MARK
+from metrics import (
+    ROOM_ROLLS, ROOM_REROLLS, DOOR_OPENS, BLOCKED_CHECKS,
+    SEARCHES, SHOP_PURCHASES, GAME_OUTCOMES,
+    BLOCKED_LATENCY, ROLL_LATENCY, PICK_LATENCY,
+)
+
+from items import (
+    Food, Gem, Key, Die,
+    Shovel, Hammer, LockpickKit,
+    MetalDetector, RabbitFoot,
+)
+
+"""
+Règles du jeu, sans affichage ni boucle pygame.
+
+GameEngine contient tout l'état d'une partie (manoir, joueur, pioche, offres,
+salles fouillées...) et les actions possibles. Game (game.py) en hérite et
+ne s'occupe que des entrées clavier, des assets et du dessin.
+
+Chaque partie a son propre générateur aléatoire (self.random), partagé avec
+le Manor et le RandomManager : une graine donne toujours la même partie,
+et plusieurs parties peuvent tourner dans le même processus.
+"""
+
+# ---------- Actions élémentaires (bots, rejeu, tests) ----------
+
+MOVE_N, MOVE_S, MOVE_E, MOVE_W = 0, 1, 2, 3
+PICK_0, PICK_1, PICK_2 = 4, 5, 6
+REROLL = 7
+SEARCH = 8
+INTERACT = 9
+EAT = 10
+SHOP_1, SHOP_2, SHOP_3, SHOP_4 = 11, 12, 13, 14
+CANCEL = 15
+
+NUM_ACTIONS = 16
+
+MOVE_DIRS = {MOVE_N: "N", MOVE_S: "S", MOVE_E: "E", MOVE_W: "W"}
+DIR_MOVES = {dir_: action for action, dir_ in MOVE_DIRS.items()}
+
+# Nombre maximal d'offres de salles mémorisées (cases de destination)
+OFFER_CACHE_SIZE = 16
+
+# Articles de la boutique : choix -> (coût en or, identifiant métrique)
+SHOP_ITEMS = {
+    1: (5, "key"),
+    2: (3, "food"),
+    3: (8, "die"),
+    4: (12, "rabbit_foot"),
+}
+
+
+class GameEngine:
+    """
+    État et règles d'une partie (sans pygame).
+    """
+
+    def __init__(self, manor: Manor, player: Player, rand: random.Random | None = None):
+        """Initialise l'état du jeu et les valeurs par défaut."""
+        # Générateur aléatoire de la partie (par défaut : celui du manoir)
+        self.random = rand if rand is not None else manor.rng
+
+        # Références vers les données
+        self.manor = manor
+        self.player = player
+        self.rng = RandomManager(self.player, self.random)
+
+        # ---------- Pioche FINIE de salles (par type) ----------
+        self.room_templates: Dict[str, Room] = {tpl.name: tpl for tpl in ALL_ROOMS}
+
+        UNIQUE_ROOM_NAMES = {"Veranda", "Suite royale"}
+        self.room_stock: Dict[str, int] = {}
+        for tpl in ALL_ROOMS:
+            if tpl.name in UNIQUE_ROOM_NAMES:
+                self.room_stock[tpl.name] = 1      # unique
+            else:
+                self.room_stock[tpl.name] = 3      # copies par défaut
+
+        # Hash de Zobrist de la pioche et des salles fouillées / creusées
+        # (le reste de l'état : Manor.zobrist, Inventory.zobrist, _scalar_hash)
+        self._zobrist = 0
+        for name, count in self.room_stock.items():
+            self._zobrist ^= stock_key(name, count)
+
+        # Mémo optionnel de is_player_blocked, indexé par state_hash()
+        self.blocked_table: TranspositionTable | None = None
+
+        # Itinéraires vers l'antichambre (voir route_plan), créé à la demande
+        self._planner: RoutePlanner | None = None
+
+        # États : PLAY | PICK | SHOP | END
+        self.state = "PLAY"
+        self.message = ""
+        self.shop_message = ""  # messages spécifiques à la boutique
+
+        # Sélection de pièces (PICK)
+        self.pick_rooms: List[Room] = []
+        self.pick_idx = 0
+        self._pending_dir: str | None = None
+        self._pending_dest: Tuple[int, int] | None = None
+
+        # Mémorisation des offres par case de destination (voir offers.py)
+        self.offers = OfferCache(OFFER_CACHE_SIZE)
+
+        # Fin de partie
+        self.win = False
+
+        # Salles déjà fouillées (T)
+        self.searched_rooms: Set[Tuple[int, int]] = set()
+
+        # interagir (E)
+        self.dug_rooms: Set[Tuple[int, int]] = set()
+
+        # Journal d'annulation (voir enable_history) et transaction en cours
+        self.history: CommandLog | None = None
+        self._ops: list | None = None
+
+        # Journal d'actions pour le rejeu (voir enable_action_log)
+        self.action_log: ActionLog | None = None
+
+        # Événements pour l'analyse hors ligne (voir enable_analytics)
+        self.analytics = None
+
+        # Points de sauvegarde : +1 après chaque pose de salle, porte ouverte
+        # et achat (voir autosave.py)
+        self.checkpoints = 0
+
+        # Graine des générateurs de forks (voir fork)
+        self._fork_key = id(self)
+        self._forks = 0
+
+        # Effet d'entrée sur la salle de départ
+        start_room = self.manor.get_room(self.player.r, self.player.c)
+        if start_room is not None:
+            self.apply_room_entry_effect(start_room)
+
+    @classmethod
+    def new_game(cls, seed: int | None = None, **kwargs) -> "GameEngine":
+        """Crée une partie complète (manoir + joueur) à partir d'une graine."""
+        rand = random.Random(seed)
+        manor = Manor(rng=rand)
+        player = Player(*manor.start)
+        engine = cls(manor, player, rand, **kwargs)
+        if seed is not None:
+            engine._fork_key = seed
+        return engine
+
+    def fork(self, rand: random.Random | None = None) -> "GameEngine":
+        """
+        Copie indépendante de la partie, pour l'exploration (bots, indices).
+
+        Coût constant (quelques µs), quel que soit le nombre de salles posées :
+        le manoir et l'inventaire sont partagés avec l'original et copiés à
+        l'écriture (voir Manor.fork, Inventory.fork) ; seuls les petits
+        conteneurs bornés (pioche, offres, salles fouillées) sont recopiés.
+
+        Le fork tire son hasard d'un générateur dérivé (déterministe pour une
+        partie à graine) et ne connaît donc pas les tirages futurs de la
+        partie ; rand permet d'imposer un autre générateur.
+        Le fork est toujours un GameEngine (sans affichage), même depuis Game.
+        """
+        self._forks += 1
+        key = hash((self._fork_key, self._forks))
+        if rand is None:
+            rand = LazyRandom(key)
+
+        clone = GameEngine.__new__(GameEngine)
+        clone.__dict__.update(self.__dict__)
+        clone.random = rand
+        clone.manor = self.manor.fork(rand)
+        clone.player = self.player.fork()
+        clone.rng = RandomManager(clone.player, rand)
+        clone.room_stock = dict(self.room_stock)
+        clone.pick_rooms = list(self.pick_rooms)
+        clone.offers = self.offers.fork()
+        clone.searched_rooms = set(self.searched_rooms)
+        clone.dug_rooms = set(self.dug_rooms)
+        clone._fork_key = key
+        clone._forks = 0
+        clone.history = None
+        clone._ops = None
+        clone.action_log = None
+        clone.analytics = None
+        clone._planner = None
+        return clone
+
+    # ---------- Hash de Zobrist (voir zobrist.py) ----------
+
+    def state_hash(self) -> int:
+        """Hash 64 bits de l'état de jeu, en O(1) (parties incrémentales + scalaires)."""
+        return self.manor.zobrist ^ self.player.inventory.zobrist() ^ self._zobrist ^ self._scalar_hash()
+
+    def _scalar_hash(self) -> int:
+        """Éléments de taille fixe : position, ressources, phase, cartes proposées."""
+        inv = self.player.inventory
+        h = (zkey(K_PLAYER, self.player.r, self.player.c)
+             ^ zkey(K_RES, 0, inv.steps) ^ zkey(K_RES, 1, inv.gold) ^ zkey(K_RES, 2, inv.gems)
+             ^ zkey(K_RES, 3, inv.keys) ^ zkey(K_RES, 4, inv.dice)
+             ^ zkey(K_PHASE, self.state))
+        if self.state == "PICK":
+            h ^= zkey(K_PHASE, *self._pending_dest)
+            for i, room in enumerate(self.pick_rooms):
+                h ^= zkey(K_PICK, i, room.name, room.gem_cost)
+        return h
+
+    def set_stock(self, name: str, count: int) -> None:
+        """Change le stock restant d'un modèle (hash tenu à jour)."""
+        self._zobrist ^= stock_key(name, self.room_stock[name]) ^ stock_key(name, count)
+        self.room_stock[name] = count
+
+    def mark_cell(self, kind: int, rc: tuple[int, int]) -> None:
+        """Ajoute rc aux salles fouillées (SEARCHED) ou creusées (DUG)."""
+        cells = self.searched_rooms if kind == SEARCHED else self.dug_rooms
+        if rc in cells:
+            return
+        cells.add(rc)
+        self._zobrist ^= zkey(K_MARK, kind, *rc)
+        if self._ops is not None:
+            self._ops.append((kind, rc))
+
+    def unmark_cell(self, kind: int, rc: tuple[int, int]) -> None:
+        cells = self.searched_rooms if kind == SEARCHED else self.dug_rooms
+        if rc in cells:
+            cells.discard(rc)
+            self._zobrist ^= zkey(K_MARK, kind, *rc)
+
+    # ---------- Itinéraires (voir planner.py) ----------
+
+    def route_plan(self) -> RoutePlan:
+        """Itinéraires les plus courts (pas, puis clés) vers l'antichambre et la frontière."""
+        if self._planner is None:
+            self._planner = RoutePlanner()
+        return self._planner.plan(self)
+
+    # ---------- Annuler / rétablir (voir history.py) ----------
+
+    def enable_history(self, limit: int | None = None) -> None:
+        """Enregistre désormais chaque action pour pouvoir l'annuler."""
+        self.history = CommandLog(limit)
+
+    def undo(self) -> bool:
+        """Annule la dernière action. Retourne False s'il n'y a rien à annuler."""
+        if self.action_log is not None:
+            self.action_log.append(UNDO)
+        return self.history is not None and self.history.undo(self)
+
+    def redo(self) -> bool:
+        """Rétablit la dernière action annulée."""
+        if self.action_log is not None:
+            self.action_log.append(REDO)
+        return self.history is not None and self.history.redo(self)
+
+    # ---------- Journal d'actions (voir action_log.py) ----------
+
+    def enable_action_log(self, seed: int) -> None:
+        """
+        Enregistre désormais apply_action / travel_to / undo / redo pour le rejeu.
+        À appeler juste après new_game(seed) (et enable_history s'il y a lieu).
+        """
+        self.action_log = ActionLog(seed, OPT_HISTORY if self.history is not None else 0)
+
+    # ---------- Événements d'analyse (voir analytics.py) ----------
+
+    def enable_analytics(self, sink) -> None:
+        """
+        Signale désormais à sink (analytics.EventSink) les salles proposées et
+        choisies, portes ouvertes, fouilles, achats et la fin de partie.
+        Les forks n'en signalent pas ; une action annulée reste enregistrée.
+        """
+        self.analytics = sink.game()
+
+
+    # ---------- Gestion des effets d'entrée de salle ----------
+
+    def apply_room_entry_effect(self, room: Room) -> str | None:
+        """
+        Applique l'effet 'à l'entrée' d'une salle, une seule fois (room.visited).
+        Retourne un petit texte à ajouter au message.
+        """
+        if room.visited:
+            return None
+
+        room.visited = True
+        if self._ops is not None:
+            self._ops.append((VISITED, self.player.r, self.player.c))
+        inv = self.player.inventory
+        msg = None
+
+        if room.short == "BED":
+            self.player.steps += 2
+            msg = "Tu te reposes un peu dans cette chambre (+2 pas)."
+
+        elif room.short == "SUI":
+            self.player.steps += 10
+            msg = "Tu te reposes longuement dans la suite royale (+10 pas)."
+
+        elif room.short == "VLT":
+            inv.add_gold(2)
+            inv.add_gems(1)
+            msg = "Tu trouves quelques trésors dès l'entrée (+2 or, +1 gemme)."
+
+        elif room.short == "TRS":
+            inv.add_gold(2)
+            inv.add_keys(1)
+            inv.add_gems(1)
+            msg = "Le sac déborde : +2 or, +1 clé, +1 gemme."
+
+        elif room.short == "VRN":
+            if not inv.has_shovel():
+                inv.add_item(Shovel())
+                msg = "Une pelle traîne ici : tu la prends."
+
+        elif room.short == "TRP":
+            dmg = 5
+            if inv.has_hammer():
+                dmg = 2
+            self.player.steps = max(0, self.player.steps - dmg)
+            msg = f"Un piège violent se déclenche (-{dmg} pas)."
+
+        elif room.short == "CHN":
+            dmg = 3
+            if inv.has_hammer():
+                dmg = 1
+            self.player.steps = max(0, self.player.steps - dmg)
+            msg = f"Des chaînes te ralentissent (-{dmg} pas)."
+
+        return msg
+
+    # ---------- Détection de blocage ----------
+
+    @BLOCKED_LATENCY.timed
+    def is_player_blocked(self) -> bool:
+        """
+        Voir _compute_blocked (mesuré et compté dans les métriques).
+        Avec blocked_table, le résultat est mémorisé par hash d'état, sauf si
+        le calcul a créé des portes (ensure_door, avec tirages) : rejouer depuis
+        le mémo sauterait ces effets et la partie divergerait.
+        """
+        table = self.blocked_table
+        if table is None:
+            blocked = self._compute_blocked()
+        else:
+            key = self.state_hash()
+            blocked = table.get(key)
+            if blocked is None:
+                before = self.manor.zobrist
+                blocked = self._compute_blocked()
+                if self.manor.zobrist == before:
+                    table.put(key, blocked)
+        BLOCKED_CHECKS.inc("true" if blocked else "false")
+        return blocked
+
+    def _compute_blocked(self) -> bool:
+        """
+        Retourne True si le joueur ne peut plus PROGRESSER :
+        - Aucune nouvelle salle ne peut être posée autour de TOUTES les salles accessibles
+          (en tenant compte de la pioche et des verrous de portes).
+        On considère qu'on peut encore jouer tant qu'il existe AU MOINS :
+          * soit une case vide atteignable via une porte ouvrable,
+            sur laquelle on peut poser au moins une salle restante dans la pioche,
+          * soit l'antichambre atteignable (gérée ailleurs pour la victoire).
+        Le fait de pouvoir juste tourner en rond dans les mêmes salles ne suffit PAS :
+        si aucune extension n'est possible, on est bloqué.
+        """
+
+        # Si déjà plus de pas, on est de toute façon en défaite (check_end le gère aussi).
+        if self.player.steps <= 0:
+            return True
+
+        inv = self.player.inventory
+        start_rc = (self.player.r, self.player.c)
+
+        # On explore toutes les salles JOIGNABLES avec l'inventaire actuel
+        visited: set[tuple[int, int]] = set()
+        to_visit: list[tuple[int, int]] = [start_rc]
+
+        while to_visit:
+            r, c = to_visit.pop()
+            if (r, c) in visited:
+                continue
+            visited.add((r, c))
+
+            room_here = self.manor.get_room(r, c)
+            if room_here is None:
+                continue
+
+            # Pour chaque direction depuis cette salle accessible
+            for dir_ in ("N", "S", "E", "W"):
+                dest = self.manor.valid_move((r, c), dir_)
+                if not dest:
+                    # Pas de porte (ou sortie du manoir)
+                    continue
+
+                nr, nc = dest
+
+                # Porte correspondante
+                door = self.manor.ensure_door((r, c), dir_)
+                if door is not None and not (door.is_open or door.can_open(inv)):
+                    # Porte présente mais impossible à ouvrir avec l'inventaire actuel
+                    continue
+
+                dest_room = self.manor.get_room(nr, nc)
+
+                # ---- Cas 1 : case vide derrière une porte ouvrable -> peut-on poser une salle ? ----
+                if dest_room is None:
+                    # On teste toutes les salles encore présentes dans la pioche (room_stock > 0)
+                    for tpl in self.room_templates.values():
+                        if self.room_stock.get(tpl.name, 0) <= 0:
+                            continue
+                        # can_place_room ne fait que lire la salle : pas de copie du modèle
+                        if self.manor.can_place_room(tpl, (nr, nc), dir_):
+                            # On a trouvé AU MOINS UNE extension possible -> le joueur n'est pas bloqué
+                            return False
+                    # Si aucune salle ne peut être posée ici, on continue à chercher ailleurs
+                    continue
+
+                # ---- Cas 2 : salle existante atteignable -> on l'ajoute au BFS ----
+                if (nr, nc) not in visited:
+                    to_visit.append((nr, nc))
+
+        # Si on a exploré toute la zone atteignable sans trouver d'extension possible,
+        # alors le joueur est réellement bloqué.
+        return True
+
+    # ---------- Sélection de salle (PICK) ----------
+
+    @recorded
+    def cancel_pick(self):
+        """Abandonne le tirage en cours (l'offre reste mémorisée pour cette case)."""
+        self.pick_rooms = []
+        self.state = "PLAY"
+        self.message = "Sélection de salle annulée. Choisis une autre porte."
+        self._pending_dir = None
+        self._pending_dest = None
+
+    @recorded
+    def reroll(self) -> bool:
+        """Relance le tirage en cours contre un dé. Retourne True si relancé."""
+        inv = self.player.inventory
+        if not inv.can_reroll_rooms():
+            self.message = "Pas de dé pour relancer le tirage."
+            return False
+
+        if self._pending_dir is None or self._pending_dest is None:
+            self.message = "Impossible de relancer ici."
+            return False
+
+        if not inv.spend_die():
+            self.message = "Pas de dé pour relancer le tirage."
+            return False
+
+        ROOM_REROLLS.inc()
+        self.message = "Tu relances le tirage (1 dé consommé)."
+        self.roll_three_rooms(self._pending_dir, self._pending_dest)
+        return True
+
+    # ---------- Boutique (SHOP) ----------
+
+    def _purchased(self, choice: int, before: tuple | None) -> None:
+        SHOP_PURCHASES.inc(SHOP_ITEMS[choice][1])
+        if self.analytics is not None:
+            self.analytics.purchase(self, choice, before)
+
+    @recorded
+    def buy_shop_item(self, choice: int) -> bool:
+        """
+        Achat dans la boutique :
+        - 1 : Clé (5 or)
+        - 2 : Nourriture (+4 pas) (3 or)
+        - 3 : Dé (8 or)
+        - 4 : Patte de lapin (12 or)
+        Retourne True si l'achat a eu lieu.
+        """
+        inv = self.player.inventory
+        before = self.analytics.before(self) if self.analytics is not None else None
+
+        # Achat n°1 : Clé
+        if choice == 1:
+            cost = 5
+            if inv.gold >= cost:
+                inv.gold -= cost
+                inv.add_keys(1)
+                self._purchased(1, before)
+                self.checkpoints += 1
+                self.shop_message = "Tu achètes une clé (-5 or)."
+                return True
+            self.shop_message = "Pas assez d'or pour la clé."
+            return False
+
+        # Achat n°2 : nourriture (+4 pas)
+        if choice == 2:
+            cost = 3
+            if inv.gold >= cost:
+                inv.gold -= cost
+                inv.add_item(Food("Ration de voyage", 4))
+                self._purchased(2, before)
+                self.checkpoints += 1
+                self.shop_message = "Tu achètes une ration (+4 pas)."
+                return True
+            self.shop_message = "Pas assez d'or pour la nourriture."
+            return False
+
+        # Achat n°3 : dé
+        if choice == 3:
+            cost = 8
+            if inv.gold >= cost:
+                inv.gold -= cost
+                inv.add_dice(1)
+                self._purchased(3, before)
+                self.checkpoints += 1
+                self.shop_message = "Tu achètes un dé (-8 or)."
+                return True
+            self.shop_message = "Pas assez d'or pour le dé."
+            return False
+
+        # Achat n°4 : patte de lapin
+        if choice == 4:
+            cost = 12
+            if inv.gold >= cost:
+                inv.gold -= cost
+                if not inv.has_rabbit_foot():
+                    inv.add_item(RabbitFoot())
+                    self._purchased(4, before)
+                    self.checkpoints += 1
+                    self.shop_message = "Tu achètes une patte de lapin (-12 or)."
+                    return True
+                self.shop_message = "Tu as déjà une patte de lapin."
+            else:
+                self.shop_message = "Pas assez d'or pour la patte de lapin."
+        return False
+
+    @recorded
+    def leave_shop(self):
+        self.state = "PLAY"
+        self.shop_message = ""
+        self.message = "Tu quittes la boutique."
+
+    # ---------- Gestion de la nourriture ----------
+
+    @recorded
+    def use_first_food(self):
+        inv = self.player.inventory
+        from items import Food
+
+        idx_food = None
+        for i, item in enumerate(inv.items):
+            if isinstance(item, Food):
+                idx_food = i
+                break
+
+        if idx_food is None:
+            self.message = "Tu n'as pas de nourriture dans ton inventaire."
+            return
+
+        food_item = inv.items[idx_food]
+        name = food_item.name
+        steps = food_item.steps_restored
+
+        inv.use_item(idx_food, self.player)
+        self.message = f"Tu manges {name} (+{steps} pas)."
+
+    # ---------- Logique de jeu : déplacement ----------
+
+    @recorded
+    def try_move(self, dir_: str):
+        if self.player.steps <= 0:
+            self.lose("Plus de pas !")
+            return
+
+        src_rc = (self.player.r, self.player.c)
+
+        dest = self.manor.valid_move(src_rc, dir_)
+        if not dest:
+            self.message = "Mur."
+            # Si après ce mur il n'existe vraiment aucun autre chemin, on perd.
+            if self.is_player_blocked():
+                self.lose("Le manoir est bloqué : plus aucun chemin possible.")
+            return
+
+        door = self.manor.ensure_door(src_rc, dir_)
+        if door is not None and not door.is_open:
+            # On tente d'ouvrir la porte avec l'inventaire du joueur
+            if not self.manor.open_door(src_rc, dir_, self.player.inventory):
+                # Ouverture impossible : on affiche un message selon le niveau
+                if door.lock_level == DoorLockLevel.LOCKED:
+                    self.message = "Porte verrouillée. Il te faut une clé ou un kit."
+                elif door.lock_level == DoorLockLevel.DOUBLE_LOCKED:
+                    self.message = "Porte à double tour. Il te faut une clé."
+                else:
+                    self.message = "Impossible d'ouvrir cette porte."
+
+                #  on teste si VRAIMENT toutes les directions sont mortes
+                if self.is_player_blocked():
+                    self.lose("Tu ne peux ouvrir aucune porte : le manoir est bloqué.")
+                return
+            else:
+                # Succès de l'ouverture (clé consommée si nécessaire)
+                if self._ops is not None:
+                    self._ops.append((DOOR_OPEN, src_rc[0], src_rc[1], dir_))
+                DOOR_OPENS.inc(door.lock_level.name)
+                if self.analytics is not None:
+                    self.analytics.door(self, src_rc, dir_, door.lock_level)
+                self.checkpoints += 1
+                self.message = "Tu ouvres la porte."
+
+        nr, nc = dest
+        target_room = self.manor.get_room(nr, nc)
+
+        if target_room is None:
+            offer = self.offers.get(dest)
+            if offer is not None:
+                # Offre déjà faite pour cette case (éventuellement par une autre
+                # porte) : on ne garde que les salles qui se raccordent à celle-ci,
+                # à leur prix d'origine. Si la salle gratuite n'en fait plus
+                # partie, nouveau tirage (le prix ne dépend pas de la porte).
+                rooms = [
+                    room for room in build_offer_rooms(offer, self.room_templates)
+                    if self.manor.can_place_room(room, dest, dir_)
+                ]
+                if any(room.gem_cost == 0 for room in rooms):
+                    self._start_pick(rooms, dir_, dest)
+                    return
+
+            self.roll_three_rooms(dir_, dest)
+            if not self.pick_rooms and self.is_player_blocked():
+                self.lose("Le manoir est bloqué : plus aucune pièce ne peut être posée.")
+            return
+
+        # Déplacement dans une pièce déjà connue
+        self.player.steps -= 1
+        self.player.r, self.player.c = nr, nc
+
+        if not target_room.visited:
+            # Elle va être modifiée : copie privée si elle est partagée avec un fork
+            target_room = self.manor.own_room(nr, nc)
+
+        entry_msg = self.apply_room_entry_effect(target_room)
+        if entry_msg:
+            self.message = f"Tu avances vers {dir_}. {entry_msg}"
+        else:
+            self.message = f"Tu avances vers {dir_}."
+
+        self.check_end((nr, nc))
+
+    # ---------- Déplacement rapide (salles déjà posées) ----------
+
+    def open_path(self, dest_rc: tuple[int, int]) -> list[tuple[int, int]] | None:
+        """
+        Plus court chemin vers dest_rc par des portes déjà ouvertes (aucune clé,
+        aucun tirage). Liste des cases traversées sans la case de départ,
+        [] si on y est déjà, None s'il n'existe pas.
+        """
+        start = (self.player.r, self.player.c)
+        if dest_rc == start:
+            return []
+        came_from = {start: None}
+        queue = deque([start])
+        while queue:
+            rc = queue.popleft()
+            for dir_ in ("N", "S", "E", "W"):
+                nxt = self.manor.valid_move(rc, dir_)
+                if nxt is None or nxt in came_from or self.manor.get_room(*nxt) is None:
+                    continue
+                door = self.manor.get_door(rc, dir_)
+                if door is None or not door.is_open:
+                    continue
+                came_from[nxt] = rc
+                if nxt == dest_rc:
+                    path = []
+                    while nxt != start:
+                        path.append(nxt)
+                        nxt = came_from[nxt]
+                    return path[::-1]
+                queue.append(nxt)
+        return None
+
+    @recorded
+    def travel_to(self, r: int, c: int) -> bool:
+        """
+        Va jusqu'à la salle (r, c) en une seule action, par le plus court chemin
+        ouvert. Refusé si le chemin n'existe pas ou si les pas ne suffisent pas.
+        Chaque case traversée coûte un pas et passe par l'effet d'entrée et
+        check_end, comme un déplacement normal.
+        """
+        if self.state != "PLAY":
+            return False
+        if self.action_log is not None:
+            self.action_log.append(TRAVEL, r, c)
+
+        path = self.open_path((r, c))
+        if path is None:
+            self.message = "Aucun chemin ouvert vers cette salle."
+            return False
+        if not path:
+            self.message = "Tu y es déjà."
+            return False
+        # Arriver à 0 pas fait perdre, sauf sur l'antichambre
+        if len(path) > self.player.steps or \
+                (len(path) == self.player.steps and path[-1] != self.manor.antechamber_rc):
+            self.message = f"Pas assez de pas : il en faut {len(path)}."
+            return False
+
+        for nr, nc in path:
+            self.player.steps -= 1
+            self.player.r, self.player.c = nr, nc
+            room = self.manor.get_room(nr, nc)
+            if not room.visited:
+                room = self.manor.own_room(nr, nc)
+            self.apply_room_entry_effect(room)
+            self.check_end((nr, nc))
+            if self.state == "END":
+                return True
+
+        self.message = f"Tu traverses {len(path)} salle{'s' if len(path) > 1 else ''}."
+        return True
+
+    # ---------- Pioche FINIE de salles ----------
+
+    @ROLL_LATENCY.timed
+    def roll_three_rooms(self, dir_: str, dest_rc: tuple[int, int]):
+        ROOM_ROLLS.inc()
+        available_templates = [
+            tpl for tpl in self.room_templates.values()
+            if self.room_stock.get(tpl.name, 0) > 0
+        ]
+
+        candidates: list[Room] = []
+        for tpl in available_templates:
+            if self.manor.can_place_room(tpl, dest_rc, dir_):
+                candidates.append(tpl)
+
+        if not candidates:
+            self.message = "Aucune salle ne peut être placée ici (pioche épuisée ou incompatible)."
+            self.pick_rooms = []
+            return
+
+        self.random.shuffle(candidates)
+        pick_templates = candidates[:3]
+        pick_rooms = [clone_room(tpl) for tpl in pick_templates]
+
+        self._ensure_free_room(pick_rooms)
+
+        self.offers.put(dest_rc, pick_rooms)
+        self._start_pick(pick_rooms, dir_, dest_rc)
+
+    @staticmethod
+    def _ensure_free_room(rooms: list[Room]) -> None:
+        """Au moins une salle gratuite parmi celles proposées."""
+        if rooms and all(room.gem_cost > 0 for room in rooms):
+            rooms[0].gem_cost = 0
+
+    def _start_pick(self, rooms: list[Room], dir_: str, dest_rc: tuple[int, int]) -> None:
+        self.pick_rooms = rooms
+        self.pick_idx = 0
+        self.state = "PICK"
+        self._pending_dir = dir_
+        self._pending_dest = dest_rc
+        self.message = "Choisis une pièce pour cette porte."
+        if self.analytics is not None:
+            self.analytics.offered(self, rooms, dest_rc)
+
+    @recorded
+    @PICK_LATENCY.timed
+    def confirm_pick(self):
+        chosen = self.pick_rooms[self.pick_idx]
+        if chosen.gem_cost > self.player.gems:
+            self.message = "Pas assez de gemmes."
+            return
+
+        self.player.gems -= chosen.gem_cost
+        # Les cartes ne sont jamais modifiées (partagées par les forks et le
+        # journal d'annulation) : on pose une copie
+        chosen = clone_room(chosen)
+
+        r, c = self._pending_dest
+        self.manor.set_room(r, c, chosen)
+        self.offers.invalidate_cell((r, c))
+
+        name = getattr(chosen, "name", None)
+        if name is not None and name in self.room_stock and self.room_stock[name] > 0:
+            if self._ops is not None:
+                self._ops.append((STOCK, name, self.room_stock[name], self.room_stock[name] - 1))
+            self.set_stock(name, self.room_stock[name] - 1)
+            if self.room_stock[name] == 0:
+                self.offers.invalidate_template(name)
+
+        self.state = "PLAY"
+        self.checkpoints += 1
+
+        self.player.steps -= 1
+        self.player.r, self.player.c = r, c
+        if self.analytics is not None:
+            self.analytics.picked(self, chosen, (r, c), self.pick_idx)
+
+        entry_msg = self.apply_room_entry_effect(chosen)
+        if entry_msg:
+            self.message = f"Ajouté: {chosen.name}. {entry_msg}"
+        else:
+            self.message = f"Ajouté: {chosen.name}."
+
+        self.check_end((r, c))
+
+        self.pick_rooms = []
+        self._pending_dir = None
+        self._pending_dest = None
+
+    # ---------- Fin de partie ----------
+
+    def check_end(self, rc: tuple[int, int]):
+        """
+        Détermine si la partie est terminée :
+
+        - Victoire : si on atteint l'antichambre.
+        - Défaite : 
+            * si les pas tombent à 0 ou moins,
+            * ou si le manoir est bloqué (plus aucune nouvelle salle posable
+              ni progression possible à partir des salles accessibles).
+        """
+        # 1) Victoire : on est arrivé à l'antichambre
+        if rc == self.manor.antechamber_rc:
+            self.win = True
+            self.state = "END"
+            GAME_OUTCOMES.inc("win")
+            self.message = "Tu atteins l'antichambre : victoire !"
+            if self.analytics is not None:
+                self.analytics.end(self, None)
+            return
+
+        # 2) Défaite : plus de pas
+        if self.player.steps <= 0:
+            self.lose("Plus de pas !")
+            return
+
+        # 3) Défaite : manoir bloqué (plus aucun chemin possible / aucune nouvelle salle posable)
+        if self.is_player_blocked():
+            self.lose(
+                "Le manoir est bloqué : plus aucune porte ouvrable ni nouvelle salle à poser."
+            )
+    def lose(self, cause: str):
+        self.win = False
+        self.message = cause
+        self.state = "END"
+        GAME_OUTCOMES.inc("lose")
+        if self.analytics is not None:
+            self.analytics.end(self, cause)
+
+    # ---------- Fouille & interactions de salles ----------
+
+    @recorded
+    def search_current_room(self):
+        r, c = self.player.r, self.player.c
+        room = self.manor.get_room(r, c)
+
+        if room is None:
+            self.message = "Rien à fouiller ici."
+            return
+
+        if (r, c) in self.searched_rooms:
+            self.message = "Cette salle a déjà été fouillée."
+            return
+
+        self.mark_cell(SEARCHED, (r, c))
+        SEARCHES.inc()
+        before = self.analytics.before(self) if self.analytics is not None else None
+        self._search_loot(room)
+        if self.analytics is not None:
+            self.analytics.search(self, before)
+
+    def _search_loot(self, room: Room) -> None:
+        """Butin de la fouille de room (salle du joueur), selon la salle."""
+        inv = self.player.inventory
+
+        # Jardin → nourriture ou patte de lapin
+        if room.name == "Jardin intérieur":
+            if not inv.has_rabbit_foot() and self.random.random() < 0.3:
+                inv.add_item(RabbitFoot())
+                self.message = "Tu trouves une patte de lapin porte-bonheur."
+            else:
+                inv.add_item(Food("Fruits frais", 5))
+                self.message = "Tu trouves de la nourriture fraîche (+5 pas)."
+            return
+
+        # Veranda → pelle unique
+        if room.name == "Veranda":
+            if not inv.has_shovel():
+                inv.add_item(Shovel())
+                self.message = "Tu trouves une pelle appuyée contre le mur."
+            else:
+                inv.add_item(Food("Collation", 3))
+                self.message = "Tu trouves un petit encas (+3 pas)."
+            return
+
+        # Salle des coffres → loot massif
+        if room.name == "Salle des coffres":
+            inv.add_gems(2)
+            inv.add_gold(5)
+            inv.add_keys(1)
+            self.message = "Tu ouvres un coffre rempli : +2 gemmes, +5 or, +1 clé."
+            return
+
+        # Salle avec sac → gros loot orienté or
+        if room.name == "Salle avec sac":
+            inv.add_gold(4)
+            inv.add_gems(1)
+            inv.add_keys(1)
+            self.message = "Le sac est lourd : +4 or, +1 gemme, +1 clé."
+            return
+
+        # Suite royale → détecteur ou repos
+        if room.name == "Suite royale":
+            if not inv.has_detector():
+                inv.add_item(MetalDetector())
+                self.message = "Tu trouves un détecteur de métaux !"
+            else:
+                self.player.steps += 5
+                self.message = "Tu te reposes dans le lit royal (+5 pas)."
+            return
+
+        # Chambre d’ami → détecteur unique
+        if room.name == "Chambre d'ami":
+            if not inv.has_detector():
+                inv.add_item(MetalDetector())
+                self.message = "Tu trouves un détecteur de métaux sous un oreiller !"
+            else:
+                inv.add_item(Food("Encas", 3))
+                self.message = "Tu trouves un encas (+3 pas)."
+            return
+
+        # Cellule → lockpick unique
+        if room.name == "Cellule":
+            if not inv.has_lockpick():
+                inv.add_item(LockpickKit())
+                self.message = "Tu trouves un kit de crochetage caché."
+            else:
+                inv.add_keys(1)
+                self.message = "Tu récupères une petite clé."
+            return
+
+        # Marchand ambulant → patte de lapin possible en fouille aussi
+        if room.name == "Marchand ambulant":
+            if not inv.has_rabbit_foot():
+                inv.add_item(RabbitFoot())
+                self.message = "Le marchand te donne une patte de lapin."
+            else:
+                inv.add_gold(1)
+                self.message = "Il te donne une pièce d'or."
+            return
+
+        # Salle piégée (fouille = piège)
+        if room.room_type == RoomType.TRAP:
+            self.player.steps = max(0, self.player.steps - 3)
+            self.message = "Un piège se déclenche ! (-3 pas)"
+            return
+
+        # Fouille par défaut
+        item = self.rng.draw_consumable()
+        inv = self.player.inventory
+
+        if isinstance(item, Food):
+            inv.add_item(item)
+            self.message = f"Tu trouves de la nourriture : {item.name}"
+        elif isinstance(item, Gem):
+            inv.add_gems(1)
+            self.message = "Tu trouves une gemme."
+        elif isinstance(item, Key):
+            inv.add_keys(1)
+            self.message = "Tu trouves une clé."
+        elif isinstance(item, Die):
+            inv.add_dice(1)
+            self.message = "Tu trouves un dé."
+        else:
+            inv.add_item(item)
+            self.message = f"Tu trouves un objet : {item.name}"
+
+    @recorded
+    def interact_current_room(self):
+        r, c = self.player.r, self.player.c
+        room = self.manor.get_room(r, c)
+
+        if room is None:
+            self.message = "Rien de spécial ici."
+            return
+
+        inv = self.player.inventory
+
+        # Entrée : marteau caché si on a une pelle
+        if room.room_type == RoomType.ENTRANCE:
+            if not inv.has_shovel():
+                self.message = "Le sol semble meuble, une pelle serait utile (E)."
+                return
+
+            if (r, c) in self.dug_rooms:
+                if inv.has_hammer():
+                    self.message = "Tu as déjà trouvé le marteau ici."
+                else:
+                    self.message = "Tu as déjà creusé ici."
+                return
+
+            self.mark_cell(DUG, (r, c))
+            if not inv.has_hammer():
+                inv.add_item(Hammer())
+                self.message = "Tu déterres un vieux marteau !"
+            else:
+                self.message = "Tu ne trouves plus rien d'utile."
+            return
+
+        # Jardin : creuser avec pelle
+        if room.name == "Jardin intérieur":
+            if not inv.has_shovel():
+                self.message = "Tu pourrais creuser ici avec une pelle (E)."
+                return
+
+            if (r, c) in self.dug_rooms:
+                self.message = "Tu as déjà creusé dans ce jardin."
+                return
+
+            self.mark_cell(DUG, (r, c))
+            roll = self.random.random()
+            if roll < 0.4:
+                inv.add_gems(1)
+                self.message = "Tu déterres une gemme."
+            elif roll < 0.7:
+                inv.add_item(Food("Conserves enterrées", steps_restored=4))
+                self.message = "Tu trouves des conserves (+4 pas)."
+            else:
+                inv.add_dice(1)
+                self.message = "Tu déterres un vieux dé."
+            return
+
+        # Veranda : interaction simple
+        if room.name == "Veranda":
+            if not inv.has_shovel():
+                self.message = "Une pelle traîne probablement ici... fouille la salle (T)."
+            else:
+                self.message = "Rien de plus à faire ici."
+            return
+
+        # Boutique / Marchand : ouvrir la boutique si on a de l'or
+        if room.name in ("Boutique", "Marchand ambulant"):
+            if self.player.gold <= 0:
+                self.message = "Tu n'as pas d'or pour acheter quelque chose."
+            else:
+                self.state = "SHOP"
+                self.shop_message = ""
+                self.message = "La boutique est ouverte (1-4 pour acheter, Échap pour quitter)."
+            return
+
+        self.message = "Rien de spécial à faire ici."
+
+    # ---------- Actions élémentaires ----------
+
+    def legal_actions(self) -> list[int]:
+        """
+        Actions qui ont un sens dans l'état courant (pas forcément utiles :
+        un déplacement peut buter sur un mur ou une porte verrouillée).
+        """
+        if self.state == "PLAY":
+            return [MOVE_N, MOVE_S, MOVE_E, MOVE_W, SEARCH, INTERACT, EAT]
+
+        if self.state == "PICK":
+            actions = [PICK_0 + i for i, room in enumerate(self.pick_rooms)
+                       if room.gem_cost <= self.player.gems]
+            if self.player.inventory.can_reroll_rooms():
+                actions.append(REROLL)
+            actions.append(CANCEL)
+            return actions
+
+        if self.state == "SHOP":
+            gold = self.player.gold
+            actions = [SHOP_1 + choice - 1 for choice, (cost, _) in SHOP_ITEMS.items() if gold >= cost]
+            actions.append(CANCEL)
+            return actions
+
+        return []
+
+    @recorded
+    def apply_action(self, action: int) -> None:
+        """Applique une action élémentaire (voir MOVE_N ... CANCEL)."""
+        if self.state == "END":
+            return
+        if self.action_log is not None:
+            self.action_log.append(action)
+
+        if self.state == "PLAY":
+            if action in MOVE_DIRS:
+                self.try_move(MOVE_DIRS[action])
+            elif action == SEARCH:
+                self.search_current_room()
+            elif action == INTERACT:
+                self.interact_current_room()
+            elif action == EAT:
+                self.use_first_food()
+
+        elif self.state == "PICK":
+            if PICK_0 <= action <= PICK_2:
+                idx = action - PICK_0
+                if idx < len(self.pick_rooms):
+                    previous = self.pick_idx
+                    self.pick_idx = idx
+                    self.confirm_pick()
+                    if self.state == "PICK":
+                        # Choix refusé : le curseur ne bouge pas (comme au clavier), et
+                        # l'action ne laisse pas de transaction d'historique au rejeu
+                        self.pick_idx = previous
+            elif action == REROLL:
+                self.reroll()
+            elif action == CANCEL:
+                self.cancel_pick()
+
+        elif self.state == "SHOP":
+            if SHOP_1 <= action <= SHOP_4:
+                self.buy_shop_item(action - SHOP_1 + 1)
+            elif action == CANCEL:
+                self.leave_shop()
@@ -0,0 +1,300 @@
+# env.py
+import argparse
+import itertools
+import multiprocessing as mp
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import ROWS, COLS
+from items import Food
+from engine import GameEngine, NUM_ACTIONS
+from batch_sim import TemplateTable, DIRS, DR, DC, PERM_BITS
+
+"""
+Environnement d'apprentissage par renforcement (interface façon Gym).
+
+- reset(seed) -> (obs, info)
+- step(action) -> (obs, reward, terminated, truncated, info)
+- Actions : les codes élémentaires de engine.py (MOVE_*, PICK_*, REROLL,
+  SEARCH, INTERACT, EAT, SHOP_*, CANCEL) ; obs["mask"] = actions légales.
+- Récompense : +1 victoire, -1 défaite, 0 sinon.
+
+Les observations sont des vues NumPy sur un tampon fixe mis à jour sur place
+après chaque action (seules les cases / portes touchées sont réécrites) :
+aucun tableau n'est recréé. Le même agencement sert au SubprocVectorEnv,
+où le tampon est un bloc de mémoire partagée : chaque processus écrit
+directement dans sa ligne, le processus principal lit sans copie.
+"""
+
+# Phases (mêmes codes que batch_sim pour PLAY / PICK / END)
+PHASES = {"PLAY": 0, "PICK": 1, "END": 2, "SHOP": 3}
+
+# Colonnes de obs["inventory"]
+INVENTORY_FIELDS = ("steps", "gold", "gems", "keys", "dice", "perms", "food")
+
+# (nom, forme, type) des tableaux d'observation
+OBS_SPEC = (
+    ("grid", (ROWS, COLS), np.int16),          # id de modèle (-1 = case vide)
+    ("visited", (ROWS, COLS), np.bool_),
+    ("doors", (ROWS, COLS, 4), np.int8),       # niveau N/S/E/W (-1 = pas encore tirée)
+    ("door_open", (ROWS, COLS, 4), np.bool_),
+    ("inventory", (len(INVENTORY_FIELDS),), np.int32),
+    ("position", (2,), np.int32),
+    ("offer", (3, 2), np.int16),               # (id, coût) des cartes, -1 sinon
+    ("phase", (), np.int8),
+    ("mask", (NUM_ACTIONS,), np.bool_),
+)
+
+TEMPLATES = TemplateTable()
+
+
+def _field_bytes(shape, dtype, n: int) -> int:
+    size = n * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+    return (size + 7) // 8 * 8   # aligné sur 8 octets
+
+
+def obs_nbytes(n_envs: int) -> int:
+    """Taille du tampon d'observations pour n_envs environnements."""
+    return sum(_field_bytes(shape, dtype, n_envs) for _, shape, dtype in OBS_SPEC)
+
+
+def obs_arrays(buffer, n_envs: int) -> dict[str, np.ndarray]:
+    """
+    Découpe buffer en tableaux (n_envs, *forme), champ par champ : la ligne i
+    de chaque tableau est l'observation de l'environnement i.
+    """
+    arrays, offset = {}, 0
+    for name, shape, dtype in OBS_SPEC:
+        arrays[name] = np.ndarray((n_envs,) + shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += _field_bytes(shape, dtype, n_envs)
+    return arrays
+
+
+class BluePrinceEnv:
+    """Une partie de GameEngine vue comme un environnement."""
+
+    def __init__(self, obs: dict[str, np.ndarray] | None = None, max_actions: int = 2000):
+        if obs is None:
+            obs = {name: arr[0, ...] for name, arr in obs_arrays(np.zeros(obs_nbytes(1), np.uint8), 1).items()}
+        self.obs = obs
+        self.max_actions = max_actions
+        self.engine: GameEngine | None = None
+        self.actions = 0
+        self._doors_seen = 0
+
+    # ----------------------------
+    # Interface
+    # ----------------------------
+
+    def reset(self, seed: int | None = None):
+        self.engine = GameEngine.new_game(seed)
+        self.actions = 0
+        self._doors_seen = 0
+
+        self.obs["grid"][:] = -1
+        self.obs["visited"][:] = False
+        self.obs["doors"][:] = -1
+        self.obs["door_open"][:] = False
+        for r in range(ROWS):
+            for c in range(COLS):
+                self._refresh_cell(r, c)
+        self._refresh_doors()
+        self._refresh_state()
+        return self.obs, {}
+
+    def step(self, action: int):
+        engine = self.engine
+        prev = (engine.player.r, engine.player.c)
+
+        engine.apply_action(int(action))
+        self.actions += 1
+
+        # Seules la case d'arrivée (pose, visite) et les portes de la case de
+        # départ (ouverture) peuvent changer ; les nouvelles portes sont
+        # ajoutées en fin de Manor.doors.
+        self._refresh_cell(engine.player.r, engine.player.c)
+        self._refresh_doors(prev)
+        self._refresh_state()
+
+        terminated = engine.state == "END"
+        truncated = not terminated and self.actions >= self.max_actions
+        reward = (1.0 if engine.win else -1.0) if terminated else 0.0
+        return self.obs, reward, terminated, truncated, {"message": engine.message}
+
+    def action_mask(self) -> np.ndarray:
+        return self.obs["mask"]
+
+    # ----------------------------
+    # Mise à jour des vues
+    # ----------------------------
+
+    def _refresh_cell(self, r: int, c: int) -> None:
+        room = self.engine.manor.get_room(r, c)
+        self.obs["grid"][r, c] = TEMPLATES.id_of(room)
+        self.obs["visited"][r, c] = room is not None and room.visited
+
+    def _refresh_doors(self, around: tuple[int, int] | None = None) -> None:
+        doors = self.engine.manor.doors
+        levels, opened = self.obs["doors"], self.obs["door_open"]
+
+        for (r, c, dir_), door in itertools.islice(doors.items(), self._doors_seen, None):
+            d = DIRS.index(dir_)
+            levels[r, c, d] = door.lock_level.value
+            opened[r, c, d] = door.is_open
+        self._doors_seen = len(doors)
+
+        if around is not None:
+            r, c = around
+            for d, dir_ in enumerate(DIRS):
+                door = doors.get((r, c, dir_))
+                if door is not None and door.is_open and not opened[r, c, d]:
+                    opened[r, c, d] = opened[r + DR[d], c + DC[d], d ^ 1] = True
+
+    def _refresh_state(self) -> None:
+        engine = self.engine
+        inv = engine.player.inventory
+        perms = sum(bit for cls, bit in PERM_BITS.items() if cls in inv.permanent_items)
+        food = sum(isinstance(item, Food) for item in inv.items)
+        self.obs["inventory"][:] = (inv.steps, inv.gold, inv.gems, inv.keys, inv.dice, perms, food)
+        self.obs["position"][:] = (engine.player.r, engine.player.c)
+
+        offer = self.obs["offer"]
+        offer[:] = -1
+        if engine.state == "PICK":
+            for i, room in enumerate(engine.pick_rooms[:3]):
+                offer[i] = (TEMPLATES.ids[room.name], room.gem_cost)
+
+        self.obs["phase"][...] = PHASES[engine.state]
+        mask = self.obs["mask"]
+        mask[:] = False
+        mask[engine.legal_actions()] = True
+
+
+# ---------- Environnement vectorisé (processus + mémoire partagée) ----------
+
+def _worker(conn, shm_name: str, n_envs: int, index: int, seed: int, max_actions: int) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    env = BluePrinceEnv({name: arr[index, ...] for name, arr in obs_arrays(shm.buf, n_envs).items()},
+                        max_actions)
+    episode = 0
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == "reset":
+                seed, episode = arg, 0
+                env.reset(seed + index)
+                conn.send(None)
+            elif cmd == "step":
+                _, reward, terminated, truncated, info = env.step(arg)
+                if terminated or truncated:
+                    # Réinitialisation automatique : l'observation est celle
+                    # de la partie suivante, l'issue est dans info
+                    info["final_win"] = env.engine.win
+                    episode += 1
+                    env.reset(seed + index + n_envs * episode)
+                conn.send((reward, terminated, truncated, info))
+            elif cmd == "close":
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        env.obs = None
+        del env
+        shm.close()
+
+
+class SubprocVectorEnv:
+    """
+    N BluePrinceEnv dans N processus. self.obs contient les tableaux
+    (N, ...) en mémoire partagée, remplis par les processus à chaque pas.
+    """
+
+    def __init__(self, n_envs: int, seed: int = 0, max_actions: int = 2000):
+        self.n_envs = n_envs
+        self._shm = shared_memory.SharedMemory(create=True, size=obs_nbytes(n_envs))
+        self.obs = obs_arrays(self._shm.buf, n_envs)
+
+        self._conns, self._procs = [], []
+        for i in range(n_envs):
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_worker, args=(child, self._shm.name, n_envs, i, seed, max_actions),
+                              daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self.seed = seed
+
+    def reset(self, seed: int | None = None):
+        if seed is not None:
+            self.seed = seed
+        for conn in self._conns:
+            conn.send(("reset", self.seed))
+        for conn in self._conns:
+            conn.recv()
+        return self.obs, {}
+
+    def step(self, actions):
+        for conn, action in zip(self._conns, actions):
+            conn.send(("step", int(action)))
+        results = [conn.recv() for conn in self._conns]
+        rewards, terminated, truncated, infos = zip(*results)
+        return (self.obs, np.array(rewards), np.array(terminated), np.array(truncated), list(infos))
+
+    def close(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=1)
+        self.obs = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _random_legal(rng: np.random.Generator, mask: np.ndarray) -> np.ndarray:
+    """Une action légale au hasard par ligne de mask (N, NUM_ACTIONS)."""
+    scores = rng.random(mask.shape) * mask
+    return scores.argmax(axis=1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Débit de l'environnement (pas/s).")
+    parser.add_argument("--envs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--steps", type=int, default=5000, help="pas par environnement")
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    env = BluePrinceEnv()
+    obs, _ = env.reset(0)
+    t0 = time.perf_counter()
+    for _ in range(args.steps):
+        obs, _, terminated, truncated, _ = env.step(_random_legal(rng, obs["mask"][None])[0])
+        if terminated or truncated:
+            obs, _ = env.reset()
+    print(f"1 environnement (même processus) : {args.steps / (time.perf_counter() - t0):,.0f} pas/s")
+
+    for n in args.envs:
+        with SubprocVectorEnv(n) as venv:
+            obs, _ = venv.reset()
+            t0 = time.perf_counter()
+            for _ in range(args.steps):
+                obs, *_ = venv.step(_random_legal(rng, obs["mask"]))
+            elapsed = time.perf_counter() - t0
+        print(f"{n} processus : {n * args.steps / elapsed:,.0f} pas/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# fork_bench.py
+import argparse
+import copy
+import random
+import sys
+import time
+
+from engine import GameEngine
+from bots import RandomPolicy
+
+"""
+Vérification et mesure de GameEngine.fork().
+
+- Indépendance : après un fork, jouer le fork jusqu'au bout ne change pas
+  l'original, et inversement.
+- Équivalence : un fork qui reçoit une copie du générateur de l'original
+  joue exactement comme un copy.deepcopy de la partie.
+- Coût : fork() vs copy.deepcopy() à différents moments de la partie.
+
+    python fork_bench.py --games 200     # code de sortie 1 en cas d'écart
+"""
+
+
+def state_digest(engine: GameEngine) -> tuple:
+    """Résumé comparable de tout l'état de jeu d'une partie."""
+    manor, inv = engine.manor, engine.player.inventory
+    grid = tuple(
+        (room.name, room.visited, room.gem_cost) if room is not None else None
+        for row in manor.grid for room in row
+    )
+    doors = tuple(sorted((key, door.lock_level.value, door.is_open) for key, door in manor.doors.items()))
+    inventory = (
+        inv.steps, inv.gold, inv.gems, inv.keys, inv.dice,
+        tuple(item.name for item in inv.items),
+        tuple(sorted(cls.__name__ for cls in inv.permanent_items)),
+    )
+    return (
+        grid, doors, inventory,
+        (engine.player.r, engine.player.c), engine.state, engine.win,
+        tuple(sorted(engine.room_stock.items())),
+        tuple((room.name, room.gem_cost, room.visited) for room in engine.pick_rooms),
+        tuple(engine.offers.items()),
+        tuple(sorted(engine.searched_rooms)), tuple(sorted(engine.dug_rooms)),
+    )
+
+
+def _play(engine: GameEngine, policy: RandomPolicy, max_actions: int) -> list[int]:
+    actions = []
+    while engine.state != "END" and len(actions) < max_actions:
+        action = policy.choose(engine)
+        engine.apply_action(action)
+        actions.append(action)
+    return actions
+
+
+def check_game(seed: int, prefix: int) -> list[str]:
+    """Erreurs d'isolation / d'équivalence pour une partie (liste vide si tout va bien)."""
+    errors = []
+    engine = GameEngine.new_game(seed)
+    _play(engine, RandomPolicy(seed), prefix)
+
+    # 1) Le fork joue seul : l'original ne bouge pas
+    before = state_digest(engine)
+    child = engine.fork()
+    _play(child, RandomPolicy(seed + 1), 2000)
+    if state_digest(engine) != before:
+        errors.append("l'original a changé en jouant le fork")
+
+    # 2) L'original joue seul : le fork ne bouge pas
+    child = engine.fork()
+    child_before = state_digest(child)
+    _play(engine, RandomPolicy(seed + 2), 2000)
+    if state_digest(child) != child_before:
+        errors.append("le fork a changé en jouant l'original")
+
+    # 3) Fork (même générateur) == deepcopy, sur les mêmes actions
+    engine = GameEngine.new_game(seed)
+    _play(engine, RandomPolicy(seed), prefix)
+    reference = copy.deepcopy(engine)
+    rand = random.Random()
+    rand.setstate(engine.random.getstate())
+    child = engine.fork(rand)
+    for action in _play(reference, RandomPolicy(seed + 3), 2000):
+        child.apply_action(action)
+    if state_digest(child) != state_digest(reference):
+        errors.append("le fork diverge de deepcopy")
+    return errors
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vérification et coût de GameEngine.fork().")
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for seed in range(args.games):
+        errors = check_game(seed, prefix=seed % 60)
+        if errors:
+            failures += 1
+            print(f"graine {seed} : {errors}")
+    print(f"Isolation / équivalence : {args.games - failures}/{args.games} parties correctes")
+
+    for prefix in (0, 30, 120):
+        engine = GameEngine.new_game(7)
+        _play(engine, RandomPolicy(7), prefix)
+        rooms = sum(room is not None for row in engine.manor.grid for room in row)
+        fork_us = _time_per_call(engine.fork, 20000)
+        deep_us = _time_per_call(lambda: copy.deepcopy(engine), 200)
+        print(f"{rooms:2d} salles, {len(engine.manor.doors):3d} portes : "
+              f"fork {fork_us:.1f} µs, deepcopy {deep_us:.0f} µs")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,23 @@
 # game.py
-import pygame, random
-from typing import Dict, Tuple, List, Set
+import pygame, random, time, os
+from concurrent.futures import BrokenExecutor
 
 from sprites import load_tileset  
 from constants import ITEMS_TILESET_PATH, ROOMS_TILESET_PATH
 from constants import *
 from manoir import Manor
-from room import Room, RoomType
-from room_data import ALL_ROOMS, clone_room
-from door import DoorLockLevel
 from player import Player
-from random_manager import RandomManager
-
-from items import (
-    Food, Gem, Key, Die,
-    Shovel, Hammer, LockpickKit,
-    MetalDetector, RabbitFoot,
-)
+from engine import GameEngine, DIR_MOVES, PICK_0, REROLL, SEARCH, INTERACT, EAT, SHOP_1, CANCEL
+from action_log import LOG_SUFFIX
+from mcts import MCTSPolicy
+from planner import hint_text
+from pick_estimates import PickEstimator
+import snapshot
+from autosave import AutoSaver
+from profiles import ProfileStore, GameResult
+from watchdog import FrameWatchdog
+from gc_monitor import GCMonitor, DeferredGC
+from metrics import METRICS, TILES_LOADED
 
 from ui import (
     draw_grid, draw_player, draw_hud,
@@ -25,13 +26,26 @@ from ui import (
 )
 
 
-class Game:
+class Game(GameEngine):
     """
-    Orchestrateur principal du jeu.
+    Orchestrateur principal du jeu : entrées clavier, assets et affichage.
+    Les règles sont dans GameEngine (engine.py).
     """
 
-    def __init__(self, manor: Manor, player: Player):
-        """Initialise Pygame, l'état du jeu et les valeurs par défaut."""
+    # Attributs d'affichage, retirés des forks (qui sont des GameEngine)
+    _UI_ATTRS = (
+        "screen", "clock", "running", "item_icons", "room_tiles", "pending_dir",
+        "_blink_visible", "_pulse_phase", "autoplay", "_autoplay_decision",
+        "pick_estimator", "autosaver", "_saved_checkpoints", "event_sink",
+        "profiles", "_seed", "_started", "_board", "_board_lines",
+    )
+
+    def __init__(self, manor: Manor, player: Player, rand: random.Random | None = None,
+                 seed: int | None = None):
+        """
+        Initialise Pygame, l'état du jeu et les valeurs par défaut.
+        seed : graine de rand, nécessaire pour enregistrer la partie (ACTION_LOG_DIR).
+        """
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("Blue Prince 2D (simplifié)")
@@ -44,60 +58,67 @@ class Game:
         # Tileset graphique des salles
         self.room_tiles = self._load_room_tiles()
 
-        # Références vers les données
-        self.manor = manor
-        self.player = player
-        self.rng = RandomManager(self.player)
-
-        # ---------- Pioche FINIE de salles (par type) ----------
-        self.room_templates: Dict[str, Room] = {tpl.name: tpl for tpl in ALL_ROOMS}
-
-        UNIQUE_ROOM_NAMES = {"Veranda", "Suite royale"}
-        self.room_stock: Dict[str, int] = {}
-        for tpl in ALL_ROOMS:
-            if tpl.name in UNIQUE_ROOM_NAMES:
-                self.room_stock[tpl.name] = 1      # unique
-            else:
-                self.room_stock[tpl.name] = 3      # copies par défaut
+        # État de la partie + règles
+        super().__init__(manor, player, rand)
 
         # Associer les sprites aux salles
         self.init_room_images()
 
-        # États : PLAY | PICK | SHOP | END
-        self.state = "PLAY"
-        self.message = ""
-        self.shop_message = ""  # messages spécifiques à la boutique
+        # Mode entraînement : actions annulables
+        if PRACTICE_MODE:
+            self.enable_history()
+
+        # Journal d'actions (rejeu, rapports de bug)
+        if ACTION_LOG_DIR and seed is not None:
+            self.enable_action_log(seed)
+
+        # Événements d'analyse (écrits par lots, sink gardé d'une partie à l'autre)
+        if not hasattr(self, "event_sink"):
+            self.event_sink = None
+            if ANALYTICS_DIR:
+                from analytics import EventSink     # numpy : seulement si activé
+                self.event_sink = EventSink(ANALYTICS_DIR)
+        if self.event_sink is not None:
+            self.enable_analytics(self.event_sink)
 
         # Sélection direction (PLAY)
         self.pending_dir: str | None = None  # "N","S","E","W" ou None
 
-        # Sélection de pièces (PICK)
-        self.pick_rooms: List[Room] = []
-        self.pick_idx = 0
-        self._pending_dir: str | None = None
-        self._pending_dest: Tuple[int, int] | None = None
-        self._pending_key: Tuple[int, int, str] | None = None
-
-        # Mémorisation des offres par porte :
-        self.door_offers: dict[tuple[int, int, str], dict] = {}
+        # Pilote automatique : le pool de processus est gardé d'une partie à l'autre
+        if not hasattr(self, "autoplay"):
+            self.autoplay: MCTSPolicy | None = None
+            if AUTOPLAY_ENABLED:
+                self.toggle_autoplay()
+        self._autoplay_decision = None
+
+        # Estimations des cartes du choix de salle (pool gardé d'une partie à l'autre)
+        if not hasattr(self, "pick_estimator"):
+            self.pick_estimator: PickEstimator | None = None
+            if PICK_ESTIMATES_ENABLED:
+                self.pick_estimator = PickEstimator(max(1, (os.cpu_count() or 2) - 1))
+
+        # Sauvegarde automatique (thread d'écriture gardé d'une partie à l'autre)
+        if not hasattr(self, "autosaver"):
+            self.autosaver = AutoSaver(AUTOSAVE_PATH) if AUTOSAVE_ENABLED else None
+        self._saved_checkpoints = self.checkpoints
+
+        # Profils : résultat enregistré en fin de partie (thread d'écriture gardé d'une partie à l'autre)
+        if not hasattr(self, "profiles"):
+            self.profiles = ProfileStore(PROFILE_DB_PATH) if PROFILES_ENABLED else None
+        self._seed = seed
+        self._started = time.monotonic()
+        self._board = None          # Future des classements (profiles.Leaderboard)
+        self._board_lines: list[str] = []
 
         # Effets visuels
         self._blink_visible = True
         self._pulse_phase = 0.0
 
-        # Fin de partie
-        self.win = False
-
-        # Salles déjà fouillées (T)
-        self.searched_rooms: Set[Tuple[int, int]] = set()
-
-        # interagir (E)
-        self.dug_rooms: Set[Tuple[int, int]] = set()
-
-        # Effet d'entrée sur la salle de départ
-        start_room = self.manor.get_room(self.player.r, self.player.c)
-        if start_room is not None:
-            self.apply_room_entry_effect(start_room)
+    def fork(self, rand: random.Random | None = None) -> GameEngine:
+        clone = super().fork(rand)
+        for name in self._UI_ATTRS:
+            clone.__dict__.pop(name, None)
+        return clone
 
     # ---------- Chargement des assets ----------
 
@@ -125,7 +146,7 @@ class Game:
                 sub = pygame.transform.smoothscale(sub, (dst_size, dst_size))
                 tiles.append(sub)
 
-        print("DEBUG: tileset HUD chargé, nb de tuiles =", len(tiles))
+        TILES_LOADED.set(len(tiles), "hud")
 
         def safe(idx):
             return tiles[idx] if 0 <= idx < len(tiles) else None
@@ -174,7 +195,7 @@ class Game:
                 sub = pygame.transform.smoothscale(sub, (TILE, TILE))
                 tiles.append(sub)
 
-        print("DEBUG: tileset salles chargé, nb =", len(tiles))
+        TILES_LOADED.set(len(tiles), "rooms")
         return tiles
 
     def init_room_images(self):
@@ -197,134 +218,6 @@ class Game:
                 if 0 <= idx < len(self.room_tiles):
                     room.image = self.room_tiles[idx]
 
-    # ---------- Gestion des effets d'entrée de salle ----------
-
-    def apply_room_entry_effect(self, room: Room) -> str | None:
-        """
-        Applique l'effet 'à l'entrée' d'une salle, une seule fois (room.visited).
-        Retourne un petit texte à ajouter au message.
-        """
-        if room.visited:
-            return None
-
-        room.visited = True
-        inv = self.player.inventory
-        msg = None
-
-        if room.short == "BED":
-            self.player.steps += 2
-            msg = "Tu te reposes un peu dans cette chambre (+2 pas)."
-
-        elif room.short == "SUI":
-            self.player.steps += 10
-            msg = "Tu te reposes longuement dans la suite royale (+10 pas)."
-
-        elif room.short == "VLT":
-            inv.add_gold(2)
-            inv.add_gems(1)
-            msg = "Tu trouves quelques trésors dès l'entrée (+2 or, +1 gemme)."
-
-        elif room.short == "TRS":
-            inv.add_gold(2)
-            inv.add_keys(1)
-            inv.add_gems(1)
-            msg = "Le sac déborde : +2 or, +1 clé, +1 gemme."
-
-        elif room.short == "VRN":
-            if not inv.has_shovel():
-                inv.add_item(Shovel())
-                msg = "Une pelle traîne ici : tu la prends."
-
-        elif room.short == "TRP":
-            dmg = 5
-            if inv.has_hammer():
-                dmg = 2
-            self.player.steps = max(0, self.player.steps - dmg)
-            msg = f"Un piège violent se déclenche (-{dmg} pas)."
-
-        elif room.short == "CHN":
-            dmg = 3
-            if inv.has_hammer():
-                dmg = 1
-            self.player.steps = max(0, self.player.steps - dmg)
-            msg = f"Des chaînes te ralentissent (-{dmg} pas)."
-
-        return msg
-
-    # ---------- Détection de blocage ----------
-
-    def is_player_blocked(self) -> bool:
-        """
-        Retourne True si le joueur ne peut plus PROGRESSER :
-        - Aucune nouvelle salle ne peut être posée autour de TOUTES les salles accessibles
-          (en tenant compte de la pioche et des verrous de portes).
-        On considère qu'on peut encore jouer tant qu'il existe AU MOINS :
-          * soit une case vide atteignable via une porte ouvrable,
-            sur laquelle on peut poser au moins une salle restante dans la pioche,
-          * soit l'antichambre atteignable (gérée ailleurs pour la victoire).
-        Le fait de pouvoir juste tourner en rond dans les mêmes salles ne suffit PAS :
-        si aucune extension n'est possible, on est bloqué.
-        """
-
-        # Si déjà plus de pas, on est de toute façon en défaite (check_end le gère aussi).
-        if self.player.steps <= 0:
-            return True
-
-        inv = self.player.inventory
-        start_rc = (self.player.r, self.player.c)
-
-        # On explore toutes les salles JOIGNABLES avec l'inventaire actuel
-        visited: set[tuple[int, int]] = set()
-        to_visit: list[tuple[int, int]] = [start_rc]
-
-        while to_visit:
-            r, c = to_visit.pop()
-            if (r, c) in visited:
-                continue
-            visited.add((r, c))
-
-            room_here = self.manor.get_room(r, c)
-            if room_here is None:
-                continue
-
-            # Pour chaque direction depuis cette salle accessible
-            for dir_ in ("N", "S", "E", "W"):
-                dest = self.manor.valid_move((r, c), dir_)
-                if not dest:
-                    # Pas de porte (ou sortie du manoir)
-                    continue
-
-                nr, nc = dest
-
-                # Porte correspondante
-                door = self.manor.ensure_door((r, c), dir_)
-                if door is not None and not (door.is_open or door.can_open(inv)):
-                    # Porte présente mais impossible à ouvrir avec l'inventaire actuel
-                    continue
-
-                dest_room = self.manor.get_room(nr, nc)
-
-                # ---- Cas 1 : case vide derrière une porte ouvrable -> peut-on poser une salle ? ----
-                if dest_room is None:
-                    # On teste toutes les salles encore présentes dans la pioche (room_stock > 0)
-                    for tpl in self.room_templates.values():
-                        if self.room_stock.get(tpl.name, 0) <= 0:
-                            continue
-                        ghost = clone_room(tpl)
-                        if self.manor.can_place_room(ghost, (nr, nc), dir_):
-                            # On a trouvé AU MOINS UNE extension possible -> le joueur n'est pas bloqué
-                            return False
-                    # Si aucune salle ne peut être posée ici, on continue à chercher ailleurs
-                    continue
-
-                # ---- Cas 2 : salle existante atteignable -> on l'ajoute au BFS ----
-                if (nr, nc) not in visited:
-                    to_visit.append((nr, nc))
-
-        # Si on a exploré toute la zone atteignable sans trouver d'extension possible,
-        # alors le joueur est réellement bloqué.
-        return True
-
 
     # ---------- Gestion des effets visuels ----------
 
@@ -339,6 +232,14 @@ class Game:
     # ---------- Gestion des entrées ----------
 
     def handle_play_input(self, event: pygame.event.Event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            # Clic sur une salle déjà posée : déplacement rapide (travel_to)
+            x, y = event.pos
+            if x < COLS * TILE:
+                self.pending_dir = None
+                self.travel_to(y // TILE, x // TILE)
+            return
+
         if event.type != pygame.KEYDOWN:
             return
 
@@ -355,7 +256,7 @@ class Game:
             if self.pending_dir:
                 dir_ = self.pending_dir
                 self.pending_dir = None
-                self.try_move(dir_)
+                self.apply_action(DIR_MOVES[dir_])
             else:
                 self.message = "Aucune direction sélectionnée."
 
@@ -364,13 +265,13 @@ class Game:
             self.message = "Sélection annulée."
 
         elif event.key == pygame.K_t:
-            self.search_current_room()
+            self.apply_action(SEARCH)
 
         elif event.key == pygame.K_f:
-            self.use_first_food()
+            self.apply_action(EAT)
 
         elif event.key == pygame.K_e:
-            self.interact_current_room()
+            self.apply_action(INTERACT)
 
     def handle_pick_input(self, event):
         if event.type != pygame.KEYDOWN:
@@ -386,33 +287,14 @@ class Game:
 
         elif event.key == KEY_CONFIRM:
             if self.pick_rooms:
-                self.confirm_pick()
+                self.apply_action(PICK_0 + self.pick_idx)
 
         elif event.key == KEY_CANCEL:
-            self.pick_rooms = []
-            self.state = "PLAY"
-            self.message = "Sélection de salle annulée. Choisis une autre porte."
+            self.apply_action(CANCEL)
             self.pending_dir = None
-            self._pending_dir = None
-            self._pending_dest = None
-            self._pending_key = None
 
         elif event.key == pygame.K_r:
-            inv = self.player.inventory
-            if not inv.can_reroll_rooms():
-                self.message = "Pas de dé pour relancer le tirage."
-                return
-
-            if self._pending_dir is None or self._pending_dest is None or self._pending_key is None:
-                self.message = "Impossible de relancer ici."
-                return
-
-            if not inv.spend_die():
-                self.message = "Pas de dé pour relancer le tirage."
-                return
-
-            self.message = "Tu relances le tirage (1 dé consommé)."
-            self.roll_three_rooms(self._pending_dir, self._pending_dest, self._pending_key)
+            self.apply_action(REROLL)
 
     def handle_shop_input(self, event: pygame.event.Event):
         """
@@ -426,469 +308,225 @@ class Game:
         if event.type != pygame.KEYDOWN:
             return
 
-        inv = self.player.inventory
-
         if event.key == KEY_CANCEL:
-            self.state = "PLAY"
-            self.shop_message = ""
-            self.message = "Tu quittes la boutique."
-            return
-
-        # Achat n°1 : Clé
-        if event.key == pygame.K_1:
-            cost = 5
-            if inv.gold >= cost:
-                inv.gold -= cost
-                inv.add_keys(1)
-                self.shop_message = "Tu achètes une clé (-5 or)."
-            else:
-                self.shop_message = "Pas assez d'or pour la clé."
+            self.apply_action(CANCEL)
             return
 
-        # Achat n°2 : nourriture (+4 pas)
-        if event.key == pygame.K_2:
-            cost = 3
-            if inv.gold >= cost:
-                inv.gold -= cost
-                inv.add_item(Food("Ration de voyage", 4))
-                self.shop_message = "Tu achètes une ration (+4 pas)."
-            else:
-                self.shop_message = "Pas assez d'or pour la nourriture."
-            return
-
-        # Achat n°3 : dé
-        if event.key == pygame.K_3:
-            cost = 8
-            if inv.gold >= cost:
-                inv.gold -= cost
-                inv.add_dice(1)
-                self.shop_message = "Tu achètes un dé (-8 or)."
-            else:
-                self.shop_message = "Pas assez d'or pour le dé."
-            return
+        shop_keys = {pygame.K_1: 1, pygame.K_2: 2, pygame.K_3: 3, pygame.K_4: 4}
+        if event.key in shop_keys:
+            self.apply_action(SHOP_1 + shop_keys[event.key] - 1)
 
-        # Achat n°4 : patte de lapin
-        if event.key == pygame.K_4:
-            cost = 12
-            if inv.gold >= cost:
-                inv.gold -= cost
-                if not inv.has_rabbit_foot():
-                    inv.add_item(RabbitFoot())
-                    self.shop_message = "Tu achètes une patte de lapin (-12 or)."
-                else:
-                    self.shop_message = "Tu as déjà une patte de lapin."
-            else:
-                self.shop_message = "Pas assez d'or pour la patte de lapin."
-
-    def handle_end_input(self, event: pygame.event.Event):
-        if event.type == pygame.KEYDOWN and event.key == KEY_CONFIRM:
-            new_manor = Manor()
-            new_player = Player(*new_manor.start)
-            self.__init__(new_manor, new_player)
-
-    # ---------- Gestion de la nourriture ----------
-
-    def use_first_food(self):
-        inv = self.player.inventory
-        from items import Food
-
-        idx_food = None
-        for i, item in enumerate(inv.items):
-            if isinstance(item, Food):
-                idx_food = i
-                break
-
-        if idx_food is None:
-            self.message = "Tu n'as pas de nourriture dans ton inventaire."
-            return
-
-        food_item = inv.items[idx_food]
-        name = food_item.name
-        steps = food_item.steps_restored
-
-        inv.use_item(idx_food, self.player)
-        self.message = f"Tu manges {name} (+{steps} pas)."
-
-    # ---------- Logique de jeu : déplacement ----------
-
-    def try_move(self, dir_: str):
-        if self.player.steps <= 0:
-            self.lose("Plus de pas !")
-            return
-
-        src_rc = (self.player.r, self.player.c)
-
-        dest = self.manor.valid_move(src_rc, dir_)
-        if not dest:
-            self.message = "Mur."
-            # Si après ce mur il n'existe vraiment aucun autre chemin, on perd.
-            if self.is_player_blocked():
-                self.lose("Le manoir est bloqué : plus aucun chemin possible.")
-            return
-
-        door = self.manor.ensure_door(src_rc, dir_)
-        if door is not None and not door.is_open:
-            # On tente d'ouvrir la porte avec l'inventaire du joueur
-            if not door.open(self.player.inventory):
-                # Ouverture impossible : on affiche un message selon le niveau
-                if door.lock_level == DoorLockLevel.LOCKED:
-                    self.message = "Porte verrouillée. Il te faut une clé ou un kit."
-                elif door.lock_level == DoorLockLevel.DOUBLE_LOCKED:
-                    self.message = "Porte à double tour. Il te faut une clé."
-                else:
-                    self.message = "Impossible d'ouvrir cette porte."
-
-                #  on teste si VRAIMENT toutes les directions sont mortes
-                if self.is_player_blocked():
-                    self.lose("Tu ne peux ouvrir aucune porte : le manoir est bloqué.")
-                return
-            else:
-                # Succès de l'ouverture (clé consommée si nécessaire)
-                self.message = "Tu ouvres la porte."
-
-        nr, nc = dest
-        target_room = self.manor.get_room(nr, nc)
-
-        if target_room is None:
-            door_key = (src_rc[0], src_rc[1], dir_)
-
-            if door_key in self.door_offers:
-                offer = self.door_offers[door_key]
-                self.pick_rooms = offer["rooms"]
-                self.pick_idx = 0
-                self.state = "PICK"
-                self._pending_dir = dir_
-                self._pending_dest = offer["dest"]
-                self._pending_key = door_key
-                self.message = "Choisis une pièce pour cette porte."
-                return
-
-            self.roll_three_rooms(dir_, dest, door_key)
-            if not self.pick_rooms and self.is_player_blocked():
-                self.lose("Le manoir est bloqué : plus aucune pièce ne peut être posée.")
-            return
-
-        # Déplacement dans une pièce déjà connue
-        self.player.steps -= 1
-        self.player.r, self.player.c = nr, nc
-
-        entry_msg = self.apply_room_entry_effect(target_room)
-        if entry_msg:
-            self.message = f"Tu avances vers {dir_}. {entry_msg}"
+    def handle_history_input(self, event: pygame.event.Event):
+        """Mode entraînement : U annule la dernière action, Y la rétablit."""
+        if event.key == KEY_UNDO:
+            done = self.undo()
+            self.message = "Action annulée." if done else "Rien à annuler."
         else:
-            self.message = f"Tu avances vers {dir_}."
-
-        self.check_end((nr, nc))
-
-    # ---------- Pioche FINIE de salles ----------
-
-    def roll_three_rooms(self, dir_: str, dest_rc: tuple[int, int], door_key: tuple[int, int, str]):
-        available_templates = [
-            tpl for tpl in self.room_templates.values()
-            if self.room_stock.get(tpl.name, 0) > 0
-        ]
-
-        candidates: list[Room] = []
-        for tpl in available_templates:
-            ghost = clone_room(tpl)
-            if self.manor.can_place_room(ghost, dest_rc, dir_):
-                candidates.append(tpl)
-
-        if not candidates:
-            self.message = "Aucune salle ne peut être placée ici (pioche épuisée ou incompatible)."
-            self.pick_rooms = []
-            return
-
-        random.shuffle(candidates)
-        pick_templates = candidates[:3]
-        pick_rooms = [clone_room(tpl) for tpl in pick_templates]
-
-        if pick_rooms and all(room.gem_cost > 0 for room in pick_rooms):
-            pick_rooms[0].gem_cost = 0
-
-        self.door_offers[door_key] = {
-            "rooms": pick_rooms,
-            "dest": dest_rc,
-        }
-
-        self.pick_rooms = pick_rooms
-        self.pick_idx = 0
-        self.state = "PICK"
-        self._pending_dir = dir_
-        self._pending_dest = dest_rc
-        self._pending_key = door_key
-        self.message = "Choisis une pièce pour cette porte."
-
-    def confirm_pick(self):
-        chosen = self.pick_rooms[self.pick_idx]
-        if chosen.gem_cost > self.player.gems:
-            self.message = "Pas assez de gemmes."
-            return
-
-        self.player.gems -= chosen.gem_cost
-
-        r, c = self._pending_dest
-        self.manor.set_room(r, c, chosen)
-
-        name = getattr(chosen, "name", None)
-        if name is not None and name in self.room_stock and self.room_stock[name] > 0:
-            self.room_stock[name] -= 1
-
-        self.state = "PLAY"
-
-        self.player.steps -= 1
-        self.player.r, self.player.c = r, c
-
-        entry_msg = self.apply_room_entry_effect(chosen)
-        if entry_msg:
-            self.message = f"Ajouté: {chosen.name}. {entry_msg}"
+            done = self.redo()
+            self.message = "Action rétablie." if done else "Rien à rétablir."
+        self.pending_dir = None
+        self._autoplay_decision = None
+
+    # ---------- Pilote automatique ----------
+
+    def toggle_autoplay(self):
+        """Active / coupe le bot MCTS (calcul dans un pool de processus, sans bloquer l'affichage)."""
+        if self.autoplay is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+            self.autoplay = MCTSPolicy(AUTOPLAY_BUDGET_S, workers)
+            self.message = "Pilote automatique activé (P pour reprendre la main)."
         else:
-            self.message = f"Ajouté: {chosen.name}."
-
-        self.check_end((r, c))
-
-        if self._pending_key is not None:
-            self.door_offers.pop(self._pending_key, None)
-
-        self.pick_rooms = []
-        self._pending_dir = None
-        self._pending_dest = None
-        self._pending_key = None
-
-    # ---------- Fin de partie ----------
-
-    def check_end(self, rc: tuple[int, int]):
-        """
-        Détermine si la partie est terminée :
-
-        - Victoire : si on atteint l'antichambre.
-        - Défaite : 
-            * si les pas tombent à 0 ou moins,
-            * ou si le manoir est bloqué (plus aucune nouvelle salle posable
-              ni progression possible à partir des salles accessibles).
-        """
-        # 1) Victoire : on est arrivé à l'antichambre
-        if rc == self.manor.antechamber_rc:
-            self.win = True
-            self.state = "END"
-            self.message = "Tu atteins l'antichambre : victoire !"
-            return
-
-        # 2) Défaite : plus de pas
-        if self.player.steps <= 0:
-            self.lose("Plus de pas !")
-            return
-
-        # 3) Défaite : manoir bloqué (plus aucun chemin possible / aucune nouvelle salle posable)
-        if self.is_player_blocked():
-            self.lose(
-                "Le manoir est bloqué : plus aucune porte ouvrable ni nouvelle salle à poser."
-            )
-    def lose(self, cause: str):
-        self.win = False
-        self.message = cause
-        self.state = "END"
-
-    # ---------- Fouille & interactions de salles ----------
-
-    def search_current_room(self):
-        r, c = self.player.r, self.player.c
-        room = self.manor.get_room(r, c)
-
-        if room is None:
-            self.message = "Rien à fouiller ici."
-            return
-
-        if (r, c) in self.searched_rooms:
-            self.message = "Cette salle a déjà été fouillée."
-            return
-
-        self.searched_rooms.add((r, c))
-        inv = self.player.inventory
-
-        # Jardin → nourriture ou patte de lapin
-        if room.name == "Jardin intérieur":
-            if not inv.has_rabbit_foot() and random.random() < 0.3:
-                inv.add_item(RabbitFoot())
-                self.message = "Tu trouves une patte de lapin porte-bonheur."
-            else:
-                inv.add_item(Food("Fruits frais", 5))
-                self.message = "Tu trouves de la nourriture fraîche (+5 pas)."
-            return
-
-        # Veranda → pelle unique
-        if room.name == "Veranda":
-            if not inv.has_shovel():
-                inv.add_item(Shovel())
-                self.message = "Tu trouves une pelle appuyée contre le mur."
-            else:
-                inv.add_item(Food("Collation", 3))
-                self.message = "Tu trouves un petit encas (+3 pas)."
-            return
-
-        # Salle des coffres → loot massif
-        if room.name == "Salle des coffres":
-            inv.add_gems(2)
-            inv.add_gold(5)
-            inv.add_keys(1)
-            self.message = "Tu ouvres un coffre rempli : +2 gemmes, +5 or, +1 clé."
-            return
-
-        # Salle avec sac → gros loot orienté or
-        if room.name == "Salle avec sac":
-            inv.add_gold(4)
-            inv.add_gems(1)
-            inv.add_keys(1)
-            self.message = "Le sac est lourd : +4 or, +1 gemme, +1 clé."
-            return
-
-        # Suite royale → détecteur ou repos
-        if room.name == "Suite royale":
-            if not inv.has_detector():
-                inv.add_item(MetalDetector())
-                self.message = "Tu trouves un détecteur de métaux !"
-            else:
-                self.player.steps += 5
-                self.message = "Tu te reposes dans le lit royal (+5 pas)."
-            return
-
-        # Chambre d’ami → détecteur unique
-        if room.name == "Chambre d'ami":
-            if not inv.has_detector():
-                inv.add_item(MetalDetector())
-                self.message = "Tu trouves un détecteur de métaux sous un oreiller !"
-            else:
-                inv.add_item(Food("Encas", 3))
-                self.message = "Tu trouves un encas (+3 pas)."
-            return
-
-        # Cellule → lockpick unique
-        if room.name == "Cellule":
-            if not inv.has_lockpick():
-                inv.add_item(LockpickKit())
-                self.message = "Tu trouves un kit de crochetage caché."
-            else:
-                inv.add_keys(1)
-                self.message = "Tu récupères une petite clé."
-            return
+            self.autoplay.close()
+            self.autoplay = None
+            self.message = "Pilote automatique coupé."
+        self._autoplay_decision = None
+        self.pending_dir = None
 
-        # Marchand ambulant → patte de lapin possible en fouille aussi
-        if room.name == "Marchand ambulant":
-            if not inv.has_rabbit_foot():
-                inv.add_item(RabbitFoot())
-                self.message = "Le marchand te donne une patte de lapin."
-            else:
-                inv.add_gold(1)
-                self.message = "Il te donne une pièce d'or."
+    def update_autoplay(self):
+        """Lance la réflexion du bot, puis joue son coup dès qu'il est prêt."""
+        if self.autoplay is None or self.state == "END":
             return
+        try:
+            if self._autoplay_decision is None:
+                self._autoplay_decision = self.autoplay.submit(self)
+            elif self._autoplay_decision.done():
+                action = self._autoplay_decision.result()
+                self._autoplay_decision = None
+                self.apply_action(action)
+        except BrokenExecutor:
+            # Processus de calcul tué (mémoire...) : on rend la main au joueur
+            self.autoplay.close()
+            self.autoplay = None
+            self._autoplay_decision = None
+            self.message = "Pilote automatique arrêté (processus de calcul perdu)."
+
+    def update_pick_estimates(self):
+        """Estimations des cartes du choix de salle (None : désactivées)."""
+        if self.pick_estimator is None:
+            return None
+        try:
+            return self.pick_estimator.update(self)
+        except BrokenExecutor:
+            self.pick_estimator.close()
+            self.pick_estimator = None
+            self.message = "Estimations désactivées (processus de calcul perdu)."
+            return None
 
-        # Salle piégée (fouille = piège)
-        if room.room_type == RoomType.TRAP:
-            self.player.steps = max(0, self.player.steps - 3)
-            self.message = "Un piège se déclenche ! (-3 pas)"
-            return
-
-        # Fouille par défaut
-        item = self.rng.draw_consumable()
-        inv = self.player.inventory
-
-        if isinstance(item, Food):
-            inv.add_item(item)
-            self.message = f"Tu trouves de la nourriture : {item.name}"
-        elif isinstance(item, Gem):
-            inv.add_gems(1)
-            self.message = "Tu trouves une gemme."
-        elif isinstance(item, Key):
-            inv.add_keys(1)
-            self.message = "Tu trouves une clé."
-        elif isinstance(item, Die):
-            inv.add_dice(1)
-            self.message = "Tu trouves un dé."
-        else:
-            inv.add_item(item)
-            self.message = f"Tu trouves un objet : {item.name}"
-
-    def interact_current_room(self):
-        r, c = self.player.r, self.player.c
-        room = self.manor.get_room(r, c)
+    # ---------- Partie à distance ----------
 
-        if room is None:
-            self.message = "Rien de spécial ici."
-            return
+    def update_remote(self):
+        """Entrées échangées avec une autre instance (voir race.RaceGame) ; rien en solo."""
 
-        inv = self.player.inventory
-
-        # Entrée : marteau caché si on a une pelle
-        if room.room_type == RoomType.ENTRANCE:
-            if not inv.has_shovel():
-                self.message = "Le sol semble meuble, une pelle serait utile (E)."
-                return
-
-            if (r, c) in self.dug_rooms:
-                if inv.has_hammer():
-                    self.message = "Tu as déjà trouvé le marteau ici."
-                else:
-                    self.message = "Tu as déjà creusé ici."
-                return
-
-            self.dug_rooms.add((r, c))
-            if not inv.has_hammer():
-                inv.add_item(Hammer())
-                self.message = "Tu déterres un vieux marteau !"
-            else:
-                self.message = "Tu ne trouves plus rien d'utile."
-            return
+    def draw_remote(self):
+        """Panneau de la partie à distance, dessiné par-dessus le reste."""
 
-        # Jardin : creuser avec pelle
-        if room.name == "Jardin intérieur":
-            if not inv.has_shovel():
-                self.message = "Tu pourrais creuser ici avec une pelle (E)."
-                return
-
-            if (r, c) in self.dug_rooms:
-                self.message = "Tu as déjà creusé dans ce jardin."
-                return
-
-            self.dug_rooms.add((r, c))
-            roll = random.random()
-            if roll < 0.4:
-                inv.add_gems(1)
-                self.message = "Tu déterres une gemme."
-            elif roll < 0.7:
-                inv.add_item(Food("Conserves enterrées", steps_restored=4))
-                self.message = "Tu trouves des conserves (+4 pas)."
-            else:
-                inv.add_dice(1)
-                self.message = "Tu déterres un vieux dé."
-            return
+    def handle_end_input(self, event: pygame.event.Event):
+        if event.type == pygame.KEYDOWN and event.key == KEY_CONFIRM:
+            seed = random.randrange(1 << 32)
+            rand = random.Random(seed)
+            new_manor = Manor(rng=rand)
+            new_player = Player(*new_manor.start)
+            self.__init__(new_manor, new_player, rand, seed)
 
-        # Veranda : interaction simple
-        if room.name == "Veranda":
-            if not inv.has_shovel():
-                self.message = "Une pelle traîne probablement ici... fouille la salle (T)."
-            else:
-                self.message = "Rien de plus à faire ici."
-            return
+    # ---------- Sauvegarde rapide ----------
 
-        # Boutique / Marchand : ouvrir la boutique si on a de l'or
-        if room.name in ("Boutique", "Marchand ambulant"):
-            if self.player.gold <= 0:
-                self.message = "Tu n'as pas d'or pour acheter quelque chose."
-            else:
-                self.state = "SHOP"
-                self.shop_message = ""
-                self.message = "La boutique est ouverte (1-4 pour acheter, Échap pour quitter)."
+    def save_game(self):
+        """Écrit la partie dans SAVE_PATH (format binaire de snapshot.py)."""
+        try:
+            with open(SAVE_PATH, "wb") as f:
+                f.write(snapshot.save(self))
+        except OSError as e:
+            self.message = f"Sauvegarde impossible : {e.strerror}."
+            return
+        self.message = "Partie sauvegardée."
+
+    def update_autosave(self):
+        """Snapshot après une pose / porte / achat, écrit par le thread d'écriture."""
+        if self.autosaver is None:
+            return
+        if self.checkpoints != self._saved_checkpoints:
+            self._saved_checkpoints = self.checkpoints
+            self.autosaver.submit(snapshot.save(self))
+        # Échec d'écriture (disque plein, droits...) : signalé une fois au joueur
+        error = self.autosaver.last_error
+        if error is not None:
+            self.autosaver.last_error = None
+            self.message = f"Sauvegarde automatique impossible : {error.strerror or error}."
+
+    def load_game(self, path: str = SAVE_PATH):
+        """Reprend la partie sauvegardée dans path."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.message = "Aucune sauvegarde."
             return
-
-        self.message = "Rien de spécial à faire ici."
+        try:
+            snapshot.restore(self, data)
+        except ValueError:
+            self.message = "Sauvegarde illisible."
+            return
+        self._seed = None
+        self._started = None    # durée et gains d'avant la sauvegarde inconnus : hors classements
+        self._board = None
+        if self.event_sink is not None:
+            self.enable_analytics(self.event_sink)
+        self.init_room_images()
+        self.pending_dir = None
+        self._autoplay_decision = None
+        self._saved_checkpoints = self.checkpoints
+        self.message = "Partie chargée."
+
+    # ---------- Profils et classements ----------
+
+    def update_profile(self):
+        """Fin de partie : dépose le résultat une fois ; les classements s'affichent dès qu'ils sont prêts."""
+        # Mode entraînement (actions annulables) ou partie chargée : hors classements
+        if self.profiles is None or self.history is not None or self._started is None:
+            return
+        if self._board is None:
+            result = GameResult.of(self, PLAYER_NAME, self._seed, time.monotonic() - self._started)
+            self._board_lines = ["Classements…"]
+            self._board = self.profiles.submit(result)
+            self._board.add_done_callback(self._show_board)
+
+    def _show_board(self, future):
+        """Thread d'écriture : classements prêts (ignorés si une autre partie a commencé)."""
+        if future is self._board:
+            self._board_lines = [] if future.exception() is not None else future.result().lines()
+
+    # ---------- Journal d'actions ----------
+
+    def save_action_log(self):
+        """Écrit le journal de la partie dans ACTION_LOG_DIR (vérifiable si la partie est finie)."""
+        log = self.action_log
+        if log is None or not log.count:
+            return
+        if self.state == "END" and log.checksum is None:
+            log.finish(self)
+        path = os.path.join(ACTION_LOG_DIR, f"game_{log.seed}_{int(time.time())}{LOG_SUFFIX}")
+        try:
+            os.makedirs(ACTION_LOG_DIR, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(log.encode())
+        except OSError as e:
+            print("Erreur écriture journal d'actions:", e)
+        self.action_log = None
 
     # ---------- Boucle principale ----------
 
+    def _start_watchdog(self) -> FrameWatchdog | None:
+        """Démarre le chien de garde des frames lentes si activé (config.py)."""
+        if not WATCHDOG_ENABLED:
+            return None
+        budget = WATCHDOG_BUDGET_FACTOR / FPS
+        watchdog = FrameWatchdog(budget, WATCHDOG_SAMPLE_MS / 1000, WATCHDOG_DIR)
+        watchdog.start()
+        return watchdog
+
+    def _start_gc_tools(self) -> tuple[GCMonitor | None, DeferredGC | None]:
+        """Branche l'instrumentation GC et/ou le mode GC différé si activés (config.py)."""
+        monitor = None
+        if GC_MONITOR_ENABLED:
+            monitor = GCMonitor()
+            monitor.install()
+
+        deferred = None
+        if GC_DEFERRED_MODE:
+            # Assets et catalogue sont déjà chargés (__init__) : on peut geler
+            deferred = DeferredGC(GC_IDLE_MIN_MS / 1000)
+            deferred.start()
+
+        return monitor, deferred
+
     def run(self):
+        watchdog = self._start_watchdog()
+        gc_monitor, gc_deferred = self._start_gc_tools()
+        frame_budget = 1.0 / FPS
+
         while self.running:
+            frame_t0 = time.perf_counter()
+            if watchdog:
+                watchdog.frame_start()
+            if gc_monitor:
+                gc_monitor.frame_start()
+
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
+                elif self.history is not None and event.type == pygame.KEYDOWN \
+                        and event.key in (KEY_UNDO, KEY_REDO):
+                    self.handle_history_input(event)
+                elif event.type == pygame.KEYDOWN and event.key == KEY_AUTOPLAY:
+                    self.toggle_autoplay()
+                elif event.type == pygame.KEYDOWN and event.key == KEY_SAVE:
+                    self.save_game()
+                elif event.type == pygame.KEYDOWN and event.key == KEY_LOAD:
+                    self.load_game()
+                elif event.type == pygame.KEYDOWN and event.key == KEY_RESUME:
+                    self.load_game(AUTOSAVE_PATH)
+                elif self.autoplay is not None and self.state != "END":
+                    continue    # le bot joue : pas d'entrées de jeu
                 elif self.state == "PLAY":
                     self.handle_play_input(event)
                 elif self.state == "PICK":
@@ -898,6 +536,13 @@ class Game:
                 elif self.state == "END":
                     self.handle_end_input(event)
 
+            self.update_autoplay()
+            self.update_remote()
+            self.update_autosave()
+            if self.state == "END" and self.action_log is not None:
+                self.save_action_log()
+            if self.state == "END":
+                self.update_profile()
             self.update_blink()
             self.update_pulse()
 
@@ -915,28 +560,75 @@ class Game:
                     self._blink_visible
                 )
 
-            draw_hud(self.screen, self.player, self.message, self.item_icons, current_room)
+            hint = hint_text(self.route_plan(), self.manor.antechamber_rc) if self.state == "PLAY" else ""
+            draw_hud(self.screen, self.player, self.message, self.item_icons, current_room, hint)
+
+            # Sans attente : relance / annule / récupère les parties simulées
+            estimates = self.update_pick_estimates()
 
             if self.state == "PICK":
                 draw_pick_screen_pulse(
                     self.screen,
                     self.pick_rooms,
                     self.pick_idx,
-                    self._pulse_phase
+                    self._pulse_phase,
+                    estimates,
                 )
 
             if self.state == "SHOP":
                 draw_shop_window(self.screen, self.player.inventory, self.shop_message)
 
             if self.state == "END":
-                draw_end_screen(self.screen, win=self.win)
+                draw_end_screen(self.screen, win=self.win, lines=self._board_lines)
 
+            self.draw_remote()
             pygame.display.flip()
+
+            if watchdog:
+                watchdog.frame_end()
+            if gc_monitor:
+                gc_monitor.frame_end()
+            if gc_deferred:
+                gc_deferred.on_idle(frame_budget - (time.perf_counter() - frame_t0))
+
             self.clock.tick(FPS)
 
+        if watchdog:
+            watchdog.stop()
+            print(watchdog.report())
+        if gc_deferred:
+            gc_deferred.stop()
+            print(gc_deferred.report())
+        if gc_monitor:
+            gc_monitor.uninstall()
+            print(gc_monitor.report())
+        if self.autoplay is not None:
+            self.autoplay.close()
+        if self.pick_estimator is not None:
+            self.pick_estimator.close()
+        self.save_action_log()
+        if self.autosaver is not None:
+            self.autosaver.close()
+        if self.event_sink is not None:
+            self.event_sink.close()
+        if self.profiles is not None:
+            self.profiles.close()
+        if METRICS_DIR:
+            self._export_metrics(METRICS_DIR)
+
+    def _export_metrics(self, directory: str) -> None:
+        """Écrit les métriques de la session (Prometheus + instantané JSON)."""
+        try:
+            METRICS.write_prometheus(os.path.join(directory, "blueprince.prom"))
+            METRICS.write_json(os.path.join(directory, f"metrics_{int(time.time())}.json"))
+        except OSError as e:
+            print("Erreur export métriques:", e)
+
 
 if __name__ == "__main__":
     random.seed()
-    manoir = Manor()
+    seed = random.randrange(1 << 32)
+    rand = random.Random(seed)
+    manoir = Manor(rng=rand)
     player = Player(*manoir.start)
-    Game(manoir, player).run()
\ No newline at end of file
+    Game(manoir, player, rand, seed).run()
\ No newline at end of file
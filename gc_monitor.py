@@ -0,0 +1,217 @@
+# gc_monitor.py
+import gc
+import time
+
+"""
+Instrumentation et pilotage du ramasse-miettes (GC) pour la boucle de jeu.
+
+- GCMonitor  : branché sur gc.callbacks, mesure la durée de chaque pause GC
+               et l'attribue à la frame en cours (ou au temps creux entre
+               deux frames). Histogrammes de pauses par génération + par frame.
+- DeferredGC : mode opt-in. Après le chargement des assets et du catalogue,
+               gc.freeze() sort tous les objets "permanents" des générations
+               suivies, puis les collectes générationnelles automatiques sont
+               désactivées et rejouées à la main pendant les frames creuses.
+"""
+
+# Bornes (en ms) des seaux de l'histogramme des pauses
+PAUSE_BUCKETS_MS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0)
+
+
+class PauseHistogram:
+    """Histogramme cumulatif très simple (bornes fixes en ms)."""
+
+    def __init__(self, bounds_ms=PAUSE_BUCKETS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        # Un seau par borne + un seau "au-delà"
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.n = 0
+
+    def add(self, seconds: float) -> None:
+        ms = seconds * 1000
+        for i, bound in enumerate(self.bounds_ms):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.n += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+
+    def format(self, title: str) -> str:
+        if self.n == 0:
+            return f"{title}: aucune pause"
+
+        lines = [
+            f"{title}: n={self.n} total={self.total_s * 1000:.2f} ms "
+            f"max={self.max_s * 1000:.2f} ms"
+        ]
+        low = 0.0
+        for bound, count in zip(self.bounds_ms, self.counts):
+            if count:
+                lines.append(f"  {low:>6.2f} - {bound:>6.2f} ms : {count}")
+            low = bound
+        if self.counts[-1]:
+            lines.append(f"  > {self.bounds_ms[-1]:.2f} ms : {self.counts[-1]}")
+        return "\n".join(lines)
+
+
+class GCMonitor:
+    """Mesure les pauses du GC et les attribue aux frames de Game.run."""
+
+    def __init__(self):
+        self._pause_start: float | None = None
+        self._in_frame = False
+
+        # Pause cumulée dans la frame en cours
+        self._frame_pause_s = 0.0
+
+        self.by_generation = [PauseHistogram() for _ in range(3)]
+        self.per_frame = PauseHistogram()   # pause totale des frames touchées
+        self.idle = PauseHistogram()        # pauses hors frame (temps creux)
+
+        self.frames = 0
+        self.frames_with_gc = 0
+        self.collected = 0
+
+    def install(self) -> None:
+        if self._callback not in gc.callbacks:
+            gc.callbacks.append(self._callback)
+
+    def uninstall(self) -> None:
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+    # ----------------------------
+    # Découpage en frames
+    # ----------------------------
+
+    def frame_start(self) -> None:
+        self._in_frame = True
+        self._frame_pause_s = 0.0
+        self.frames += 1
+
+    def frame_end(self) -> float:
+        """Termine la frame et retourne la pause GC cumulée pendant celle-ci (s)."""
+        self._in_frame = False
+        pause = self._frame_pause_s
+        if pause > 0:
+            self.frames_with_gc += 1
+            self.per_frame.add(pause)
+        return pause
+
+    # ----------------------------
+    # Callback gc
+    # ----------------------------
+
+    def _callback(self, phase: str, info: dict) -> None:
+        if phase == "start":
+            self._pause_start = time.perf_counter()
+            return
+
+        if self._pause_start is None:
+            return
+
+        duration = time.perf_counter() - self._pause_start
+        self._pause_start = None
+
+        gen = info.get("generation", 0)
+        if 0 <= gen < len(self.by_generation):
+            self.by_generation[gen].add(duration)
+        self.collected += info.get("collected", 0)
+
+        if self._in_frame:
+            self._frame_pause_s += duration
+        else:
+            self.idle.add(duration)
+
+    def report(self) -> str:
+        parts = [
+            f"GC: {self.frames_with_gc}/{self.frames} frames avec pause, "
+            f"{self.collected} objets collectés"
+        ]
+        for gen, hist in enumerate(self.by_generation):
+            parts.append(hist.format(f"GC génération {gen}"))
+        parts.append(self.per_frame.format("GC pause par frame"))
+        parts.append(self.idle.format("GC hors frame (creux)"))
+        return "\n".join(parts)
+
+
+class DeferredGC:
+    """
+    Mode opt-in : gel des objets chargés + collectes reportées aux frames creuses.
+
+    Utilisation (dans Game.run) :
+        start()                    -> après chargement des assets / catalogue
+        on_idle(marge_restante_s)  -> à la fin de chaque frame
+        stop()                     -> à la sortie de la boucle
+    """
+
+    # Au-delà de ce multiple du seuil gen0, on collecte même sans temps creux
+    FORCE_FACTOR = 20
+
+    def __init__(self, idle_min_s: float):
+        self.idle_min_s = idle_min_s
+        self.active = False
+        self.deferred_collections = 0
+        self.forced_collections = 0
+
+    def start(self) -> None:
+        """Nettoie, gèle les objets survivants (assets, catalogue) et coupe le GC automatique."""
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        self.active = True
+
+    def stop(self) -> None:
+        """Rend la main au GC automatique."""
+        if not self.active:
+            return
+        gc.unfreeze()
+        gc.enable()
+        self.active = False
+
+    def _due_generation(self) -> int | None:
+        """Plus haute génération dont le compteur a dépassé son seuil, comme le ferait le GC."""
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        due = None
+        for gen in range(3):
+            if thresholds[gen] and counts[gen] >= thresholds[gen]:
+                due = gen
+        return due
+
+    def on_idle(self, remaining_s: float) -> int | None:
+        """
+        Appelée en fin de frame avec la marge restante avant la frame suivante.
+        Lance la collecte due si la marge est suffisante (ou si elle a trop tardé).
+        Retourne la génération collectée, ou None.
+        """
+        if not self.active:
+            return None
+
+        gen = self._due_generation()
+        if gen is None:
+            return None
+
+        if remaining_s >= self.idle_min_s:
+            self.deferred_collections += 1
+        elif gc.get_count()[0] >= self.FORCE_FACTOR * gc.get_threshold()[0]:
+            # Pas de temps creux depuis trop longtemps : on collecte quand même la gen 0
+            gen = 0
+            self.forced_collections += 1
+        else:
+            return None
+
+        gc.collect(gen)
+        return gen
+
+    def report(self) -> str:
+        return (
+            f"GC différé: {self.deferred_collections} collectes en creux, "
+            f"{self.forced_collections} forcées"
+        )
@@ -0,0 +1,271 @@
+# history.py
+import functools
+from collections import deque
+
+from door import Door
+
+"""
+Journal de commandes inverses : annuler / rétablir (undo / redo).
+
+Chaque action du moteur (déplacement, choix de salle, fouille...) devient
+une transaction : la liste des petites modifications qu'elle a faites, avec
+de quoi les défaire. Annuler = appliquer les inverses dans l'ordre inverse ;
+rétablir = rejouer les modifications enregistrées (sans retirer au hasard).
+
+Opérations enregistrées :
+- CELL      (r, c, ancienne Room, nouvelle Room)   Manor.set_room
+- NEW_DOOR  (clé, clé opposée, niveau)             Manor.ensure_door
+- DOOR_OPEN (r, c, dir)                             ouverture d'une porte
+- VISITED   (r, c)                                  effet d'entrée appliqué
+- STOCK     (nom, avant, après)                     pioche
+- SEARCHED / DUG (r, c)                             salles fouillées / creusées
+- SCALARS   (avant, après)                          position, ressources, objets,
+                                                    état (PLAY/PICK...), message
+- OFFERS    (avant, après)                          offres mémorisées
+
+Les modifications passent par Manor.set_room / own_room / own_door : elles
+respectent donc le partage des forks (copie à l'écriture).
+Le générateur aléatoire n'est pas rembobiné : rejouer une autre action après
+une annulation donne de nouveaux tirages.
+"""
+
+CELL, NEW_DOOR, DOOR_OPEN, VISITED, STOCK, SEARCHED, DUG, SCALARS, OFFERS = range(9)
+
+
+def recorded(method):
+    """Fait d'une méthode publique du moteur une transaction du journal (si actif)."""
+    @functools.wraps(method)
+    def wrapper(engine, *args, **kwargs):
+        log = engine.history
+        if log is None or engine._ops is not None:
+            return method(engine, *args, **kwargs)
+        log.begin(engine)
+        try:
+            return method(engine, *args, **kwargs)
+        finally:
+            log.commit(engine)
+    return wrapper
+
+
+def _scalars(engine) -> tuple:
+    """Petit état recopié en entier à chaque transaction (comparé à la fin)."""
+    player = engine.player
+    inv = player.inventory
+    return (
+        player.r, player.c,
+        inv.steps, inv.gold, inv.gems, inv.keys, inv.dice,
+        tuple(inv.items), frozenset(inv.permanent_items),
+        engine.state, engine.win,
+        engine.pick_rooms, engine.pick_idx, engine._pending_dir, engine._pending_dest,
+        # Messages en dernier : une action qui ne change qu'eux n'est pas enregistrée
+        engine.message, engine.shop_message,
+    )
+
+
+def _restore_scalars(engine, values: tuple) -> None:
+    player = engine.player
+    inv = player.inventory
+    (player.r, player.c,
+     inv.steps, inv.gold, inv.gems, inv.keys, inv.dice,
+     items, perms,
+     engine.state, engine.win,
+     engine.pick_rooms, engine.pick_idx, engine._pending_dir, engine._pending_dest,
+     engine.message, engine.shop_message) = values
+    inv.set_items(items, perms)
+
+
+class CommandLog:
+    """Piles d'annulation / de rétablissement d'une partie."""
+
+    def __init__(self, limit: int | None = None):
+        # limit : nombre maximal d'actions annulables (None = illimité)
+        self.undo_stack: deque[list] = deque(maxlen=limit)
+        self.redo_stack: list[list] = []
+        self._before: tuple | None = None
+        self._offers_before = None
+
+    def __len__(self) -> int:
+        return len(self.undo_stack)
+
+    # ----------------------------
+    # Enregistrement
+    # ----------------------------
+
+    def begin(self, engine) -> None:
+        engine._ops = engine.manor._ops = []
+        self._before = _scalars(engine)
+        self._offers_before = engine.offers.snapshot()
+
+    def commit(self, engine) -> None:
+        ops = engine._ops
+        engine._ops = engine.manor._ops = None
+
+        after = _scalars(engine)
+        if after[:-2] != self._before[:-2] or (ops and after != self._before):
+            ops.append((SCALARS, self._before, after))
+        offers = engine.offers.snapshot()
+        if offers != self._offers_before:
+            ops.append((OFFERS, self._offers_before, offers))
+        self._before = self._offers_before = None
+
+        if ops:
+            self.undo_stack.append(ops)
+            self.redo_stack.clear()
+
+    def clear(self) -> None:
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    # ----------------------------
+    # Annuler / rétablir
+    # ----------------------------
+
+    def undo(self, engine) -> bool:
+        if not self.undo_stack:
+            return False
+        ops = self.undo_stack.pop()
+        for op in reversed(ops):
+            self._apply(engine, op, forward=False)
+        self.redo_stack.append(ops)
+        return True
+
+    def redo(self, engine) -> bool:
+        if not self.redo_stack:
+            return False
+        ops = self.redo_stack.pop()
+        for op in ops:
+            self._apply(engine, op, forward=True)
+        self.undo_stack.append(ops)
+        return True
+
+    @staticmethod
+    def _apply(engine, op: tuple, forward: bool) -> None:
+        kind = op[0]
+        manor = engine.manor
+
+        if kind == CELL:
+            _, r, c, old, new = op
+            manor.set_room(r, c, new if forward else old, private=False)
+
+        elif kind == NEW_DOOR:
+            _, key, key2, level = op
+            if forward:
+                # Porte neuve, telle qu'à sa création (l'ancienne a pu être ouverte depuis)
+                manor.put_door(key, key2, Door(level))
+            else:
+                manor.drop_door(key, key2)
+
+        elif kind == DOOR_OPEN:
+            _, r, c, dir_ = op
+            manor.set_door_open((r, c), dir_, forward)
+
+        elif kind == VISITED:
+            _, r, c = op
+            manor.own_room(r, c).visited = forward
+
+        elif kind == STOCK:
+            _, name, old, new = op
+            engine.set_stock(name, new if forward else old)
+
+        elif kind in (SEARCHED, DUG):
+            _, rc = op
+            if forward:
+                engine.mark_cell(kind, rc)
+            else:
+                engine.unmark_cell(kind, rc)
+
+        elif kind == SCALARS:
+            _, old, new = op
+            _restore_scalars(engine, new if forward else old)
+
+        elif kind == OFFERS:
+            _, old, new = op
+            engine.offers.restore(new if forward else old)
+
+
+# ---------- Vérification : python history.py --games 200 ----------
+
+def check_game(seed: int, fork_at: int = 20) -> list[str]:
+    """
+    Joue une partie au hasard en notant l'état après chaque action, puis
+    annule tout (l'état doit repasser par les mêmes étapes à l'envers) et
+    rétablit tout. Un fork pris en cours de route ne doit pas bouger.
+    """
+    from engine import GameEngine
+    from bots import RandomPolicy
+    from fork_bench import state_digest
+
+    engine = GameEngine.new_game(seed)
+    engine.enable_history()
+    policy = RandomPolicy(seed)
+    digests = [state_digest(engine)]
+    child = child_digest = None
+
+    while engine.state != "END" and len(digests) < 2000:
+        engine.apply_action(policy.choose(engine))
+        if len(digests) == fork_at:
+            child = engine.fork()
+            child_digest = state_digest(child)
+        if len(engine.history) == len(digests):
+            digests.append(state_digest(engine))
+        elif state_digest(engine) != digests[-1]:
+            return ["action non enregistrée alors que l'état a changé"]
+
+    errors = []
+    for expected in reversed(digests[:-1]):
+        engine.undo()
+        if state_digest(engine) != expected:
+            errors.append(f"undo : état différent ({len(engine.history)} actions restantes)")
+            break
+    if engine.undo():
+        errors.append("undo au-delà du début de partie")
+
+    for expected in digests[1:]:
+        engine.redo()
+        if state_digest(engine) != expected:
+            errors.append(f"redo : état différent ({len(engine.history)} actions rétablies)")
+            break
+
+    if child is not None and state_digest(child) != child_digest:
+        errors.append("le fork a changé pendant undo / redo")
+    return errors
+
+
+def main(argv=None) -> int:
+    import argparse
+    import sys
+    import time
+    from engine import GameEngine
+    from bots import RandomPolicy, play_game
+
+    parser = argparse.ArgumentParser(description="Vérification du journal d'annulation.")
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for seed in range(args.games):
+        errors = check_game(seed, fork_at=seed % 30)
+        if errors:
+            failures += 1
+            print(f"graine {seed} : {errors}")
+    print(f"Undo / redo : {args.games - failures}/{args.games} parties correctes")
+
+    engine = GameEngine.new_game(1)
+    engine.enable_history()
+    play_game(engine, RandomPolicy(1))
+    n = len(engine.history)
+    t0 = time.perf_counter()
+    while engine.undo():
+        pass
+    undo_us = (time.perf_counter() - t0) / max(1, n) * 1e6
+    t0 = time.perf_counter()
+    while engine.redo():
+        pass
+    redo_us = (time.perf_counter() - t0) / max(1, n) * 1e6
+    print(f"{n} actions : undo {undo_us:.1f} µs, redo {redo_us:.1f} µs par action")
+    sys.stdout.flush()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
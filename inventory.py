@@ -4,6 +4,7 @@ from items import (
     Shovel, Hammer, LockpickKit,
     MetalDetector, RabbitFoot,
 )
+from zobrist import MASK64, item_key, perm_key
 
 """
 Gestion centralisée des ressources et des objets du joueur.
@@ -25,12 +26,51 @@ class Inventory:
         self.keys = 0
         self.dice = 0
 
+        # Or et gemmes gagnés depuis le début de la partie (profiles.py)
+        self.gold_collected = 0
+        self.gems_collected = 0
+
         # Objets consommables (liste d'instances Item)
         self.items: list[Item] = []
 
         # Objets permanents (on stocke les classes pour éviter les doublons)
         self.permanent_items: set[type[PermanentItem]] = set()
 
+        # items / permanent_items partagés avec un fork (copie à l'écriture)
+        self._shared_items = False
+
+        # Hash de Zobrist des objets (voir zobrist.py) : XOR des permanents,
+        # somme des consommables (un même objet peut apparaître plusieurs fois)
+        self._perms_zobrist = 0
+        self._items_zobrist = 0
+
+    def fork(self) -> "Inventory":
+        """Copie indépendante : les collections d'objets ne sont copiées qu'à la première écriture."""
+        clone = object.__new__(Inventory)
+        clone.__dict__.update(self.__dict__)
+        self._shared_items = clone._shared_items = True
+        return clone
+
+    def set_items(self, items, permanent_items) -> None:
+        """Remplace les objets (journal d'annulation) et recalcule leur hash."""
+        self.items = list(items)
+        self.permanent_items = set(permanent_items)
+        self._shared_items = False
+        self._items_zobrist = sum(item_key(item) for item in self.items) & MASK64
+        self._perms_zobrist = 0
+        for cls in self.permanent_items:
+            self._perms_zobrist ^= perm_key(cls)
+
+    def zobrist(self) -> int:
+        """Hash des objets (les ressources sont mêlées par GameEngine.state_hash)."""
+        return self._perms_zobrist ^ self._items_zobrist
+
+    def _own_items(self) -> None:
+        if self._shared_items:
+            self.items = list(self.items)
+            self.permanent_items = set(self.permanent_items)
+            self._shared_items = False
+
     # ----------------------------
     # Ajout de ressources simples
     # ----------------------------
@@ -40,9 +80,11 @@ class Inventory:
 
     def add_gold(self, n: int) -> None:
         self.gold += n
+        self.gold_collected += n
 
     def add_gems(self, n: int) -> None:
         self.gems += n
+        self.gems_collected += n
 
     def add_keys(self, n: int) -> None:
         self.keys += n
@@ -79,10 +121,14 @@ class Inventory:
         - PermanentItem : on stocke le TYPE dans permanent_items.
         - Autre : on l'ajoute à la liste items.
         """
+        self._own_items()
         if isinstance(item, PermanentItem):
+            if type(item) not in self.permanent_items:
+                self._perms_zobrist ^= perm_key(type(item))
             self.permanent_items.add(type(item))
         else:
             self.items.append(item)
+            self._items_zobrist = (self._items_zobrist + item_key(item)) & MASK64
 
     # ----------------------------
     # Utilisation des objets consommables
@@ -100,7 +146,9 @@ class Inventory:
         consumed = item.use(player)
 
         if consumed:
+            self._own_items()
             del self.items[item_index]
+            self._items_zobrist = (self._items_zobrist - item_key(item)) & MASK64
 
         return True
 
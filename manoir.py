@@ -2,10 +2,13 @@
 from dataclasses import dataclass, field
 from typing import Optional, List, Tuple
 
-from constants import ROWS, COLS
+from config import ROWS, COLS
 from room import Room, RoomType
+from room_data import clone_room
 import random
 from door import Door, DoorLockLevel
+from history import CELL, NEW_DOOR
+from zobrist import cell_key, door_key
 
 # Vecteurs de directions utilitaires (N,S,E,W)
 DIR_VECTORS = {
@@ -28,6 +31,7 @@ class Manor:
     - grid           : grille 2D de Room (ou None)
     - start          : position de départ (r, c)
     - antechamber_rc : position de l'antichambre (r, c)
+    - rng            : générateur aléatoire (random.Random) de la partie
     - get_room, set_room, in_bounds, valid_move
     + Fonctions d'aide pour vérifier si une salle peut être placée à un endroit.
     """
@@ -36,6 +40,9 @@ class Manor:
     grid: List[List[Optional[Room]]] = field(init=False)
     start: Tuple[int, int] = field(init=False)
     antechamber_rc: Tuple[int, int] = field(init=False)
+    # Générateur aléatoire propre au manoir (niveaux de portes) : permet de
+    # rejouer une partie à partir d'une graine.
+    rng: random.Random = field(default_factory=random.Random, repr=False, compare=False)
 
     def _random_lock_level_for_rows(self, r1: int, r2: int) -> DoorLockLevel:
         """
@@ -49,7 +56,7 @@ class Manor:
         # ----- Probabilité globale d'avoir une porte verrouillée -----
         LOCK_CHANCE = 0.20   # 20% de portes verrouillées (1 ou 2), 80% non verrouillées
 
-        r = random.random()
+        r = self.rng.random()
         if r > LOCK_CHANCE:
             # La plupart des portes restent ouvertes
             return DoorLockLevel.UNLOCKED
@@ -81,7 +88,7 @@ class Manor:
         #  - haut : ~80% lvl2
         p_lvl2 = 0.10 + 0.70 * t
 
-        r2 = random.random()
+        r2 = self.rng.random()
         if r2 < p_lvl2:
             return DoorLockLevel.DOUBLE_LOCKED
         else:
@@ -110,14 +117,144 @@ class Manor:
         self.grid[ante_r][ante_c] = antechamber
         self.antechamber_rc = (ante_r, ante_c)
 
+        # Hash de Zobrist des salles et des portes (voir zobrist.py)
+        self.zobrist = cell_key(start_r, start_c, entrance) ^ cell_key(ante_r, ante_c, antechamber)
+
+        # Copie à l'écriture (voir fork) : None tant que le manoir n'a jamais
+        # été forké (tout lui appartient, aucune vérification), sinon l'ensemble
+        # de ce qui lui appartient en propre depuis le dernier fork : lignes (r),
+        # cases (r, c), portes (r, c, dir) et "doors" pour le dictionnaire.
+        self._owned: set | None = None
+
+        # Transaction en cours du journal d'annulation (voir history.py)
+        self._ops: list | None = None
+
+    # ---------- Fork (partage de structure + copie à l'écriture) ----------
+
+    def fork(self, rng: random.Random) -> "Manor":
+        """
+        Copie indépendante du manoir en temps constant :
+        - grid  : les lignes sont partagées, une ligne est copiée à sa première écriture ;
+        - Room  : partagées, copiées avant d'être modifiées (own_room) ;
+        - doors : dictionnaire partagé, copié à la première porte créée ;
+          une Door est copiée avant d'être ouverte (own_door).
+        Après un fork, le manoir d'origine suit les mêmes règles.
+        """
+        clone = object.__new__(Manor)
+        clone.__dict__.update(self.__dict__)
+        clone.grid = list(self.grid)
+        clone.rng = rng
+        clone._ops = None
+        self._owned = set()
+        clone._owned = set()
+        return clone
+
+    def _own_row(self, r: int) -> None:
+        if r not in self._owned:
+            self.grid[r] = list(self.grid[r])
+            self._owned.add(r)
+
+    def _own_doors_dict(self) -> None:
+        if "doors" not in self._owned:
+            self.doors = dict(self.doors)
+            self._owned.add("doors")
+
+    def put_door(self, key: tuple[int, int, str], key2: tuple[int, int, str], door: Door) -> None:
+        """Enregistre door dans les deux sens (clé et clé opposée)."""
+        if self._owned is not None:
+            self._own_doors_dict()
+            self._owned.update((key, key2))
+        self.zobrist ^= door_key(key, door.lock_level.value, door.is_open)
+        self.doors[key] = door
+        self.doors[key2] = door
+
+    def drop_door(self, key: tuple[int, int, str], key2: tuple[int, int, str]) -> None:
+        """Retire une porte (annulation de sa création)."""
+        if self._owned is not None:
+            self._own_doors_dict()
+        door = self.doors.pop(key, None)
+        self.doors.pop(key2, None)
+        if door is not None:
+            self.zobrist ^= door_key(key, door.lock_level.value, door.is_open)
+
+    def open_door(self, from_rc: tuple[int, int], dir_: str, inventory) -> bool:
+        """Door.open sur la porte (copiée si partagée), en tenant le hash à jour."""
+        door = self.own_door(from_rc, dir_)
+        if door is None:
+            return False
+        was_open = door.is_open
+        if not door.open(inventory):
+            return False
+        if not was_open:
+            self._toggle_door_hash(from_rc, dir_, door)
+        return True
+
+    def set_door_open(self, from_rc: tuple[int, int], dir_: str, is_open: bool) -> None:
+        """Force l'état ouvert / fermé d'une porte (journal d'annulation)."""
+        door = self.own_door(from_rc, dir_)
+        if door.is_open != is_open:
+            door.is_open = is_open
+            self._toggle_door_hash(from_rc, dir_, door)
+
+    def _toggle_door_hash(self, from_rc: tuple[int, int], dir_: str, door: Door) -> None:
+        key = (from_rc[0], from_rc[1], dir_)
+        level = door.lock_level.value
+        self.zobrist ^= door_key(key, level, True) ^ door_key(key, level, False)
+
+    def own_room(self, r: int, c: int) -> Optional[Room]:
+        """Retourne la Room à (r, c), copiée au préalable si elle est partagée avec un fork."""
+        room = self.grid[r][c]
+        if room is None or self._owned is None or (r, c) in self._owned:
+            return room
+        room = clone_room(room)
+        self._own_row(r)
+        self._owned.add((r, c))
+        self.grid[r][c] = room
+        return room
+
+    def own_door(self, from_rc: tuple[int, int], dir_: str) -> Door | None:
+        """Comme get_door, mais la Door est copiée au préalable si elle est partagée avec un fork."""
+        r, c = from_rc
+        key = (r, c, dir_)
+        door = self.doors.get(key)
+        if door is None or self._owned is None or key in self._owned:
+            return door
+
+        dr, dc = DIR_VECTORS[dir_]
+        key2 = (r + dr, c + dc, opposite_dir(dir_))
+        copy = Door(door.lock_level)
+        copy.is_open = door.is_open
+
+        self._own_doors_dict()
+        self.doors[key] = self.doors[key2] = copy
+        self._owned.update((key, key2))
+        return copy
+
     # ---------- Accès basiques à la grille ----------
 
     def get_room(self, r: int, c: int) -> Optional[Room]:
         """Retourne la Room à (r, c), ou None si aucune pièce n'est placée ici."""
         return self.grid[r][c]
 
-    def set_room(self, r: int, c: int, room: Room) -> None:
-        """Place une Room dans la grille à (r, c)."""
+    def set_room(self, r: int, c: int, room: Room, private: bool = True) -> None:
+        """
+        Place une Room dans la grille à (r, c).
+        private=False : room peut être partagée avec un fork (restauration
+        depuis le journal d'annulation), elle sera copiée avant modification.
+        """
+        old = self.grid[r][c]
+        if self._ops is not None:
+            self._ops.append((CELL, r, c, old, room))
+        if old is not None:
+            self.zobrist ^= cell_key(r, c, old)
+        if room is not None:
+            self.zobrist ^= cell_key(r, c, room)
+        if self._owned is not None:
+            self._own_row(r)
+            if private:
+                self._owned.add((r, c))
+            else:
+                self._owned.discard((r, c))
         self.grid[r][c] = room
 
     def in_bounds(self, r: int, c: int) -> bool:
@@ -189,8 +326,9 @@ class Manor:
         opp = opposite_dir(dir_)
         key2 = (nr, nc, opp)
 
-        self.doors[key] = door
-        self.doors[key2] = door
+        if self._ops is not None:
+            self._ops.append((NEW_DOOR, key, key2, level))
+        self.put_door(key, key2, door)
 
         return door
 
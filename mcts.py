@@ -0,0 +1,300 @@
+# mcts.py
+import io
+import math
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import GameEngine, MOVE_N, MOVE_S, MOVE_E, MOVE_W, PICK_0, PICK_2, SEARCH, INTERACT, EAT, CANCEL
+from items import Food
+from random_manager import LazyRandom
+from zobrist import TranspositionTable
+
+"""
+Bot Monte-Carlo Tree Search (UCT) qui joue avec les vraies règles (GameEngine).
+
+Une décision = plusieurs recherches indépendantes lancées en parallèle dans
+un pool de processus (une par processus, même budget de temps), dont on
+additionne les visites par action à la racine ; l'action la plus visitée
+est jouée (parallélisation « à la racine »).
+
+Chaque itération d'une recherche :
+- fork de la partie avec un générateur neuf (les tirages des salles et des
+  fouilles changent d'une itération à l'autre) ;
+- descente dans l'arbre par UCB1. Les nœuds sont indexés par hash d'état
+  (zobrist.py) : deux suites d'actions qui mènent au même état partagent
+  leurs statistiques, et une action qui ne change rien (mur, porte fermée
+  sans clé, salle déjà fouillée) est retirée du nœud ;
+- au premier état inconnu : nouveau nœud puis partie simulée (politique
+  simple, orientée vers l'antichambre), coupée après ROLLOUT_DEPTH actions
+  et estimée par evaluate().
+
+Toutes les actions du moteur sont explorées (déplacements, choix de salle,
+relance, fouille, interaction, nourriture, boutique), sauf CANCEL pendant un
+choix de salle : il ramène à l'état d'avant le déplacement.
+
+    python bots.py --policy mcts --games 20
+"""
+
+MCTS_BUDGET_S = 0.25        # temps de réflexion par décision (s)
+MCTS_EXPLORATION = 1.0      # constante d'exploration de UCB1
+ROLLOUT_DEPTH = 40          # actions simulées au plus après la sortie de l'arbre
+TREE_MAX_DEPTH = 60         # profondeur maximale d'une descente dans l'arbre
+BLOCKED_TABLE_SIZE = 1 << 14
+
+
+def evaluate(engine: GameEngine) -> float:
+    """
+    Valeur d'une partie dans [0, 1] : 1 victoire, 0 défaite, sinon une
+    estimation < 0.5 (proximité de l'antichambre, pas restants).
+    """
+    if engine.state == "END":
+        return 1.0 if engine.win else 0.0
+    manor = engine.manor
+    ar, ac = manor.antechamber_rc
+    dist = abs(engine.player.r - ar) + abs(engine.player.c - ac)
+    progress = 1.0 - dist / (manor.rows + manor.cols)
+    return 0.35 * progress + 0.1 * min(engine.player.steps, 20) / 20
+
+
+def search_actions(engine: GameEngine) -> list[int]:
+    """Actions explorées dans l'arbre (legal_actions sans CANCEL en PICK)."""
+    actions = engine.legal_actions()
+    if engine.state == "PICK" and len(actions) > 1:
+        actions.remove(CANCEL)
+    return actions
+
+
+def rollout_action(engine: GameEngine, rng: random.Random) -> int:
+    """Politique des parties simulées : hasard pondéré, sans retour en arrière inutile."""
+    if engine.state == "PICK":
+        picks = [a for a in engine.legal_actions() if PICK_0 <= a <= PICK_2]
+        return rng.choice(picks) if picks else CANCEL
+    if engine.state == "SHOP":
+        return CANCEL
+
+    player = engine.player
+    ar, ac = engine.manor.antechamber_rc
+    rc = (player.r, player.c)
+    actions = [MOVE_N, MOVE_S, MOVE_E, MOVE_W]
+    weights = [
+        3 if ar < player.r else 1,
+        3 if ar > player.r else 1,
+        2 if ac > player.c else 1,
+        2 if ac < player.c else 1,
+    ]
+    if rc not in engine.searched_rooms:
+        actions.append(SEARCH)
+        weights.append(1)
+    if rc not in engine.dug_rooms and player.inventory.has_shovel():
+        actions.append(INTERACT)
+        weights.append(1)
+    if player.steps < 5 and any(isinstance(item, Food) for item in player.inventory.items):
+        actions.append(EAT)
+        weights.append(4)
+    return rng.choices(actions, weights)[0]
+
+
+def rollout(engine: GameEngine, rng: random.Random, depth: int = ROLLOUT_DEPTH) -> float:
+    for _ in range(depth):
+        if engine.state == "END":
+            break
+        engine.apply_action(rollout_action(engine, rng))
+    return evaluate(engine)
+
+
+class _Node:
+    """Statistiques des actions d'un état (visites, somme des valeurs)."""
+
+    __slots__ = ("actions", "n", "visits", "values")
+
+    def __init__(self, actions: list[int]):
+        self.actions = actions
+        self.n = 0
+        self.visits = [0] * len(actions)
+        self.values = [0.0] * len(actions)
+
+    def select(self, exploration: float) -> int:
+        """Indice de l'action à jouer : d'abord les jamais essayées, puis UCB1."""
+        visits = self.visits
+        for i, v in enumerate(visits):
+            if v == 0:
+                return i
+        log_n = math.log(self.n)
+        best, best_score = 0, -1.0
+        for i, v in enumerate(visits):
+            score = self.values[i] / v + exploration * math.sqrt(log_n / v)
+            if score > best_score:
+                best, best_score = i, score
+        return best
+
+    def prune(self, i: int) -> None:
+        self.n -= self.visits[i]
+        del self.actions[i], self.visits[i], self.values[i]
+
+
+def search(root: GameEngine, budget_s: float, seed: int,
+           exploration: float = MCTS_EXPLORATION) -> dict[int, tuple[int, float]]:
+    """
+    Recherche UCT depuis root pendant budget_s secondes (au moins une itération).
+    Retourne {action: (visites, somme des valeurs)} à la racine. root n'est pas modifiée.
+    """
+    rng = random.Random(seed)
+    root = root.fork()
+    if root.blocked_table is None:
+        # Partagé par tous les forks de la recherche
+        root.blocked_table = TranspositionTable(BLOCKED_TABLE_SIZE)
+
+    root_hash = root.state_hash()
+    nodes: dict[int, _Node] = {root_hash: _Node(search_actions(root))}
+    deadline = time.perf_counter() + budget_s
+
+    while True:
+        sim = root.fork(LazyRandom(rng.getrandbits(64)))
+        path: list[tuple[_Node, int]] = []
+        on_path = set()
+
+        while True:
+            if sim.state == "END":
+                value = 1.0 if sim.win else 0.0
+                break
+            h = sim.state_hash()
+            node = nodes.get(h)
+            if node is None:
+                nodes[h] = _Node(search_actions(sim))
+                value = rollout(sim, rng)
+                break
+            if h in on_path or len(path) >= TREE_MAX_DEPTH:
+                value = rollout(sim, rng)
+                break
+            on_path.add(h)
+
+            i = node.select(exploration)
+            sim.apply_action(node.actions[i])
+            if len(node.actions) > 1 and sim.state_hash() == h:
+                node.prune(i)   # action sans effet dans cet état
+                on_path.discard(h)
+                continue
+            path.append((node, i))
+
+        for node, i in path:
+            node.n += 1
+            node.visits[i] += 1
+            node.values[i] += value
+
+        if time.perf_counter() >= deadline:
+            break
+
+    root_node = nodes[root_hash]
+    return {a: (v, w) for a, v, w in zip(root_node.actions, root_node.visits, root_node.values)}
+
+
+# ---------- Processus de calcul ----------
+
+def _no_image():
+    return None
+
+
+class _HeadlessPickler(pickle.Pickler):
+    """Sérialise une partie sans les surfaces pygame (images des salles en mode UI)."""
+
+    def reducer_override(self, obj):
+        if type(obj).__name__ == "Surface":
+            return _no_image, ()
+        return NotImplemented
+
+
+def dump_engine(engine: GameEngine) -> bytes:
+    """Fork sérialisé pour un processus de calcul (pickle.loads de l'autre côté)."""
+    buffer = io.BytesIO()
+    _HeadlessPickler(buffer, pickle.HIGHEST_PROTOCOL).dump(engine.fork())
+    return buffer.getvalue()
+
+
+def _search_worker(payload: bytes, budget_s: float, seed: int, exploration: float):
+    return search(pickle.loads(payload), budget_s, seed, exploration)
+
+
+class Decision:
+    """Décision en cours de calcul dans le pool (voir MCTSPolicy.submit)."""
+
+    def __init__(self, futures=(), action: int | None = None):
+        self._futures = list(futures)
+        self._action = action
+
+    def done(self) -> bool:
+        return self._action is not None or all(f.done() for f in self._futures)
+
+    def result(self) -> int:
+        if self._action is None:
+            totals: dict[int, list] = {}
+            for future in self._futures:
+                for action, (visits, value) in future.result().items():
+                    total = totals.setdefault(action, [0, 0.0])
+                    total[0] += visits
+                    total[1] += value
+            # La plus visitée ; à égalité, la meilleure valeur moyenne
+            self._action = max(totals, key=lambda a: (totals[a][0], totals[a][1] / max(1, totals[a][0])))
+        return self._action
+
+
+class MCTSPolicy:
+    """
+    Policy MCTS (choose(engine) -> action, comme bots.RandomPolicy).
+    workers=0 : recherche dans le processus courant ; sinon pool de
+    `workers` processus (par défaut un par cœur), à fermer avec close().
+    """
+
+    def __init__(self, budget_s: float = MCTS_BUDGET_S, workers: int | None = None,
+                 seed: int | None = None, exploration: float = MCTS_EXPLORATION):
+        self.budget_s = budget_s
+        self.exploration = exploration
+        self.random = random.Random(seed)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._pool = ProcessPoolExecutor(self.workers) if self.workers > 0 else None
+
+    def submit(self, engine: GameEngine) -> Decision:
+        """Lance la recherche sans attendre (autoplay de l'interface)."""
+        actions = search_actions(engine)
+        if len(actions) <= 1:
+            return Decision(action=actions[0] if actions else CANCEL)
+
+        if self._pool is None:
+            result = search(engine, self.budget_s, self.random.getrandbits(64), self.exploration)
+            return Decision([_Done(result)])
+
+        payload = dump_engine(engine)
+        return Decision(
+            self._pool.submit(_search_worker, payload, self.budget_s,
+                              self.random.getrandbits(64), self.exploration)
+            for _ in range(self.workers)
+        )
+
+    def choose(self, engine: GameEngine) -> int:
+        return self.submit(engine).result()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Done:
+    """Résultat déjà disponible (recherche faite dans le processus courant)."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def done(self) -> bool:
+        return True
+
+    def result(self):
+        return self._value
@@ -0,0 +1,191 @@
+# memory_report.py
+import argparse
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+
+from engine import GameEngine
+from bots import RandomPolicy, play_game
+
+"""
+Rapport mémoire (tracemalloc) par partie et par session.
+
+Budgets documentés :
+- GAME_BUDGET_BYTES           : mémoire retenue par UNE partie active
+  (GameEngine complet : manoir 5×9 de Room, portes, offres de salles,
+  inventaire, salles fouillées / creusées...). Une partie ne peut jamais
+  dépasser 45 salles et ~150 entrées de portes : ce budget est un plafond.
+- SESSION_GROWTH_BUDGET_BYTES : croissance tolérée de la mémoire tracée du
+  processus entre le début et la fin d'une session de parties enchaînées
+  (caches bornés, métriques...). Au-delà, on soupçonne une fuite.
+
+Vérification de non-régression (sortie en erreur si un budget est dépassé) :
+    python memory_report.py --games 1000
+"""
+
+GAME_BUDGET_BYTES = 64 * 1024
+SESSION_GROWTH_BUDGET_BYTES = 256 * 1024
+
+# Parties d'échauffement avant la photo mémoire de référence (caches, imports...)
+SESSION_WARMUP = 50
+
+
+@dataclass
+class GameMemory:
+    """Mesure d'une partie : octets retenus + taille des structures qui grossissent."""
+    seed: int
+    retained_bytes: int
+    peak_bytes: int
+    actions: int
+    rooms_placed: int
+    doors: int
+    offers: int
+    offer_rooms: int       # salles proposées (modèle + coût, pas de Room clonée)
+    stale_offers: int
+    searched: int
+    dug: int
+
+
+@dataclass
+class SessionReport:
+    games: list[GameMemory] = field(default_factory=list)
+    # Croissance mesurée entre l'échauffement et la fin (hors ce module)
+    session_growth_bytes: int = 0
+
+    @property
+    def max_game_bytes(self) -> int:
+        return max((g.retained_bytes for g in self.games), default=0)
+
+    @property
+    def mean_game_bytes(self) -> float:
+        if not self.games:
+            return 0.0
+        return sum(g.retained_bytes for g in self.games) / len(self.games)
+
+    def violations(self) -> list[str]:
+        errors = []
+        if self.max_game_bytes > GAME_BUDGET_BYTES:
+            errors.append(
+                f"partie au-dessus du budget : {self.max_game_bytes} > {GAME_BUDGET_BYTES} octets"
+            )
+        if self.session_growth_bytes > SESSION_GROWTH_BUDGET_BYTES:
+            errors.append(
+                f"la session grossit : +{self.session_growth_bytes} > "
+                f"{SESSION_GROWTH_BUDGET_BYTES} octets"
+            )
+        return errors
+
+    def format(self) -> str:
+        if not self.games:
+            return "Aucune partie mesurée."
+        worst = max(self.games, key=lambda g: g.retained_bytes)
+        return "\n".join([
+            f"Parties : {len(self.games)}",
+            f"Mémoire par partie active : moyenne {self.mean_game_bytes / 1024:.1f} Kio, "
+            f"max {self.max_game_bytes / 1024:.1f} Kio (budget {GAME_BUDGET_BYTES / 1024:.0f} Kio)",
+            f"Pire partie (graine {worst.seed}) : {worst.rooms_placed} salles, {worst.doors} portes, "
+            f"{worst.offers} offres ({worst.offer_rooms} salles proposées, {worst.stale_offers} périmées)",
+            f"Croissance de session : {self.session_growth_bytes / 1024:+.1f} Kio "
+            f"(budget {SESSION_GROWTH_BUDGET_BYTES / 1024:.0f} Kio)",
+        ])
+
+
+def _offer_stats(engine: GameEngine) -> tuple[int, int, int]:
+    """(nb d'offres, nb de salles proposées au total, nb d'offres vers une case déjà remplie)."""
+    offers = engine.offers
+    rooms = sum(len(offer) for _, offer in offers.items())
+    stale = sum(1 for dest, _ in offers.items() if engine.manor.get_room(*dest) is not None)
+    return len(offers), rooms, stale
+
+
+def measure_game(seed: int, max_actions: int = 2000) -> GameMemory:
+    """
+    Joue une partie (bot aléatoire) et mesure la mémoire qu'elle retient
+    tant qu'elle est active. tracemalloc doit être démarré.
+    """
+    gc.collect()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+
+    engine = GameEngine.new_game(seed)
+    actions = play_game(engine, RandomPolicy(seed), max_actions)
+
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+
+    offers, offer_rooms, stale = _offer_stats(engine)
+    rooms = sum(room is not None for row in engine.manor.grid for room in row)
+
+    return GameMemory(
+        seed=seed,
+        retained_bytes=current - before,
+        peak_bytes=peak - before,
+        actions=actions,
+        rooms_placed=rooms,
+        doors=len(engine.manor.doors),
+        offers=offers,
+        offer_rooms=offer_rooms,
+        stale_offers=stale,
+        searched=len(engine.searched_rooms),
+        dug=len(engine.dug_rooms),
+    )
+
+
+def _session_snapshot() -> tracemalloc.Snapshot:
+    """Photo mémoire sans les allocations du rapport lui-même (liste des mesures...)."""
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+
+
+def run_session(n_games: int, first_seed: int = 0, max_actions: int = 2000) -> SessionReport:
+    """
+    Enchaîne n_games parties dans le même processus et suit la mémoire :
+    une fois les SESSION_WARMUP premières parties jouées, la mémoire tracée
+    doit rester plate jusqu'à la fin de la session.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    report = SessionReport()
+    reference = None
+    try:
+        for i, seed in enumerate(range(first_seed, first_seed + n_games)):
+            if i == SESSION_WARMUP:
+                reference = _session_snapshot()
+            report.games.append(measure_game(seed, max_actions))
+
+        if reference is not None:
+            final = _session_snapshot()
+            report.session_growth_bytes = sum(
+                stat.size_diff for stat in final.compare_to(reference, "filename")
+            )
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rapport mémoire des parties (tracemalloc).")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-actions", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    report = run_session(args.games, args.seed, args.max_actions)
+    print(report.format())
+
+    errors = report.violations()
+    for err in errors:
+        print("ÉCHEC :", err)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# metrics.py
+import bisect
+import json
+import os
+import time
+from functools import wraps
+
+"""
+Registre de métriques léger (compteurs, jauges, histogrammes).
+
+Une seule surface pour la santé "gameplay" (tirages, portes, fouilles,
+achats, issues de partie) et "performance" (latences du moteur), à la place
+des print("DEBUG: ...") éparpillés.
+
+Export :
+- to_prometheus() / write_prometheus(path) : format texte Prometheus
+  (utilisable avec le textfile collector de node_exporter).
+- snapshot() / write_json(path)            : instantané JSON.
+"""
+
+# Bornes par défaut des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+def _format_labels(labelnames: tuple, values: tuple) -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Compteur monotone, éventuellement étiqueté (labels)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = tuple(str(v) for v in labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self.values.get(tuple(str(v) for v in labels), 0)
+
+    def reset(self) -> None:
+        self.values.clear()
+
+    def prometheus_lines(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(self.values.items())
+        ]
+
+    def snapshot(self):
+        if not self.labelnames:
+            return self.values.get((), 0)
+        return {",".join(key): value for key, value in sorted(self.values.items())}
+
+
+class Gauge(Counter):
+    """Valeur instantanée (peut monter et descendre)."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        self.values[tuple(str(v) for v in labels)] = value
+
+
+class Histogram:
+    """Histogramme à bornes fixes (cumulatif à l'export, comme Prometheus)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_
+        self.buckets = tuple(sorted(buckets))
+        self.reset()
+
+    def reset(self) -> None:
+        # Un seau par borne + "+Inf"
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def timed(self, func):
+        """Décorateur : observe la durée de chaque appel de func."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - t0)
+        return wrapper
+
+    def quantile(self, q: float) -> float:
+        """Estimation grossière d'un quantile (borne haute du seau concerné)."""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for bound, n in zip(self.buckets, self.counts):
+            acc += n
+            if acc >= target:
+                return bound
+        return float("inf")
+
+    def prometheus_lines(self) -> list[str]:
+        lines = []
+        acc = 0
+        for bound, n in zip(self.buckets, self.counts):
+            acc += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {acc}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Ensemble nommé de métriques, exportable en Prometheus ou JSON."""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrique déjà enregistrée : {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_, labelnames))
+
+    def gauge(self, name: str, help_: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help_, labelnames))
+
+    def histogram(self, name: str, help_: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_, buckets))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+    # ----------------------------
+    # Export
+    # ----------------------------
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {
+            "timestamp": time.time(),
+            "metrics": {name: m.snapshot() for name, m in self._metrics.items()},
+        }
+
+    def write_prometheus(self, path: str) -> None:
+        _atomic_write(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        _atomic_write(path, json.dumps(self.snapshot(), indent=2))
+
+
+def _atomic_write(path: str, text: str) -> None:
+    """Écrit dans un fichier temporaire puis renomme (pas de fichier à moitié écrit)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# ---------- Registre global + métriques du moteur ----------
+
+METRICS = MetricsRegistry()
+
+ROOM_ROLLS = METRICS.counter("blueprince_room_rolls_total", "Tirages de 3 salles")
+ROOM_REROLLS = METRICS.counter("blueprince_room_rerolls_total", "Relances de tirage (dé consommé)")
+DOOR_OPENS = METRICS.counter("blueprince_door_opens_total", "Portes ouvertes", ("level",))
+BLOCKED_CHECKS = METRICS.counter(
+    "blueprince_blocked_checks_total", "Appels à is_player_blocked", ("blocked",)
+)
+SEARCHES = METRICS.counter("blueprince_searches_total", "Fouilles de salles")
+SHOP_PURCHASES = METRICS.counter("blueprince_shop_purchases_total", "Achats en boutique", ("item",))
+GAME_OUTCOMES = METRICS.counter("blueprince_game_outcomes_total", "Issues de partie", ("outcome",))
+
+AUTOSAVE_REQUESTS = METRICS.counter("blueprince_autosave_requests_total", "Sauvegardes automatiques demandées")
+AUTOSAVE_COALESCED = METRICS.counter(
+    "blueprince_autosave_coalesced_total", "Sauvegardes remplacées par une plus récente avant écriture"
+)
+AUTOSAVE_ERRORS = METRICS.counter("blueprince_autosave_errors_total", "Écritures de sauvegarde échouées")
+SERVER_REQUESTS = METRICS.counter("blueprince_server_requests_total", "Requêtes reçues par le serveur", ("op",))
+SESSION_LOOKUPS = METRICS.counter(
+    "blueprince_session_lookups_total", "Accès aux sessions : en mémoire (hit) ou sur disque (miss)", ("result",)
+)
+SESSION_EVICTIONS = METRICS.counter(
+    "blueprince_session_evictions_total", "Sessions écrites sur disque puis libérées", ("reason",)
+)
+SESSION_STORE_ERRORS = METRICS.counter(
+    "blueprince_session_store_errors_total", "Échecs d'écriture / de lecture des sessions évincées", ("stage",)
+)
+ANALYTICS_EVENTS = METRICS.counter(
+    "blueprince_analytics_events_total", "Événements de partie enregistrés (analytics.py)", ("kind",)
+)
+PROFILE_RESULTS = METRICS.counter(
+    "blueprince_profile_results_total", "Résultats de partie enregistrés dans la base des profils"
+)
+PROFILE_ERRORS = METRICS.counter(
+    "blueprince_profile_errors_total", "Échecs d'écriture / de lecture de la base des profils", ("stage",)
+)
+RACE_STALLS = METRICS.counter(
+    "blueprince_race_stalls_total", "Ticks de course en retard : entrée de l'adversaire pas encore reçue"
+)
+RACE_DESYNCS = METRICS.counter(
+    "blueprince_race_desyncs_total", "Courses où les hash d'état des deux joueurs ont divergé"
+)
+SERVER_BUSY = METRICS.counter(
+    "blueprince_server_busy_total", "Requêtes refusées : file de la session pleine (contre-pression)"
+)
+
+TILES_LOADED = METRICS.gauge("blueprince_tiles_loaded", "Tuiles chargées par tileset", ("tileset",))
+DECK_SIZE = METRICS.gauge("blueprince_room_deck_size", "Taille de la pioche construite")
+SERVER_SESSIONS = METRICS.gauge("blueprince_server_sessions", "Sessions ouvertes sur le serveur")
+SESSIONS_HOT = METRICS.gauge("blueprince_sessions_hot", "Sessions en mémoire")
+SESSIONS_COLD = METRICS.gauge("blueprince_sessions_cold", "Sessions évincées sur disque")
+
+BLOCKED_LATENCY = METRICS.histogram(
+    "blueprince_is_player_blocked_seconds", "Latence de is_player_blocked"
+)
+ROLL_LATENCY = METRICS.histogram(
+    "blueprince_roll_three_rooms_seconds", "Latence de roll_three_rooms"
+)
+PICK_LATENCY = METRICS.histogram(
+    "blueprince_confirm_pick_seconds", "Latence de confirm_pick"
+)
+AUTOSAVE_WRITE_LATENCY = METRICS.histogram(
+    "blueprince_autosave_write_seconds", "Durée d'écriture d'une sauvegarde (thread d'écriture)"
+)
+SERVER_ACTION_LATENCY = METRICS.histogram(
+    "blueprince_server_action_seconds", "Traitement d'une requête de session (hors réseau)"
+)
+SESSION_EVICT_LATENCY = METRICS.histogram(
+    "blueprince_session_evict_seconds", "Éviction d'une session (snapshot + écriture)"
+)
+SESSION_REHYDRATE_LATENCY = METRICS.histogram(
+    "blueprince_session_rehydrate_seconds", "Rechargement d'une session évincée (lecture + snapshot.load)"
+)
+ANALYTICS_FLUSH_LATENCY = METRICS.histogram(
+    "blueprince_analytics_flush_seconds", "Écriture d'un lot d'événements dans les colonnes"
+)
+PROFILE_BATCH_LATENCY = METRICS.histogram(
+    "blueprince_profile_batch_seconds", "Écriture d'un lot de résultats (une transaction, thread d'écriture)"
+)
+PROFILE_QUERY_LATENCY = METRICS.histogram(
+    "blueprince_profile_query_seconds", "Classements d'un résultat (requêtes préparées)"
+)
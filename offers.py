@@ -0,0 +1,95 @@
+# offers.py
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from room import Room
+from room_data import clone_room
+
+"""
+Cache des offres de salles (les 3 cartes proposées devant une case vide).
+
+- Clé : case de destination (r, c). Deux portes qui mènent à la même case
+  vide partagent donc la même offre.
+- Valeur : tuple compact de (nom du modèle, coût en gemmes) : aucune Room
+  clonée n'est gardée en mémoire, on les recrée à l'affichage.
+- Invalidation : quand la case est remplie (Manor.set_room) ou quand un
+  modèle proposé n'a plus de stock.
+- Borné : au-delà de max_entries, l'offre la plus anciennement consultée
+  est oubliée (elle sera retirée au prochain passage).
+"""
+
+OfferEntry = Tuple[str, int]          # (nom du modèle, coût en gemmes)
+Offer = Tuple[OfferEntry, ...]
+
+
+class OfferCache:
+    """Offres de salles par case de destination, bornées (LRU)."""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._offers: "OrderedDict[Tuple[int, int], Offer]" = OrderedDict()
+
+    def fork(self) -> "OfferCache":
+        """Copie indépendante (au plus max_entries offres, valeurs immuables)."""
+        clone = OfferCache(self.max_entries)
+        clone._offers = self._offers.copy()
+        return clone
+
+    def snapshot(self) -> tuple:
+        """État immuable du cache (journal d'annulation)."""
+        return tuple(self._offers.items())
+
+    def restore(self, snapshot: tuple) -> None:
+        self._offers = OrderedDict(snapshot)
+
+    def __len__(self) -> int:
+        return len(self._offers)
+
+    def __contains__(self, dest: Tuple[int, int]) -> bool:
+        return dest in self._offers
+
+    def items(self):
+        return self._offers.items()
+
+    def get(self, dest: Tuple[int, int]) -> Optional[Offer]:
+        offer = self._offers.get(dest)
+        if offer is not None:
+            self._offers.move_to_end(dest)
+        return offer
+
+    def put(self, dest: Tuple[int, int], rooms: Iterable[Room]) -> Offer:
+        """Mémorise l'offre faite pour dest (remplace l'éventuelle offre précédente)."""
+        offer = tuple((room.name, room.gem_cost) for room in rooms)
+        self._offers[dest] = offer
+        self._offers.move_to_end(dest)
+        while len(self._offers) > self.max_entries:
+            self._offers.popitem(last=False)
+        return offer
+
+    # ----------------------------
+    # Invalidation
+    # ----------------------------
+
+    def invalidate_cell(self, dest: Tuple[int, int]) -> None:
+        """La case a été remplie : son offre n'a plus de sens."""
+        self._offers.pop(dest, None)
+
+    def invalidate_template(self, name: str) -> None:
+        """Le modèle n'a plus de stock : on oublie les offres qui le proposent."""
+        stale = [dest for dest, offer in self._offers.items()
+                 if any(entry_name == name for entry_name, _ in offer)]
+        for dest in stale:
+            del self._offers[dest]
+
+    def clear(self) -> None:
+        self._offers.clear()
+
+
+def build_offer_rooms(offer: Offer, templates: Dict[str, Room]) -> List[Room]:
+    """Recrée les Room à afficher à partir d'une offre (modèle + coût)."""
+    rooms = []
+    for name, gem_cost in offer:
+        room = clone_room(templates[name])
+        room.gem_cost = gem_cost
+        rooms.append(room)
+    return rooms
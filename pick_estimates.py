@@ -0,0 +1,133 @@
+# pick_estimates.py
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import GameEngine, PICK_0
+from mcts import dump_engine, rollout_action
+
+"""
+Estimations affichées sur les cartes du choix de salle (draw_pick_screen_pulse) :
+probabilité de victoire et pas restants en fin de partie si l'on choisit
+cette salle.
+
+Parties simulées (Monte-Carlo) jusqu'au bout avec la politique des rollouts
+de mcts.py, par lots, dans un pool de processus :
+- graines dérivées du hash de l'état et de la carte : mêmes cartes, mêmes
+  estimations ;
+- affinage progressif : chaque lot terminé met à jour les moyennes et en
+  relance un autre, jusqu'à PICK_ESTIMATE_MAX parties par carte ;
+- tout est annulé dès que le choix change (sortie du PICK, relance) ;
+- update() ne fait que regarder les lots terminés : la boucle d'affichage
+  n'attend jamais.
+"""
+
+PICK_ESTIMATE_BATCH = 16        # parties simulées par lot
+PICK_ESTIMATE_MAX = 256         # parties par carte au plus
+ROLLOUT_MAX_ACTIONS = 400
+
+
+def _rollout_batch(payload: bytes, card: int, seed: int, n: int) -> tuple[int, int, int]:
+    """Tâche d'un processus : (parties, victoires, somme des pas restants)."""
+    engine = pickle.loads(payload)
+    wins = steps = 0
+    for i in range(n):
+        rng = random.Random(seed + i)
+        sim = engine.fork(random.Random(rng.getrandbits(64)))
+        sim.apply_action(PICK_0 + card)
+        actions = 0
+        while sim.state != "END" and actions < ROLLOUT_MAX_ACTIONS:
+            sim.apply_action(rollout_action(sim, rng))
+            actions += 1
+        wins += sim.win
+        steps += max(0, sim.player.steps)
+    return n, wins, steps
+
+
+class CardEstimate:
+    """Moyennes courantes pour une carte."""
+
+    __slots__ = ("games", "wins", "steps")
+
+    def __init__(self):
+        self.games = self.wins = self.steps = 0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def mean_steps(self) -> float:
+        return self.steps / self.games if self.games else 0.0
+
+
+class PickEstimator:
+    """Estimations des cartes proposées, calculées en arrière-plan."""
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._key = None
+        self._payload = b""
+        self._cards: list[CardEstimate | None] = []
+        self._pending: dict = {}        # future -> (carte, numéro de lot)
+
+    def update(self, engine: GameEngine) -> list[CardEstimate | None]:
+        """
+        À appeler à chaque frame. Relance les calculs si le choix a changé,
+        récupère les lots terminés et renvoie les estimations par carte
+        (None : carte trop chère).
+        """
+        if engine.state != "PICK":
+            self.cancel()
+            return []
+
+        key = engine.state_hash()
+        if key != self._key:
+            self._start(engine, key)
+
+        for future in [f for f in self._pending if f.done()]:
+            card, batch = self._pending.pop(future)
+            if future.cancelled():
+                continue
+            games, wins, steps = future.result()
+            estimate = self._cards[card]
+            estimate.games += games
+            estimate.wins += wins
+            estimate.steps += steps
+            if estimate.games < PICK_ESTIMATE_MAX:
+                self._submit(card, batch + self.workers)
+        return self._cards
+
+    def cancel(self) -> None:
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._key = None
+        self._cards = []
+
+    def close(self) -> None:
+        self.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _start(self, engine: GameEngine, key: int) -> None:
+        self.cancel()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        self._key = key
+        self._payload = dump_engine(engine)
+        gems = engine.player.gems
+        self._cards = [CardEstimate() if room.gem_cost <= gems else None for room in engine.pick_rooms]
+        for card, estimate in enumerate(self._cards):
+            if estimate is not None:
+                # Un lot d'avance par processus, pour que chacun ait du travail
+                for batch in range(self.workers):
+                    self._submit(card, batch)
+
+    def _submit(self, card: int, batch: int) -> None:
+        seed = hash((self._key, card, batch)) & 0xFFFFFFFF
+        future = self._pool.submit(_rollout_batch, self._payload, card, seed * PICK_ESTIMATE_BATCH,
+                                   PICK_ESTIMATE_BATCH)
+        self._pending[future] = (card, batch)
@@ -0,0 +1,383 @@
+# planner.py
+import heapq
+
+from door import DoorLockLevel
+from manoir import DIR_VECTORS, opposite_dir
+from room import RoomType
+
+"""
+Itinéraires les plus courts vers l'antichambre et vers les portes de la
+frontière (portes de salles posées qui donnent sur une case vide), sur les
+salles posées et les portes connues.
+
+- Coût d'un itinéraire : nombre de pas (1 par salle entrée), puis nombre de
+  clés dépensées, dans cet ordre. Un itinéraire ne dépense jamais plus de
+  clés que le joueur n'en a.
+- Portes (règles de Door.can_open) : ouverte ou niveau 0 -> 0 clé ;
+  LOCKED -> 0 clé avec le kit de crochetage, sinon 1 ; DOUBLE_LOCKED -> 1.
+  Porte pas encore tirée entre deux salles posées : règles fixes de
+  Manor.ensure_door (0 près de l'Entrée / l'Antichambre, double tour sur la
+  rangée de l'antichambre), sinon estimée ouverte (cas le plus fréquent).
+- Recherche de Dijkstra sur les états (case, clés dépensées).
+
+Antichambre : la cible ne bouge pas, on garde donc un champ de distances
+calculé depuis l'antichambre (portes symétriques). Après un déplacement,
+la réponse est une simple lecture ; après une pose ou une ouverture de
+porte, les distances ne peuvent que baisser et sont propagées depuis les
+seules cases touchées. Tout autre changement (porte tirée plus fermée
+qu'estimé, kit de crochetage, plus de clés que prévu, annulation)
+recalcule le champ.
+Frontière : recherche depuis le joueur, gardée tant que l'état ne change pas.
+
+    planner = RoutePlanner()
+    plan = planner.plan(engine)       # plan.antechamber, plan.frontier
+"""
+
+INF = 1 << 30
+
+
+class Route:
+    """Itinéraire : pas, clés dépensées, cases traversées (sans la case de départ)."""
+
+    __slots__ = ("steps", "keys", "path")
+
+    def __init__(self, steps: int, keys: int, path: tuple[tuple[int, int], ...]):
+        self.steps = steps
+        self.keys = keys
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"Route(steps={self.steps}, keys={self.keys}, path={self.path})"
+
+
+class RoutePlan:
+    """Itinéraires depuis la position du joueur."""
+
+    __slots__ = ("antechamber", "frontier")
+
+    def __init__(self, antechamber: Route | None, frontier: dict[tuple[int, int, str], Route]):
+        self.antechamber = antechamber
+        # Porte (r, c, dir) d'une salle posée vers une case vide -> itinéraire
+        # jusqu'à la salle posée derrière (franchissement compris)
+        self.frontier = frontier
+
+    def best_frontier(self, target: tuple[int, int]) -> tuple[tuple[int, int, str], Route] | None:
+        """Porte de frontière la moins chère, puis la plus proche de target."""
+        if not self.frontier:
+            return None
+
+        def score(item):
+            (r, c, dir_), route = item
+            dr, dc = DIR_VECTORS[dir_]
+            return route.steps, route.keys, abs(r + dr - target[0]) + abs(c + dc - target[1])
+
+        return min(self.frontier.items(), key=score)
+
+
+def door_cost(manor, rc: tuple[int, int], dir_: str, lockpick: bool) -> int:
+    """Clés à dépenser pour franchir la porte (rc, dir_) (voir Door.can_open)."""
+    door = manor.doors.get((rc[0], rc[1], dir_))
+    if door is not None:
+        if door.is_open or door.lock_level == DoorLockLevel.UNLOCKED:
+            return 0
+        if door.lock_level == DoorLockLevel.LOCKED and lockpick:
+            return 0
+        return 1
+
+    # Porte pas encore tirée : règles fixes de Manor.ensure_door
+    r, c = rc
+    dr, dc = DIR_VECTORS[dir_]
+    special = (RoomType.ENTRANCE, RoomType.ANTECHAMBER)
+    for room in (manor.grid[r][c], manor.grid[r + dr][c + dc] if manor.in_bounds(r + dr, c + dc) else None):
+        if room is not None and room.room_type in special:
+            return 0
+    return int(int((r + r + dr) / 2) == manor.antechamber_rc[0])
+
+
+def _links(manor, r: int, c: int):
+    """(voisin, direction) reliés à la salle posée (r, c) par des portes face à face."""
+    room = manor.grid[r][c]
+    for dir_ in room.doors:
+        dr, dc = DIR_VECTORS[dir_]
+        nr, nc = r + dr, c + dc
+        if not manor.in_bounds(nr, nc):
+            continue
+        other = manor.grid[nr][nc]
+        if other is not None and opposite_dir(dir_) in other.doors:
+            yield (nr, nc), dir_
+
+
+class RoutePlanner:
+    """Itinéraires mis en cache et mis à jour au fil de la partie (voir plus haut)."""
+
+    def __init__(self):
+        self._manor = None
+        self._zobrist = None
+        self._lockpick = None
+        self._kmax = -1
+        self._cells: dict[tuple[int, int], str] = {}                    # case -> nom de la salle
+        self._edges: dict[tuple[tuple[int, int], tuple[int, int]], int] = {}   # (a, b) -> clés
+        self._dist: dict[tuple[int, int], list[int]] = {}               # case -> pas par clés dépensées
+        self._frontier_key = None
+        self._frontier: dict = {}
+        self.rebuilds = 0
+        self.updates = 0
+
+    # ----------------------------
+    # Interface
+    # ----------------------------
+
+    def plan(self, engine) -> RoutePlan:
+        return RoutePlan(self.to_antechamber(engine), self.frontier(engine))
+
+    def to_antechamber(self, engine) -> Route | None:
+        """Itinéraire le plus court (pas, puis clés) vers l'antichambre, ou None."""
+        inv = engine.player.inventory
+        self._sync(engine.manor, inv.has_lockpick(), inv.keys)
+        start = (engine.player.r, engine.player.c)
+        dist = self._dist.get(start)
+        if dist is None:
+            return None
+
+        best_k = min(range(min(inv.keys, self._kmax) + 1), key=lambda k: (dist[k], k))
+        if dist[best_k] >= INF:
+            return None
+
+        # Chemin : on suit les voisins dont la distance baisse de 1
+        path, cell, k = [], start, best_k
+        steps = dist[best_k]
+        while steps > 0:
+            for nxt in self._neighbours(cell):
+                w = self._edges[(cell, nxt)]
+                if k >= w and self._dist[nxt][k - w] == steps - 1:
+                    cell, k, steps = nxt, k - w, steps - 1
+                    path.append(cell)
+                    break
+            else:
+                return None     # champ incohérent (ne doit pas arriver)
+        return Route(dist[best_k], best_k, tuple(path))
+
+    def estimate(self, engine) -> tuple[int, int] | None:
+        """(pas, clés) vers l'antichambre : heuristique pour les bots."""
+        route = self.to_antechamber(engine)
+        return None if route is None else (route.steps, route.keys)
+
+    def frontier(self, engine) -> dict[tuple[int, int, str], Route]:
+        """Itinéraire le plus court vers chaque porte de la frontière."""
+        manor, inv = engine.manor, engine.player.inventory
+        start = (engine.player.r, engine.player.c)
+        key = (manor.zobrist, start, inv.keys, inv.has_lockpick())
+        if key != self._frontier_key:
+            self._frontier = self._search_frontier(manor, start, inv.keys, inv.has_lockpick())
+            self._frontier_key = key
+        return self._frontier
+
+    # ----------------------------
+    # Champ de distances vers l'antichambre
+    # ----------------------------
+
+    def _neighbours(self, cell):
+        r, c = cell
+        for dr, dc in DIR_VECTORS.values():
+            nxt = (r + dr, c + dc)
+            if (cell, nxt) in self._edges:
+                yield nxt
+
+    def _read_edges(self, manor, lockpick: bool) -> dict:
+        edges = {}
+        for (r, c) in self._cells:
+            for nxt, dir_ in _links(manor, r, c):
+                edges[((r, c), nxt)] = door_cost(manor, (r, c), dir_, lockpick)
+        return edges
+
+    def _sync(self, manor, lockpick: bool, keys: int) -> None:
+        if manor is self._manor and manor.zobrist == self._zobrist \
+                and lockpick == self._lockpick and keys <= self._kmax:
+            return
+
+        cells = {
+            (r, c): room.name
+            for r, row in enumerate(manor.grid) for c, room in enumerate(row) if room is not None
+        }
+        incremental = (
+            manor is self._manor and lockpick == self._lockpick and keys <= self._kmax
+            and all(cells.get(cell) == name for cell, name in self._cells.items())
+        )
+        self._cells = cells
+        edges = self._read_edges(manor, lockpick)
+
+        seeds = []
+        if incremental:
+            for edge, w in edges.items():
+                old = self._edges.get(edge)
+                if old is not None and w > old:
+                    incremental = False     # porte plus fermée que prévu
+                    break
+                if old is None or w < old:
+                    seeds.append(edge)
+
+        self._manor, self._zobrist, self._lockpick = manor, manor.zobrist, lockpick
+        self._edges = edges
+        if incremental:
+            self.updates += 1
+            self._relax(seeds)
+        else:
+            self.rebuilds += 1
+            self._rebuild(manor, max(keys, self._kmax, 2))
+
+    def _rebuild(self, manor, kmax: int) -> None:
+        self._kmax = kmax
+        self._dist = {cell: [INF] * (kmax + 1) for cell in self._cells}
+        target = manor.antechamber_rc
+        heap = []
+        if target in self._dist:
+            self._dist[target][0] = 0
+            heap.append((0, 0, target))
+        self._propagate(heap)
+
+    def _relax(self, edges) -> None:
+        """Nouvelles arêtes / arêtes moins chères : propagation depuis leurs extrémités."""
+        for cell in self._cells:
+            self._dist.setdefault(cell, [INF] * (self._kmax + 1))
+        heap = []
+        for a, b in edges:
+            dist_a = self._dist[a]
+            for k, d in enumerate(dist_a):
+                if d < INF:
+                    heap.append((d, k, a))
+        heapq.heapify(heap)
+        self._propagate(heap)
+
+    def _propagate(self, heap) -> None:
+        dist, edges, kmax = self._dist, self._edges, self._kmax
+        while heap:
+            d, k, cell = heapq.heappop(heap)
+            if d > dist[cell][k]:
+                continue
+            for nxt in self._neighbours(cell):
+                k2 = k + edges[(cell, nxt)]
+                if k2 <= kmax and d + 1 < dist[nxt][k2]:
+                    dist[nxt][k2] = d + 1
+                    heapq.heappush(heap, (d + 1, k2, nxt))
+
+    # ----------------------------
+    # Frontière
+    # ----------------------------
+
+    def _search_frontier(self, manor, start, keys: int, lockpick: bool) -> dict:
+        best: dict[tuple[int, int, int], int] = {start + (0,): 0}   # (r, c, clés) -> pas
+        heap = [(0, 0, start, ())]
+        routes: dict[tuple[int, int, str], Route] = {}
+
+        while heap:
+            d, k, cell, path = heapq.heappop(heap)
+            if best.get(cell + (k,), INF) < d:
+                continue
+            r, c = cell
+            room = manor.grid[r][c]
+            if room is None:
+                continue
+            for dir_ in room.doors:
+                dr, dc = DIR_VECTORS[dir_]
+                nr, nc = r + dr, c + dc
+                if not manor.in_bounds(nr, nc):
+                    continue
+                k2 = k + door_cost(manor, cell, dir_, lockpick)
+                if k2 > keys:
+                    continue
+                other = manor.grid[nr][nc]
+                if other is None:
+                    door = (r, c, dir_)
+                    old = routes.get(door)
+                    if old is None or (d + 1, k2) < (old.steps, old.keys):
+                        routes[door] = Route(d + 1, k2, path + ((nr, nc),))
+                elif opposite_dir(dir_) in other.doors:
+                    state = (nr, nc, k2)
+                    if d + 1 < best.get(state, INF):
+                        best[state] = d + 1
+                        heapq.heappush(heap, (d + 1, k2, (nr, nc), path + ((nr, nc),)))
+        return routes
+
+
+def hint_text(plan: RoutePlan, target: tuple[int, int]) -> str:
+    """Indice du HUD : itinéraire vers l'antichambre, sinon meilleure porte à ouvrir."""
+    def cost(route: Route) -> str:
+        keys = f", {route.keys} clé{'s' if route.keys > 1 else ''}" if route.keys else ""
+        return f"{route.steps} pas{keys}"
+
+    if plan.antechamber is not None:
+        return f"Antichambre : {cost(plan.antechamber)}."
+    best = plan.best_frontier(target)
+    if best is None:
+        return "Aucune porte atteignable avec tes clés."
+    (r, c, dir_), route = best
+    return f"Porte à explorer : {dir_} depuis ({r}, {c}), {cost(route)}."
+
+
+# ---------- Vérification : python planner.py --games 200 ----------
+
+def main(argv=None) -> int:
+    """
+    Parties au hasard : à chaque action, le planificateur mis à jour au fil
+    de l'eau doit donner le même résultat qu'un planificateur neuf, et
+    l'itinéraire doit être praticable (salles voisines, portes face à face,
+    clés annoncées).
+    """
+    import argparse
+    import time
+    from engine import GameEngine
+    from bots import RandomPolicy
+
+    parser = argparse.ArgumentParser(description="Vérification du planificateur d'itinéraires.")
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    planner = RoutePlanner()
+    incremental_s = fresh_s = 0.0
+    queries = 0
+    for seed in range(args.games):
+        engine = GameEngine.new_game(seed)
+        policy = RandomPolicy(seed)
+        steps = 0
+        while engine.state != "END" and steps < 500:
+            engine.apply_action(policy.choose(engine))
+            steps += 1
+
+            t0 = time.perf_counter()
+            route = planner.to_antechamber(engine)
+            t1 = time.perf_counter()
+            expected = RoutePlanner().to_antechamber(engine)
+            incremental_s += t1 - t0
+            fresh_s += time.perf_counter() - t1
+            queries += 1
+
+            got = None if route is None else (route.steps, route.keys)
+            want = None if expected is None else (expected.steps, expected.keys)
+            if got != want or (route is not None and not _valid(engine, route)):
+                failures += 1
+                print(f"graine {seed}, action {steps} : {route} au lieu de {expected}")
+                break
+
+    print(f"Itinéraires : {args.games - failures}/{args.games} parties correctes, "
+          f"{planner.updates} mises à jour / {planner.rebuilds} recalculs")
+    print(f"Par action : {incremental_s / max(1, queries) * 1e6:.1f} µs (cache + mises à jour) "
+          f"vs {fresh_s / max(1, queries) * 1e6:.1f} µs (recalcul complet)")
+    return 1 if failures else 0
+
+
+def _valid(engine, route: Route) -> bool:
+    manor, inv = engine.manor, engine.player.inventory
+    cell, keys = (engine.player.r, engine.player.c), 0
+    for nxt in route.path:
+        links = dict(_links(manor, *cell))
+        if nxt not in links:
+            return False
+        keys += door_cost(manor, cell, links[nxt], inv.has_lockpick())
+        cell = nxt
+    return cell == manor.antechamber_rc and keys == route.keys <= inv.keys \
+        and len(route.path) == route.steps
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
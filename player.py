@@ -19,6 +19,13 @@ class Player:
         self.c = start_c
         self.inventory = inventory if inventory is not None else Inventory()
 
+    def fork(self) -> "Player":
+        """Copie indépendante du joueur (inventaire copié à l'écriture)."""
+        clone = object.__new__(Player)
+        clone.r, clone.c = self.r, self.c
+        clone.inventory = self.inventory.fork()
+        return clone
+
     # ----------------------------
     # Déplacements
     # ----------------------------
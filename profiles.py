@@ -0,0 +1,380 @@
+# profiles.py
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from metrics import PROFILE_RESULTS, PROFILE_ERRORS, PROFILE_BATCH_LATENCY, PROFILE_QUERY_LATENCY
+
+"""
+Profils des joueurs : résultats de chaque partie et classements (SQLite).
+
+Un résultat (GameResult) : joueur, graine, victoire, pas restants, salles
+posées, gemmes et or ramassés, durée, jour. La base est un fichier SQLite
+en mode WAL (les lectures ne bloquent pas l'écriture) avec un index par
+classement, dans l'ordre du classement (victoire, puis pas restants, puis
+durée) :
+- par graine (rang du résultat parmi les parties sur la même graine) ;
+- par jour (meilleur résultat du jour) ;
+- par joueur (record personnel).
+
+Le jeu ne touche jamais la base : submit() dépose le résultat dans une file
+et rend un Future. Le thread d'écriture écrit en une transaction tout ce qui
+s'est accumulé pendant l'écriture précédente (lots), puis calcule les
+classements de chaque résultat avec des requêtes préparées une fois pour
+toutes (cache de sqlite3 sur sa connexion) et les publie dans le Future.
+L'écran de fin n'affiche que ce qui est prêt (Leaderboard.lines) : aucune
+requête pendant draw_end_screen.
+
+    python profiles.py --results 200000    # écriture par lots, classements vérifiés
+"""
+
+PROFILE_BATCH_SIZE = 512
+PROFILE_TOP = 3
+
+_STOP = object()
+
+# Ordre des classements : victoire, puis pas restants, puis partie la plus courte
+_ORDER = "win DESC, steps_left DESC, duration_s ASC"
+_COLUMNS = "player, seed, win, steps_left, rooms, gems, gold, duration_s, day, finished_at"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    seed INTEGER,
+    win INTEGER NOT NULL,
+    steps_left INTEGER NOT NULL,
+    rooms INTEGER NOT NULL,
+    gems INTEGER NOT NULL,
+    gold INTEGER NOT NULL,
+    duration_s REAL NOT NULL,
+    day TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_seed ON results (seed, {_ORDER});
+CREATE INDEX IF NOT EXISTS results_by_day ON results (day, {_ORDER});
+CREATE INDEX IF NOT EXISTS results_by_player ON results (player, {_ORDER});
+"""
+
+_INSERT = f"INSERT INTO results ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_ENTRY = "player, win, steps_left, rooms, duration_s"
+SQL_SEED_TOP = f"SELECT {_ENTRY} FROM results WHERE seed = ? ORDER BY {_ORDER} LIMIT ?"
+SQL_SEED_COUNT = "SELECT COUNT(*) FROM results WHERE seed = ?"
+# Résultats strictement meilleurs sur la même graine : rang - 1
+SQL_SEED_BETTER = """
+SELECT COUNT(*) FROM results WHERE seed = ? AND (
+    win > ? OR (win = ? AND steps_left > ?) OR (win = ? AND steps_left = ? AND duration_s < ?)
+)"""
+SQL_DAY_BEST = f"SELECT {_ENTRY} FROM results WHERE day = ? ORDER BY {_ORDER} LIMIT 1"
+SQL_PLAYER_BEST = f"SELECT {_ENTRY} FROM results WHERE player = ? ORDER BY {_ORDER} LIMIT 1"
+SQL_PLAYER_COUNT = "SELECT COUNT(*), COALESCE(SUM(win), 0) FROM results WHERE player = ?"
+
+
+@dataclass
+class GameResult:
+    """Résultat d'une partie, tel qu'il est enregistré."""
+    player: str
+    seed: int | None
+    win: bool
+    steps_left: int
+    rooms: int
+    gems: int
+    gold: int
+    duration_s: float
+    finished_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def of(cls, engine, player: str, seed: int | None, duration_s: float) -> "GameResult":
+        """Résultat d'une partie terminée (salles posées : hors entrée et antichambre)."""
+        inv = engine.player.inventory
+        manor = engine.manor
+        rooms = sum(room is not None for row in manor.grid for room in row) - 2
+        return cls(player, seed, engine.win, max(0, inv.steps), rooms,
+                   inv.gems_collected, inv.gold_collected, duration_s)
+
+    @property
+    def day(self) -> str:
+        """Jour (heure locale) de la fin de partie, AAAA-MM-JJ."""
+        return time.strftime("%Y-%m-%d", time.localtime(self.finished_at))
+
+    def row(self) -> tuple:
+        return (self.player, self.seed, int(self.win), self.steps_left, self.rooms,
+                self.gems, self.gold, self.duration_s, self.day, self.finished_at)
+
+
+@dataclass
+class Leaderboard:
+    """Classements d'un résultat, calculés juste après son écriture."""
+    seed_rank: int | None = None        # 1 = meilleur résultat sur cette graine
+    seed_total: int = 0
+    seed_top: list[tuple] = field(default_factory=list)
+    day_best: tuple | None = None       # (joueur, victoire, pas, salles, durée)
+    personal_best: tuple | None = None
+    games: int = 0                      # parties du joueur
+    wins: int = 0
+
+    def lines(self) -> list[str]:
+        """Quelques lignes pour l'écran de fin."""
+        lines = []
+        if self.seed_rank is not None:
+            lines.append(f"Graine : {self.seed_rank}{'er' if self.seed_rank == 1 else 'e'} "
+                         f"sur {self.seed_total}")
+        if self.day_best is not None:
+            lines.append(f"Meilleur du jour : {_entry_text(self.day_best)}")
+        if self.personal_best is not None:
+            lines.append(f"Record perso : {_entry_text(self.personal_best)} "
+                         f"({self.wins}/{self.games} victoires)")
+        return lines
+
+
+def _entry_text(entry: tuple) -> str:
+    player, win, steps, rooms, duration = entry
+    outcome = f"victoire, {steps} pas restants" if win else f"défaite, {rooms} salles"
+    return f"{player}, {outcome}, {duration:.0f} s"
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Connexion en mode WAL, schéma créé au besoin."""
+    db = sqlite3.connect(path, cached_statements=64)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA busy_timeout=5000")
+    db.executescript(_SCHEMA)
+    return db
+
+
+def leaderboard(db: sqlite3.Connection, result: GameResult) -> Leaderboard:
+    """Classements de result (déjà écrit) ; requêtes préparées réutilisées par db."""
+    t0 = time.perf_counter()
+    board = Leaderboard()
+    if result.seed is not None:
+        win, steps, duration = int(result.win), result.steps_left, result.duration_s
+        better, = db.execute(SQL_SEED_BETTER, (result.seed, win, win, steps, win, steps, duration)).fetchone()
+        board.seed_rank = better + 1
+        board.seed_total, = db.execute(SQL_SEED_COUNT, (result.seed,)).fetchone()
+        board.seed_top = db.execute(SQL_SEED_TOP, (result.seed, PROFILE_TOP)).fetchall()
+    board.day_best = db.execute(SQL_DAY_BEST, (result.day,)).fetchone()
+    board.personal_best = db.execute(SQL_PLAYER_BEST, (result.player,)).fetchone()
+    board.games, board.wins = db.execute(SQL_PLAYER_COUNT, (result.player,)).fetchone()
+    PROFILE_QUERY_LATENCY.observe(time.perf_counter() - t0)
+    return board
+
+
+class ProfileStore:
+    """Base des résultats : écriture par lots et classements dans un thread dédié."""
+
+    def __init__(self, path: str, batch_size: int = PROFILE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+        self.last_error: sqlite3.Error | None = None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="profiles", daemon=True)
+        self._thread.start()
+
+    def submit(self, result: GameResult, boards: bool = True) -> Future:
+        """
+        Dépose un résultat sans attendre (thread du jeu). Le Future rend ses
+        classements (Leaderboard), ou None avec boards=False.
+        """
+        future = Future()
+        self._queue.put((result, boards, future))
+        return future
+
+    def flush(self) -> None:
+        """Attend l'écriture de tout ce qui a été déposé."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Écrit les résultats en attente puis arrête le thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    # ---------- Thread d'écriture ----------
+
+    def _run(self) -> None:
+        try:
+            db = connect(self.path)
+        except sqlite3.Error as e:
+            self.last_error = e
+            PROFILE_ERRORS.inc("open")
+            db = None
+        while True:
+            batch = [self._queue.get()]
+            # Lot : tout ce qui s'est accumulé pendant l'écriture précédente
+            while batch[-1] is not _STOP and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            entries = batch[:-1] if stop else batch
+            if entries and db is None:
+                for _, _, future in entries:
+                    future.set_exception(self.last_error)
+            elif entries:
+                self._write(db, entries)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                if db is not None:
+                    db.close()
+                return
+
+    def _write(self, db: sqlite3.Connection, entries: list) -> None:
+        t0 = time.perf_counter()
+        try:
+            with db:
+                db.executemany(_INSERT, [result.row() for result, _, _ in entries])
+        except sqlite3.Error as e:
+            self.last_error = e
+            PROFILE_ERRORS.inc("write")
+            for _, _, future in entries:
+                future.set_exception(e)
+            return
+        PROFILE_BATCH_LATENCY.observe(time.perf_counter() - t0)
+        PROFILE_RESULTS.inc(amount=len(entries))
+        self.written += len(entries)
+        self.batches += 1
+
+        for result, boards, future in entries:
+            if not boards:
+                future.set_result(None)
+                continue
+            try:
+                future.set_result(leaderboard(db, result))
+            except sqlite3.Error as e:
+                PROFILE_ERRORS.inc("query")
+                future.set_exception(e)
+
+
+# ---------- Vérification : python profiles.py ----------
+
+def _rank_key(r: GameResult) -> tuple:
+    return (-int(r.win), -r.steps_left, r.duration_s)
+
+
+def _score(entry: tuple | None) -> tuple | None:
+    """(victoire, pas, durée) d'une entrée : deux ex aequo peuvent différer par le joueur."""
+    return None if entry is None else (entry[1], entry[2], entry[4])
+
+
+def _reference(groups: dict, result: GameResult) -> tuple:
+    """Mêmes classements, calculés en Python sur les résultats groupés."""
+    same_seed = groups["seed", result.seed]
+    day_best = min(groups["day", result.day], key=_rank_key)
+    mine = groups["player", result.player]
+    personal = min(mine, key=_rank_key)
+    return (sum(_rank_key(r) < _rank_key(result) for r in same_seed) + 1, len(same_seed),
+            (int(day_best.win), day_best.steps_left, day_best.duration_s),
+            (int(personal.win), personal.steps_left, personal.duration_s),
+            len(mine), sum(r.win for r in mine))
+
+
+def main(argv=None) -> int:
+    import argparse
+    import random
+    import tempfile
+    from collections import defaultdict
+    from bots import RandomPolicy, play_game
+    from engine import GameEngine
+
+    parser = argparse.ArgumentParser(description="Résultats écrits par lots, classements vérifiés.")
+    parser.add_argument("--results", type=int, default=200_000, help="résultats synthétiques")
+    parser.add_argument("--games", type=int, default=200, help="parties de bot enregistrées")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--seeds", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    players = [f"joueur{i}" for i in range(args.players)]
+    now = time.time()
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        store = ProfileStore(os.path.join(directory, "profiles.db"))
+
+        # Volume : résultats déposés d'un coup, sans classements
+        results = []
+        groups = defaultdict(list)
+
+        def add(result):
+            results.append(result)
+            for group in (("seed", result.seed), ("day", result.day), ("player", result.player)):
+                groups[group].append(result)
+
+        t0 = time.perf_counter()
+        for _ in range(args.results):
+            win = rng.random() < 0.05
+            result = GameResult(rng.choice(players), rng.randrange(args.seeds), win,
+                                rng.randrange(1, 40) if win else 0, rng.randrange(3, 30),
+                                rng.randrange(10), rng.randrange(30), round(rng.uniform(30, 900), 1),
+                                now - rng.randrange(7) * 86400)
+            store.submit(result, boards=False)
+            add(result)
+        submit_s = time.perf_counter() - t0
+        store.flush()
+        write_s = time.perf_counter() - t0
+
+        # Fin de partie réelle : résultat déposé, classements attendus par l'écran de fin
+        waits = []
+        for seed in range(args.games):
+            engine = GameEngine.new_game(seed % args.seeds)
+            started = time.perf_counter()
+            play_game(engine, RandomPolicy(seed))
+            result = GameResult.of(engine, players[seed % args.players], seed % args.seeds,
+                                   time.perf_counter() - started)
+            t0 = time.perf_counter()
+            future = store.submit(result)
+            board = future.result()
+            waits.append(time.perf_counter() - t0)
+            add(result)
+            expected = _reference(groups, result)
+            got = (board.seed_rank, board.seed_total, _score(board.day_best),
+                   _score(board.personal_best), board.games, board.wins)
+            if got != expected:
+                print(f"partie {seed} : classements {got}, attendus {expected}")
+                failures += 1
+            if not board.lines():
+                print(f"partie {seed} : aucune ligne pour l'écran de fin")
+                failures += 1
+        store.close()
+
+        db = connect(store.path)
+        mode, = db.execute("PRAGMA journal_mode").fetchone()
+        count, = db.execute("SELECT COUNT(*) FROM results").fetchone()
+        plans = [db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()[-1][-1]
+                 for sql, params in ((SQL_SEED_TOP, (0, 3)), (SQL_DAY_BEST, ("",)), (SQL_PLAYER_BEST, ("",)))]
+        db.close()
+
+    if mode != "wal":
+        print(f"mode de journal {mode}, WAL attendu")
+        failures += 1
+    if count != len(results) or store.written != len(results):
+        print(f"{count} résultats en base, {len(results)} déposés")
+        failures += 1
+    for plan in plans:
+        if "USING INDEX" not in plan or "TEMP B-TREE" in plan:
+            print(f"requête sans index de classement : {plan}")
+            failures += 1
+
+    waits.sort()
+    print(f"{args.results} résultats tirés et déposés en {submit_s * 1e3:.0f} ms "
+          f"({submit_s / args.results * 1e6:.1f} µs chacun), écrits en {write_s:.2f} s "
+          f"({args.results / write_s:,.0f}/s) ; {store.batches} lots")
+    print(f"Classements ({args.games} fins de partie) : "
+          f"{PROFILE_QUERY_LATENCY.sum / max(1, PROFILE_QUERY_LATENCY.count) * 1e6:.0f} µs de requêtes, "
+          f"prêts {waits[len(waits) // 2] * 1e3:.2f} ms (p50) / {waits[int(len(waits) * 0.99)] * 1e3:.2f} ms (p99) "
+          f"après le dépôt")
+    print(f"{failures} erreurs")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,562 @@
+# race.py
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import pygame
+
+from constants import *
+from engine import GameEngine, NUM_ACTIONS
+from game import Game
+from manoir import Manor
+from metrics import RACE_STALLS, RACE_DESYNCS
+from player import Player
+from ui import draw_race_panel
+from zobrist import MASK64
+
+"""
+Course à deux joueurs : même graine (même manoir, même pioche), le premier
+arrivé à l'antichambre gagne.
+
+Seules les entrées circulent. Chaque instance simule les deux parties
+(GameEngine est déterministe pour une graine) en lockstep : le temps est
+découpé en ticks de tick_ms ; l'entrée tapée pendant le tick T est jouée au
+tick T + delay, des deux côtés, et un tick n'est simulé qu'une fois l'entrée
+de l'adversaire reçue pour ce tick (sinon on attend : tick en retard).
+Le délai d'entrée est donc borné et réglable : delay × tick_ms (150 ms par
+défaut), plus le temps de transport s'il le dépasse.
+
+Flux d'octets dans chaque sens (TCP, sur la boucle locale ou le réseau local),
+après l'en-tête HELLO de l'hôte (graine, délai, fréquence des hash, tick) :
+    0x00           tick sans entrée
+    action + 1     une action élémentaire (engine.MOVE_N ... CANCEL)
+    0xFE, case     déplacement rapide (travel_to), case = r × COLS + c
+    0xFF, hash     hash 64 bits des deux parties (state_hash), tous les
+                   hash_every ticks et au tick où la course se termine
+Une action coûte 1 octet (2 pour un déplacement rapide), un tick sans
+entrée aussi ; les hash reçus sont comparés dans l'ordre aux hash calculés
+localement : la première différence signale une désynchronisation.
+
+    python race.py --host                  # attend l'adversaire (port 7879), joue au clavier
+    python race.py --join 127.0.0.1:7879   # rejoint la course
+    python race.py --check                 # deux bots en boucle locale : lockstep et désynchro vérifiés
+    python race.py --host --bot --delay 2  # joueur automatique, délai de 2 ticks
+"""
+
+RACE_PORT = 7879
+RACE_INPUT_DELAY = 3        # ticks
+RACE_TICK_MS = 50
+RACE_HASH_EVERY = 20        # ticks
+RACE_MAX_PENDING = 4        # entrées locales en attente d'un tick (au-delà : ignorées)
+RACE_MAX_CATCHUP = 32       # ticks rattrapés au plus par appel de pump()
+
+MAGIC = b"BPR1"
+_HELLO = struct.Struct("<4sQBHH")      # magic, graine, délai, hash_every, tick_ms
+_HASH = struct.Struct("<Q")
+
+IDLE = 0x00
+TRAVEL_MARK = 0xFE
+HASH_MARK = 0xFF
+
+
+def race_hash(games) -> int:
+    """Hash des deux parties, dans l'ordre des joueurs."""
+    h0, h1 = games[0].state_hash(), games[1].state_hash()
+    return h0 ^ (((h1 << 1) | (h1 >> 63)) & MASK64)
+
+
+class Lockstep:
+    """
+    Les deux parties d'une course et l'échange des entrées, sans réseau :
+    send_next() / take_output() produisent les octets à envoyer, receive()
+    consomme ceux de l'adversaire, step() simule le tick suivant s'il est prêt.
+    """
+
+    def __init__(self, seed: int, player: int, delay: int = RACE_INPUT_DELAY,
+                 hash_every: int = RACE_HASH_EVERY, cols: int = COLS):
+        self.seed = seed
+        self.player = player
+        self.delay = delay
+        self.hash_every = hash_every
+        self.cols = cols
+        self.games = [GameEngine.new_game(seed), GameEngine.new_game(seed)]
+        self.tick = 0
+        # Entrées par joueur et par tick (None : aucune) ; les `delay` premiers ticks sont vides
+        self.inputs = ([None] * delay, [None] * delay)
+        self.pending: deque = deque()      # (entrée, tick de saisie)
+        self.delays: list[int] = []        # délai de chaque entrée locale, en ticks
+        self.finish_tick: int | None = None
+        self.winners: tuple[int, ...] = ()
+        self.desync: int | None = None
+        self.verified = -1                 # dernier tick dont le hash concorde
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.lock = threading.Lock()
+        self._out = bytearray()
+        self._rx = bytearray()
+        self._hash_ticks: deque = deque()
+        self._local_hashes: deque = deque()
+        self._remote_hashes: deque = deque()
+
+    @property
+    def game(self) -> GameEngine:
+        return self.games[self.player]
+
+    @property
+    def opponent(self) -> GameEngine:
+        return self.games[1 - self.player]
+
+    # ---------- Entrées locales ----------
+
+    def submit(self, entry) -> bool:
+        """Action (int) ou déplacement rapide ((r, c)), joué au premier tick libre + delay."""
+        if len(self.pending) >= RACE_MAX_PENDING:
+            return False
+        self.pending.append((entry, self.tick))
+        return True
+
+    def waiting(self) -> bool:
+        """True si une entrée locale n'a pas encore été jouée."""
+        return bool(self.pending) or any(entry is not None for entry in self.inputs[self.player][self.tick:])
+
+    def send_next(self) -> None:
+        """Entrée locale du tick tick + delay (une au plus par tick), si pas déjà envoyée."""
+        mine = self.inputs[self.player]
+        if len(mine) > self.tick + self.delay:
+            return
+        entry = None
+        if self.pending:
+            entry, typed = self.pending.popleft()
+            self.delays.append(len(mine) - typed)
+        mine.append(entry)
+        if entry is None:
+            self._out.append(IDLE)
+        elif isinstance(entry, tuple):
+            self._out += bytes((TRAVEL_MARK, entry[0] * self.cols + entry[1]))
+        else:
+            self._out.append(entry + 1)
+
+    def take_output(self) -> bytes:
+        data = bytes(self._out)
+        self._out.clear()
+        self.sent_bytes += len(data)
+        return data
+
+    # ---------- Entrées de l'adversaire ----------
+
+    def receive(self, data: bytes) -> None:
+        self.received_bytes += len(data)
+        rx = self._rx
+        rx += data
+        theirs = self.inputs[1 - self.player]
+        i = 0
+        while i < len(rx):
+            code = rx[i]
+            if code == HASH_MARK:
+                if i + 1 + _HASH.size > len(rx):
+                    break
+                self._remote_hashes.append(_HASH.unpack_from(rx, i + 1)[0])
+                i += 1 + _HASH.size
+            elif code == TRAVEL_MARK:
+                if i + 2 > len(rx):
+                    break
+                theirs.append(divmod(rx[i + 1], self.cols))
+                i += 2
+            elif code == IDLE:
+                theirs.append(None)
+                i += 1
+            elif code <= NUM_ACTIONS:
+                theirs.append(code - 1)
+                i += 1
+            else:
+                raise ValueError(f"octet de course inconnu : {code:#x}")
+        del rx[:i]
+        self._compare_hashes()
+
+    # ---------- Simulation ----------
+
+    def ready(self) -> bool:
+        return self.tick < len(self.inputs[0]) and self.tick < len(self.inputs[1])
+
+    def step(self) -> bool:
+        """Simule le tick suivant ; False si l'entrée de l'adversaire manque encore."""
+        if not self.ready():
+            return False
+        for game, inputs in zip(self.games, self.inputs):
+            entry = inputs[self.tick]
+            if entry is None or game.state == "END":
+                continue
+            # Méthodes de GameEngine : la partie locale peut être un RaceGame,
+            # dont apply_action / travel_to ne font que soumettre l'entrée
+            if isinstance(entry, tuple):
+                GameEngine.travel_to(game, *entry)
+            else:
+                GameEngine.apply_action(game, entry)
+
+        if self.finish_tick is None:
+            won = tuple(p for p, game in enumerate(self.games) if game.state == "END" and game.win)
+            if won or all(game.state == "END" for game in self.games):
+                self.finish_tick = self.tick
+                self.winners = won
+        if (self.tick + 1) % self.hash_every == 0 or self.finish_tick == self.tick:
+            h = race_hash(self.games)
+            self._hash_ticks.append(self.tick)
+            self._local_hashes.append(h)
+            self._out.append(HASH_MARK)
+            self._out += _HASH.pack(h)
+            self._compare_hashes()
+        self.tick += 1
+        return True
+
+    def _compare_hashes(self) -> None:
+        while self._local_hashes and self._remote_hashes:
+            tick = self._hash_ticks.popleft()
+            if self._local_hashes.popleft() != self._remote_hashes.popleft():
+                if self.desync is None:
+                    self.desync = tick
+                    RACE_DESYNCS.inc()
+            elif self.desync is None:
+                self.verified = tick
+
+    @property
+    def done(self) -> bool:
+        """Course terminée et hash final confirmé par l'adversaire (ou désynchronisée)."""
+        return self.desync is not None or (self.finish_tick is not None and self.verified == self.finish_tick)
+
+    def status(self) -> str:
+        if self.desync is not None:
+            return f"Désynchronisation détectée au tick {self.desync} !"
+        if self.finish_tick is None:
+            return ""
+        if not self.winners:
+            return "Course terminée : personne n'atteint l'antichambre."
+        if len(self.winners) == 2:
+            return "Égalité : antichambre atteinte au même tick !"
+        return "Tu gagnes la course !" if self.winners[0] == self.player else "L'adversaire gagne la course."
+
+
+# ---------- Réseau ----------
+
+def host(seed: int, port: int = RACE_PORT, delay: int = RACE_INPUT_DELAY,
+         hash_every: int = RACE_HASH_EVERY, tick_ms: int = RACE_TICK_MS,
+         bind: str = "127.0.0.1", on_listen=None) -> "RacePeer":
+    """Attend un adversaire, lui envoie les paramètres de la course ; joueur 0."""
+    with socket.create_server((bind, port)) as server:
+        if on_listen is not None:
+            on_listen(server.getsockname()[1])
+        sock, _ = server.accept()
+    sock.sendall(_HELLO.pack(MAGIC, seed, delay, hash_every, tick_ms))
+    return RacePeer(sock, Lockstep(seed, 0, delay, hash_every), tick_ms / 1000)
+
+
+def join(address: str) -> "RacePeer":
+    """Rejoint une course (hôte:port) ; joueur 1, paramètres reçus de l'hôte."""
+    hostname, _, port = address.rpartition(":")
+    sock = socket.create_connection((hostname or "127.0.0.1", int(port)))
+    data = b""
+    while len(data) < _HELLO.size:
+        chunk = sock.recv(_HELLO.size - len(data))
+        if not chunk:
+            raise ConnectionError("l'hôte a fermé la connexion")
+        data += chunk
+    magic, seed, delay, hash_every, tick_ms = _HELLO.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("ce n'est pas une course Blue Prince")
+    return RacePeer(sock, Lockstep(seed, 1, delay, hash_every), tick_ms / 1000)
+
+
+class RacePeer:
+    """Lockstep relié à l'adversaire : thread de lecture, ticks avancés par pump() au fil de l'horloge."""
+
+    def __init__(self, sock: socket.socket, lockstep: Lockstep, tick_s: float):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.lockstep = lockstep
+        self.tick_s = tick_s
+        self.closed = False
+        self.stalls = 0
+        self._start = time.perf_counter()
+        self._reader = threading.Thread(target=self._read, name="race", daemon=True)
+        self._reader.start()
+
+    def submit(self, entry) -> bool:
+        with self.lockstep.lock:
+            return self.lockstep.submit(entry)
+
+    def pump(self) -> None:
+        """Envoie les entrées et simule les ticks échus (sans jamais attendre le réseau)."""
+        lockstep = self.lockstep
+        due = int((time.perf_counter() - self._start) / self.tick_s)
+        for _ in range(RACE_MAX_CATCHUP):
+            if lockstep.tick >= due:
+                break
+            with lockstep.lock:
+                lockstep.send_next()
+                advanced = lockstep.step()
+                data = lockstep.take_output()
+            if data:
+                try:
+                    self.sock.sendall(data)
+                except OSError:
+                    self.closed = True
+            if not advanced:
+                self.stalls += 1
+                RACE_STALLS.inc()
+                break
+
+    def next_tick_in(self) -> float:
+        """Secondes avant le prochain tick (attente des bots)."""
+        return max(0.0, self._start + (self.lockstep.tick + 1) * self.tick_s - time.perf_counter())
+
+    def _read(self) -> None:
+        while True:
+            try:
+                data = self.sock.recv(4096)
+            except OSError:
+                data = b""
+            if not data:
+                self.closed = True
+                return
+            with self.lockstep.lock:
+                self.lockstep.receive(data)
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+# ---------- Interface ----------
+
+class RaceGame(Game):
+    """
+    Course au clavier : les entrées partent dans le lockstep au lieu d'être
+    jouées tout de suite ; la partie (et celle de l'adversaire) avance à
+    chaque tick simulé.
+    """
+
+    _UI_ATTRS = Game._UI_ATTRS + ("peer",)
+
+    def __init__(self, peer: RacePeer):
+        self.peer = peer
+        seed = peer.lockstep.seed
+        # Même construction que GameEngine.new_game(seed)
+        rand = random.Random(seed)
+        manor = Manor(rng=rand)
+        super().__init__(manor, Player(*manor.start), rand, seed)
+        self._fork_key = seed
+        self.history = None     # pas d'annulation en course
+        peer.lockstep.games[peer.lockstep.player] = self
+        self.message = "Course lancée : premier à l'antichambre !"
+
+    def apply_action(self, action: int) -> None:
+        if not self.peer.submit(action):
+            self.message = "Trop d'actions en attente."
+
+    def travel_to(self, r: int, c: int) -> bool:
+        return self.peer.submit((r, c))
+
+    def toggle_autoplay(self):
+        self.message = "Pilote automatique indisponible en course."
+
+    def load_game(self, path: str = SAVE_PATH):
+        self.message = "Chargement indisponible en course."
+
+    def handle_end_input(self, event: pygame.event.Event):
+        pass
+
+    def update_remote(self):
+        self.peer.pump()
+
+    def draw_remote(self):
+        lockstep = self.peer.lockstep
+        other = lockstep.opponent
+        lines = [f"Adversaire : {'arrivé' if other.win else 'éliminé' if other.state == 'END' else 'en course'}, "
+                 f"{other.player.steps} pas, case {other.player.r},{other.player.c}",
+                 f"Délai d'entrée {lockstep.delay * self.peer.tick_s * 1000:.0f} ms, tick {lockstep.tick}"]
+        if self.peer.closed and not lockstep.done:
+            lines.append("Adversaire déconnecté.")
+        status = lockstep.status()
+        if status:
+            lines.append(status)
+        draw_race_panel(self.screen, lines)
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.peer.close()
+
+
+# ---------- Vérification : python race.py --check ----------
+
+def play_bot(peer: RacePeer, seed: int, desync_at: int | None = None, timeout_s: float = 120.0) -> None:
+    """Joueur automatique : une action au hasard dès que la précédente a été jouée."""
+    from bots import RandomPolicy
+    policy = RandomPolicy(seed)
+    lockstep = peer.lockstep
+    deadline = time.perf_counter() + timeout_s
+    while not lockstep.done and time.perf_counter() < deadline:
+        if peer.closed and not lockstep.ready():
+            break
+        peer.pump()
+        with lockstep.lock:
+            if desync_at is not None and lockstep.tick >= desync_at:
+                lockstep.opponent.player.steps += 1     # copie de l'adversaire corrompue
+                desync_at = None
+            if lockstep.finish_tick is None and lockstep.game.state != "END" and not lockstep.waiting():
+                lockstep.submit(policy.choose(lockstep.game))
+        time.sleep(max(peer.next_tick_in(), 0.001))
+
+
+def _replay(seed: int, inputs, ticks: int) -> int:
+    """Les deux parties rejouées directement à partir des entrées : hash attendu."""
+    games = [GameEngine.new_game(seed), GameEngine.new_game(seed)]
+    for tick in range(ticks):
+        for game, entries in zip(games, inputs):
+            entry = entries[tick] if tick < len(entries) else None
+            if entry is None or game.state == "END":
+                continue
+            if isinstance(entry, tuple):
+                game.travel_to(*entry)
+            else:
+                game.apply_action(entry)
+    return race_hash(games)
+
+
+def run_pair(seed: int, delay: int, hash_every: int, tick_ms: int,
+             desync_at: int | None = None) -> tuple[Lockstep, Lockstep, float]:
+    """Course entre deux bots reliés par la boucle locale (un thread chacun)."""
+    listening = threading.Event()
+    port = []
+    peers: list = [None, None]
+
+    def start_host():
+        peers[0] = host(seed, 0, delay, hash_every, tick_ms,
+                        on_listen=lambda p: (port.append(p), listening.set()))
+
+    thread = threading.Thread(target=start_host)
+    thread.start()
+    listening.wait()
+    peers[1] = join(f"127.0.0.1:{port[0]}")
+    thread.join()
+
+    t0 = time.perf_counter()
+    bots = [threading.Thread(target=play_bot, args=(peers[0], seed * 2)),
+            threading.Thread(target=play_bot, args=(peers[1], seed * 2 + 1, desync_at))]
+    for bot in bots:
+        bot.start()
+    for bot in bots:
+        bot.join()
+    elapsed = time.perf_counter() - t0
+    for peer in peers:
+        peer.close()
+    return peers[0].lockstep, peers[1].lockstep, elapsed
+
+
+def check(races: int, delay: int, hash_every: int, tick_ms: int) -> int:
+    failures = 0
+    actions = action_bytes = sent = ticks = 0
+    delays = []
+    duration = 0.0
+    for seed in range(races):
+        a, b, elapsed = run_pair(seed, delay, hash_every, tick_ms)
+        duration += elapsed
+        if a.desync is not None or b.desync is not None:
+            print(f"course {seed} : désynchronisation sans raison (ticks {a.desync}, {b.desync})")
+            failures += 1
+            continue
+        if not (a.done and b.done):
+            print(f"course {seed} : non terminée (ticks {a.tick}, {b.tick})")
+            failures += 1
+            continue
+        if a.finish_tick != b.finish_tick or a.winners != b.winners:
+            print(f"course {seed} : résultats différents ({a.finish_tick}, {a.winners} / {b.finish_tick}, {b.winners})")
+            failures += 1
+        end = a.finish_tick + 1
+        expected = _replay(seed, a.inputs, end)
+        if expected != _replay(seed, b.inputs, end):
+            print(f"course {seed} : entrées différentes d'un côté à l'autre")
+            failures += 1
+        played = [entry for entries in a.inputs for entry in entries[:end] if entry is not None]
+        actions += len(played)
+        action_bytes += sum(2 if isinstance(entry, tuple) else 1 for entry in played)
+        sent += a.sent_bytes + b.sent_bytes
+        ticks += end
+        delays += a.delays + b.delays
+        print(f"course {seed} : {a.status()} (tick {a.finish_tick}, "
+              f"{'joueur ' + ' et '.join(str(p) for p in a.winners) if a.winners else 'aucun vainqueur'}) ; "
+              f"hash vérifiés jusqu'au tick {a.verified}")
+
+    # Désynchronisation provoquée : détectée au plus tard au hash suivant
+    desync_at = 3 * hash_every // 2
+    a, b, _ = run_pair(races, delay, hash_every, tick_ms, desync_at)
+    detected = b.desync if b.desync is not None else a.desync
+    limit = (desync_at // hash_every + 1) * hash_every
+    if detected is None or detected > limit:
+        print(f"désynchronisation au tick {desync_at} non détectée avant le tick {limit} ({detected})")
+        failures += 1
+    else:
+        print(f"Désynchronisation provoquée au tick {desync_at} : détectée au tick {detected} "
+              f"(hôte : {a.desync}, invité : {b.desync})")
+
+    print(f"{races} courses, {actions} actions, {ticks} ticks de {tick_ms} ms : "
+          f"{action_bytes / max(1, actions):.2f} octet par action ; "
+          f"{sent / max(1, 2 * ticks):.2f} octet par tick et par joueur en tout (ticks vides et hash compris, "
+          f"{sent / max(1, 2 * ticks) * 1000 / tick_ms:.0f} o/s)")
+    if delays:
+        delays.sort()
+        print(f"Délai d'entrée : {delays[len(delays) // 2]} ticks (p50), {delays[-1]} (max), "
+              f"pour {delay} configurés ; {RACE_STALLS.get():.0f} ticks en retard ; {duration:.1f} s de course")
+    print(f"{failures} erreurs")
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Course à deux joueurs (lockstep, entrées seules).")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--host", action="store_true", help="attend un adversaire")
+    mode.add_argument("--join", metavar="HÔTE:PORT", help="rejoint une course")
+    mode.add_argument("--check", action="store_true", help="deux bots en boucle locale")
+    parser.add_argument("--port", type=int, default=RACE_PORT)
+    parser.add_argument("--bind", default="127.0.0.1", help="adresse d'écoute de l'hôte")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--delay", type=int, default=RACE_INPUT_DELAY, help="délai d'entrée, en ticks")
+    parser.add_argument("--tick-ms", type=int, default=None,
+                        help=f"durée d'un tick (défaut {RACE_TICK_MS} ms, 5 ms pour --check)")
+    parser.add_argument("--hash-every", type=int, default=RACE_HASH_EVERY)
+    parser.add_argument("--races", type=int, default=5, help="--check : nombre de courses")
+    parser.add_argument("--bot", action="store_true", help="joueur automatique au lieu du clavier")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        return check(args.races, args.delay, args.hash_every, args.tick_ms or 5)
+    tick_ms = args.tick_ms or RACE_TICK_MS
+
+    if args.host:
+        seed = args.seed if args.seed is not None else random.randrange(1 << 32)
+        print(f"Course (graine {seed}) : en attente d'un adversaire sur le port {args.port}…")
+        peer = host(seed, args.port, args.delay, args.hash_every, tick_ms, args.bind)
+    else:
+        peer = join(args.join)
+
+    if args.bot:
+        play_bot(peer, peer.lockstep.seed * 2 + peer.lockstep.player, timeout_s=3600)
+        print(peer.lockstep.status() or "Course interrompue.")
+        peer.close()
+        return 1 if peer.lockstep.desync is not None else 0
+
+    RaceGame(peer).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
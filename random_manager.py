@@ -12,11 +12,39 @@ Ici :
 """
 
 
+class LazyRandom:
+    """
+    random.Random créé au premier tirage seulement (graine fixée d'avance).
+    Sert aux forks de partie : créer un générateur coûte plusieurs µs, et
+    la plupart des forks d'exploration ne tirent jamais au hasard.
+    """
+
+    def __init__(self, seed: int):
+        self._seed = seed
+        self._real: random.Random | None = None
+
+    def __getattr__(self, name):
+        if self._real is None:
+            self._real = random.Random(self._seed)
+        value = getattr(self._real, name)
+        # Les accès suivants ne repassent plus par __getattr__
+        self.__dict__[name] = value
+        return value
+
+    def __reduce__(self):
+        # pickle / copy : générateur réel s'il a déjà servi, sinon la graine seule
+        if self._real is None:
+            return LazyRandom, (self._seed,)
+        return self._real.__reduce__()
+
+
 class RandomManager:
     """Gère les tirages aléatoires du jeu."""
 
-    def __init__(self, player):
+    def __init__(self, player, rand: random.Random | None = None):
         self.player = player  # on suppose que player.inventory existe
+        # Générateur de la partie (module random par défaut)
+        self.random = rand if rand is not None else random
 
     # ----------------------------
     # Tirage d'un consommable
@@ -74,7 +102,7 @@ class RandomManager:
     def weighted_choice(self, table):
         """Choisit un élément dans une table [(obj, probabilité)]."""
         total = sum(p for _, p in table)
-        r = random.uniform(0, total)
+        r = self.random.uniform(0, total)
 
         current = 0.0
         for obj, prob in table:
@@ -0,0 +1,433 @@
+# replay_viewer.py
+import bisect
+import sys
+import time
+
+import pygame
+
+import snapshot
+from action_log import ActionLog, OPT_HISTORY, start, step
+from constants import *
+from door import Door
+from engine import GameEngine
+from manoir import DIR_VECTORS
+from room_data import clone_room
+from ui import (
+    draw_grid, draw_player, draw_hud,
+    draw_pick_screen_pulse, draw_shop_window, draw_timeline,
+)
+
+"""
+Visionneuse de journaux d'actions (.bpl) avec accès direct à n'importe
+quelle action.
+
+Le journal est rejoué une fois à l'ouverture (ReplayIndex) :
+- toutes les KEYFRAME_INTERVAL actions, une image clé (snapshot.save :
+  état complet, générateur compris) ;
+- après chaque action, un Delta : cases changées, portes créées / ouvertes,
+  variation des ressources, et le reste (objets, position, phase, cartes,
+  pioche, fouilles, message) seulement s'il a changé.
+
+Aller à l'action i = image clé précédente (recherche dichotomique) puis au
+plus KEYFRAME_INTERVAL - 1 deltas : quelques centaines de µs, quelle que
+soit la longueur du journal. L'état ainsi reconstruit sert à l'affichage
+(hash et générateur ne sont pas tenus à jour) ; engine_at(i) rend une partie
+exacte, jouable, en rejouant les entrées depuis l'image clé (depuis le début
+si le journal contient des annulations).
+
+    python replay_viewer.py replays/game_42.bpl
+    python replay_viewer.py --check --actions 20000   # accès direct vérifié + temps
+
+Commandes : ← → action par action, ↑ ↓ par 100, Début / Fin, Espace lecture /
+pause, clic ou glisser sur la frise.
+"""
+
+KEYFRAME_INTERVAL = 64
+PLAYBACK_ACTIONS_PER_S = 20
+
+_TEMPLATES = {tpl.name: tpl for tpl in snapshot.TEMPLATES}
+
+
+class Delta:
+    """Passage de l'état i - 1 à l'état i (None : partie inchangée)."""
+
+    __slots__ = ("cells", "doors", "res", "items", "scalars", "picks",
+                 "stock", "marks", "messages")
+
+    def __init__(self):
+        self.cells = ()        # ((r, c, (nom, coût, visitée) | None), ...)
+        self.doors = ()        # ((clé S/E, (niveau, ouverte) | None), ...)
+        self.res = None        # variations (pas, or, gemmes, clés, dés)
+        self.items = None      # (consommables, permanents)
+        self.scalars = None    # (r, c, phase, victoire, curseur, direction, case en attente)
+        self.picks = None      # ((nom, coût), ...)
+        self.stock = ()        # ((nom, restant), ...)
+        self.marks = None      # (fouillées, creusées)
+        self.messages = None   # (message, message boutique)
+
+
+def _view(engine: GameEngine) -> tuple:
+    """Tout ce que la visionneuse affiche, sous forme comparable."""
+    manor, inv = engine.manor, engine.player.inventory
+    cells = tuple(
+        None if room is None else (room.name, room.gem_cost, room.visited)
+        for row in manor.grid for room in row
+    )
+    doors = {key: (door.lock_level, door.is_open)
+             for key, door in manor.doors.items() if key[2] == "S" or key[2] == "E"}
+    return (
+        cells, doors,
+        (inv.steps, inv.gold, inv.gems, inv.keys, inv.dice),
+        (tuple(snapshot.item_code(item) for item in inv.items), frozenset(inv.permanent_items)),
+        (engine.player.r, engine.player.c, engine.state, engine.win, engine.pick_idx,
+         engine._pending_dir, engine._pending_dest),
+        tuple((room.name, room.gem_cost) for room in engine.pick_rooms),
+        dict(engine.room_stock),
+        (frozenset(engine.searched_rooms), frozenset(engine.dug_rooms)),
+        (engine.message, engine.shop_message),
+    )
+
+
+def _diff(before: tuple, after: tuple, cols: int) -> Delta:
+    delta = Delta()
+    cells0, doors0, res0, items0, scalars0, picks0, stock0, marks0, messages0 = before
+    cells1, doors1, res1, items1, scalars1, picks1, stock1, marks1, messages1 = after
+
+    if cells0 != cells1:
+        delta.cells = tuple((*divmod(i, cols), cell) for i, (old, cell) in enumerate(zip(cells0, cells1))
+                            if old != cell)
+    if doors0 != doors1:
+        changed = [(key, value) for key, value in doors1.items() if doors0.get(key) != value]
+        changed += [(key, None) for key in doors0 if key not in doors1]
+        delta.doors = tuple(changed)
+    if res0 != res1:
+        delta.res = tuple(b - a for a, b in zip(res0, res1))
+    if items0 != items1:
+        delta.items = items1
+    if scalars0 != scalars1:
+        delta.scalars = scalars1
+    if picks0 != picks1:
+        delta.picks = picks1
+    if stock0 != stock1:
+        delta.stock = tuple((name, count) for name, count in stock1.items() if stock0[name] != count)
+    if marks0 != marks1:
+        delta.marks = marks1
+    if messages0 != messages1:
+        delta.messages = messages1
+    return delta
+
+
+def _apply(engine: GameEngine, delta: Delta) -> None:
+    """Applique un Delta à la partie affichée."""
+    manor, player = engine.manor, engine.player
+    inv = player.inventory
+
+    for r, c, cell in delta.cells:
+        room = None
+        if cell is not None:
+            name, gem_cost, visited = cell
+            room = clone_room(_TEMPLATES[name])
+            room.gem_cost, room.visited = gem_cost, visited
+        manor.set_room(r, c, room)
+
+    for key, value in delta.doors:
+        r, c, dir_ = key
+        dr, dc = DIR_VECTORS[dir_]
+        key2 = (r + dr, c + dc, "N" if dir_ == "S" else "W")
+        door = manor.get_door((r, c), dir_)
+        if value is None:
+            manor.drop_door(key, key2)
+        elif door is not None and door.lock_level == value[0]:
+            manor.set_door_open((r, c), dir_, value[1])
+        else:
+            if door is not None:
+                manor.drop_door(key, key2)
+            door = Door(value[0])
+            door.is_open = value[1]
+            manor.put_door(key, key2, door)
+
+    if delta.res is not None:
+        d_steps, d_gold, d_gems, d_keys, d_dice = delta.res
+        inv.steps += d_steps
+        inv.gold += d_gold
+        inv.gems += d_gems
+        inv.keys += d_keys
+        inv.dice += d_dice
+    if delta.items is not None:
+        codes, perms = delta.items
+        inv.set_items([snapshot.new_item(code) for code in codes], perms)
+    if delta.scalars is not None:
+        (player.r, player.c, engine.state, engine.win, engine.pick_idx,
+         engine._pending_dir, engine._pending_dest) = delta.scalars
+    if delta.picks is not None:
+        rooms = []
+        for name, gem_cost in delta.picks:
+            room = clone_room(_TEMPLATES[name])
+            room.gem_cost = gem_cost
+            rooms.append(room)
+        engine.pick_rooms = rooms
+    for name, count in delta.stock:
+        engine.room_stock[name] = count
+    if delta.marks is not None:
+        engine.searched_rooms, engine.dug_rooms = set(delta.marks[0]), set(delta.marks[1])
+    if delta.messages is not None:
+        engine.message, engine.shop_message = delta.messages
+
+
+class ReplayIndex:
+    """Journal rejoué une fois, puis accessible à n'importe quelle action (seek)."""
+
+    def __init__(self, log: ActionLog, interval: int = KEYFRAME_INTERVAL):
+        self.log = log
+        self.interval = interval
+        self._positions: list[int] = []     # actions des images clés (croissantes)
+        self._keyframes: list[tuple] = []   # (snapshot, offset dans le journal, messages)
+        self._deltas: list[Delta | None] = [None]
+
+        engine = start(log)
+        cols = engine.manor.cols
+        self._add_keyframe(engine, 0, 0)
+        before = _view(engine)
+        data = log.entries
+        i, n = 0, len(data)
+        while i < n:
+            i = step(engine, data, i)
+            after = _view(engine)
+            self._deltas.append(_diff(before, after, cols))
+            before = after
+            if (len(self._deltas) - 1) % interval == 0:
+                self._add_keyframe(engine, len(self._deltas) - 1, i)
+
+        self.final_hash = engine.state_hash()
+        self._engine = snapshot.load(self._keyframes[0][0])
+        self._index = -1
+
+    def _add_keyframe(self, engine: GameEngine, index: int, offset: int) -> None:
+        self._positions.append(index)
+        self._keyframes.append((snapshot.save(engine), offset, (engine.message, engine.shop_message)))
+
+    def __len__(self) -> int:
+        """Nombre de positions : avant la première action, puis après chacune."""
+        return len(self._deltas)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def seek(self, index: int) -> GameEngine:
+        """
+        Partie affichée après `index` actions (0 : début). La même instance
+        est réutilisée d'un appel à l'autre : ne pas la faire jouer.
+        """
+        index = max(0, min(index, len(self._deltas) - 1))
+        k = bisect.bisect_right(self._positions, index) - 1
+        engine = self._engine
+        if not (self._positions[k] <= self._index <= index):
+            # Autre segment, ou retour en arrière : depuis l'image clé
+            data, _, messages = self._keyframes[k]
+            snapshot.restore(engine, data)
+            engine.message, engine.shop_message = messages
+            self._index = self._positions[k]
+        for delta in self._deltas[self._index + 1:index + 1]:
+            _apply(engine, delta)
+        self._index = index
+        return engine
+
+    def engine_at(self, index: int) -> GameEngine:
+        """
+        Partie exacte (générateur compris) après `index` actions, jouable.
+        Avec annulations (mode entraînement), la pile d'annulation n'est pas
+        dans les images clés : rejeu depuis le début.
+        """
+        index = max(0, min(index, len(self._deltas) - 1))
+        k = bisect.bisect_right(self._positions, index) - 1
+        if self.log.options & OPT_HISTORY:
+            k = 0
+        data, offset, messages = self._keyframes[k]
+        engine = snapshot.load(data) if k else start(self.log)
+        engine.message, engine.shop_message = messages
+        for _ in range(index - self._positions[k]):
+            offset = step(engine, self.log.entries, offset)
+        return engine
+
+
+# ---------- Visionneuse pygame ----------
+
+class ReplayViewer:
+    """Fenêtre : plateau + HUD de l'action courante, frise temporelle en bas."""
+
+    def __init__(self, index: ReplayIndex, title: str = ""):
+        pygame.init()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT + TIMELINE_HEIGHT))
+        pygame.display.set_caption(f"Blue Prince 2D — rejeu {title}")
+        self.clock = pygame.time.Clock()
+        self.index = index
+        self.current = 0
+        self.playing = False
+        self.dragging = False
+        self._play_t = 0.0
+
+    def _timeline_rect(self) -> pygame.Rect:
+        return pygame.Rect(0, HEIGHT, WIDTH, TIMELINE_HEIGHT)
+
+    def _scrub(self, x: int) -> None:
+        rect = self._timeline_rect()
+        t = min(max((x - rect.left) / max(1, rect.width - 1), 0.0), 1.0)
+        self.current = round(t * (len(self.index) - 1))
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.KEYDOWN:
+            last = len(self.index) - 1
+            moves = {
+                pygame.K_LEFT: -1, pygame.K_RIGHT: 1,
+                pygame.K_DOWN: -100, pygame.K_UP: 100,
+            }
+            if event.key in moves:
+                self.current = min(max(self.current + moves[event.key], 0), last)
+            elif event.key == pygame.K_HOME:
+                self.current = 0
+            elif event.key == pygame.K_END:
+                self.current = last
+            elif event.key == pygame.K_SPACE:
+                self.playing = not self.playing
+                self._play_t = time.perf_counter()
+            elif event.key == KEY_CANCEL:
+                return False
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 \
+                and self._timeline_rect().collidepoint(event.pos):
+            self.dragging = True
+            self._scrub(event.pos[0])
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            self._scrub(event.pos[0])
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.dragging = False
+        return True
+
+    def update_playback(self) -> None:
+        if not self.playing:
+            return
+        now = time.perf_counter()
+        advance = int((now - self._play_t) * PLAYBACK_ACTIONS_PER_S)
+        if advance:
+            self._play_t += advance / PLAYBACK_ACTIONS_PER_S
+            self.current = min(self.current + advance, len(self.index) - 1)
+            if self.current == len(self.index) - 1:
+                self.playing = False
+
+    def draw(self) -> None:
+        engine = self.index.seek(self.current)
+        self.screen.fill(BG)
+        draw_grid(self.screen, engine.manor)
+        draw_player(self.screen, (engine.player.r, engine.player.c))
+        room = engine.manor.get_room(engine.player.r, engine.player.c)
+        draw_hud(self.screen, engine.player, engine.message, None, room)
+        if engine.state == "PICK":
+            draw_pick_screen_pulse(self.screen, engine.pick_rooms, engine.pick_idx, 0.0)
+        elif engine.state == "SHOP":
+            draw_shop_window(self.screen, engine.player.inventory, engine.shop_message)
+
+        label = f"action {self.current} / {len(self.index) - 1}"
+        if engine.state == "END":
+            label += " — victoire" if engine.win else " — défaite"
+        draw_timeline(self.screen, self._timeline_rect(), self.current, len(self.index) - 1, label)
+        pygame.display.flip()
+
+    def run(self) -> None:
+        running = True
+        while running:
+            for event in pygame.event.get():
+                running = running and self.handle_event(event)
+            self.update_playback()
+            self.draw()
+            self.clock.tick(FPS)
+        pygame.quit()
+
+
+# ---------- Vérification : python replay_viewer.py --check ----------
+
+def long_log(actions: int, seed: int = 0) -> ActionLog:
+    """
+    Journal de bot d'au moins `actions` entrées : coups au hasard, avec
+    annulation dès que la partie se termine (la partie ne finit jamais).
+    """
+    from bots import RandomPolicy
+
+    engine = GameEngine.new_game(seed)
+    engine.enable_history()
+    engine.enable_action_log(seed)
+    policy = RandomPolicy(seed)
+    while engine.action_log.count < actions:
+        if engine.state == "END":
+            engine.undo()
+        else:
+            engine.apply_action(policy.choose(engine))
+    engine.action_log.finish(engine)
+    return engine.action_log
+
+
+def check(actions: int, samples: int, seed: int) -> int:
+    import random
+
+    log = long_log(actions, seed)
+    t0 = time.perf_counter()
+    index = ReplayIndex(log)
+    build_s = time.perf_counter() - t0
+
+    # États de référence : rejeu direct
+    engine = start(log)
+    expected = [_view(engine)]
+    i = 0
+    while i < len(log.entries):
+        i = step(engine, log.entries, i)
+        expected.append(_view(engine))
+
+    failures = 0
+    rng = random.Random(seed)
+    targets = [rng.randrange(len(index)) for _ in range(samples)] + [0, len(index) - 1]
+    worst = total = 0.0
+    for target in targets:
+        t0 = time.perf_counter()
+        view = _view(index.seek(target))
+        elapsed = time.perf_counter() - t0
+        worst, total = max(worst, elapsed), total + elapsed
+        if view != expected[target]:
+            print(f"seek({target}) : état différent du rejeu direct")
+            failures += 1
+
+    exact = index.engine_at(len(index) - 1)
+    if exact.state_hash() != log.checksum:
+        print("engine_at(fin) : hash différent du journal")
+        failures += 1
+
+    print(f"{log.count} actions, index construit en {build_s:.2f} s "
+          f"({len(index._keyframes)} images clés) ; seek moyen "
+          f"{total / len(targets) * 1e3:.2f} ms, pire {worst * 1e3:.2f} ms ; {failures} erreurs")
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Visionneuse de journaux d'actions (.bpl).")
+    parser.add_argument("path", nargs="?", help="journal à visionner")
+    parser.add_argument("--check", action="store_true", help="vérifie l'accès direct (sans fenêtre)")
+    parser.add_argument("--actions", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.check:
+        return check(args.actions, args.samples, args.seed)
+    if args.path is None:
+        parser.error("journal .bpl attendu (ou --check)")
+
+    with open(args.path, "rb") as f:
+        log = ActionLog.decode(f.read())
+    ReplayViewer(ReplayIndex(log), args.path).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
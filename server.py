@@ -0,0 +1,434 @@
+# server.py
+import asyncio
+import base64
+import json
+import os
+import random
+import signal
+import sys
+import time
+from collections import deque
+
+from engine import GameEngine, NUM_ACTIONS
+from metrics import SERVER_REQUESTS, SERVER_BUSY, SERVER_SESSIONS, SERVER_ACTION_LATENCY
+from session_store import SessionStore, SESSION_MEMORY_ESTIMATE
+from state_updates import ChangeTracker
+
+"""
+Serveur de parties : les règles sans affichage (GameEngine) pour de
+nombreuses sessions simultanées, dans un seul processus asyncio.
+
+Protocole : une requête JSON par ligne, une réponse JSON par ligne, sur TCP
+ou socket Unix. Une connexion peut porter plusieurs sessions (une partie =
+un GameEngine). "id", s'il est présent, est recopié dans la réponse.
+
+    {"op": "new", "seed": 42}                   -> {"session": 1, "seed": 42, <vue>}
+    {"op": "act", "session": 1, "action": 0}    -> <vue>      (engine.apply_action)
+    {"op": "travel", "session": 1, "r": 2, "c": 4} -> <vue>   (engine.travel_to)
+    {"op": "view", "session": 1}                -> <vue>
+    {"op": "close", "session": 1}               -> {"closed": 1}
+    {"op": "stats"}                             -> sessions (en mémoire / sur disque), requêtes, mémoire
+
+    <vue> = state, r, c, steps, gems, keys, gold, dice, win, message, legal
+    erreur : {"error": "..."} (session inconnue, action invalide, "busy"...)
+
+Mises à jour incrémentales (state_updates.py) : une session ouverte avec
+{"op": "new", "updates": "delta"} répond aux actions par {"seq": n, "d": trame}
+(base64, absente si rien n'a changé) au lieu de la vue complète, et commence
+par {"seq": 0, "snapshot": ...}. N'importe quelle connexion peut la suivre :
+
+    {"op": "watch", "session": 1}      -> {"seq", "snapshot"}, puis {"session": 1, "d": ...}
+                                          à chaque changement ({"session": 1, "closed": 1} à la fin)
+    {"op": "unwatch", "session": 1}    -> {"unwatched": 1}
+    {"op": "resync", "session": 1}     -> {"seq", "snapshot"} (trou dans les seq)
+
+Contre-pression :
+- chaque session a une file bornée (SESSION_QUEUE_SIZE requêtes en attente) ;
+  au-delà, la requête est refusée tout de suite avec "busy" : une session
+  trop bavarde ne ralentit pas les autres ;
+- les sessions qui ont du travail sont servies à tour de rôle (une requête
+  chacune), par un seul worker ;
+- une connexion qui ne lit pas ses réponses cesse d'être lue (drain).
+
+Les parties sont gardées par un SessionStore (session_store.py) : avec
+--memory-mb ou --idle-s, les sessions inactives partent sur disque et sont
+rechargées à leur requête suivante.
+
+    python server.py --port 7878
+    python server.py --memory-mb 64 --idle-s 60
+    python server.py --unix /tmp/blueprince.sock
+    python server_bench.py --sessions 10000     # charge (lance son propre serveur)
+"""
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7878
+SESSION_QUEUE_SIZE = 8
+MAX_SESSIONS = 50_000
+MAX_LINE_BYTES = 4096
+# Requêtes traitées avant de rendre la main à la boucle (lectures, écritures)
+WORKER_BATCH = 64
+# Période de recherche des sessions inactives (si --idle-s)
+IDLE_SWEEP_S = 1.0
+
+
+def view(engine: GameEngine) -> dict:
+    """Ce qu'un client a besoin de voir après chaque requête."""
+    player = engine.player
+    return {
+        "state": engine.state,
+        "r": player.r,
+        "c": player.c,
+        "steps": player.steps,
+        "gems": player.gems,
+        "keys": player.keys,
+        "gold": player.gold,
+        "dice": player.dice,
+        "win": engine.win,
+        "message": engine.shop_message if engine.state == "SHOP" else engine.message,
+        "legal": engine.legal_actions(),
+    }
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def process_rss() -> int:
+    """Mémoire résidente du processus (octets), 0 si inconnue."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class Session:
+    """Une partie hébergée (sa partie est dans GameServer.store) et ses requêtes en attente."""
+
+    __slots__ = ("id", "seed", "connection", "inbox", "scheduled", "closed", "tracker", "watchers")
+
+    def __init__(self, id_: int, seed: int, connection: "Connection",
+                 tracker: ChangeTracker | None = None):
+        self.id = id_
+        self.seed = seed
+        self.connection = connection
+        self.inbox: deque = deque()     # (connection, requête)
+        self.scheduled = False
+        self.closed = False
+        self.tracker = tracker          # mode "delta"
+        self.watchers: set[Connection] = set()
+
+
+class Connection:
+    """Un client : son flux d'écriture, les sessions qu'il a ouvertes et celles qu'il suit."""
+
+    __slots__ = ("writer", "sessions", "watching")
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.sessions: set[int] = set()
+        self.watching: set[int] = set()
+
+    def send(self, message: dict) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+
+class GameServer:
+    """Sessions, file des sessions prêtes et worker (voir le protocole plus haut)."""
+
+    def __init__(self, queue_size: int = SESSION_QUEUE_SIZE, max_sessions: int = MAX_SESSIONS,
+                 store: SessionStore | None = None):
+        self.queue_size = queue_size
+        self.max_sessions = max_sessions
+        self.store = store if store is not None else SessionStore()
+        self.sessions: dict[int, Session] = {}
+        self.requests = 0
+        self._next_id = 1
+        self._ready: deque[Session] = deque()
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._sweeper: asyncio.Task | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    # ---------- Démarrage ----------
+
+    async def start(self, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                    unix_path: str | None = None) -> str:
+        """Écoute sur TCP (ou socket Unix) ; retourne l'adresse effective."""
+        self._worker = asyncio.create_task(self._work())
+        if self.store.max_idle_s is not None:
+            self._sweeper = asyncio.create_task(self._sweep())
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._client, unix_path, limit=MAX_LINE_BYTES)
+            return f"unix:{unix_path}"
+        self._server = await asyncio.start_server(self._client, host, port, limit=MAX_LINE_BYTES)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"tcp:{host}:{port}"
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in (self._worker, self._sweeper):
+            if task is not None:
+                task.cancel()
+        self.store.close()
+
+    # ---------- Lecture des requêtes ----------
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    connection.send({"error": f"ligne trop longue (> {MAX_LINE_BYTES} octets)"})
+                    break
+                if not line:
+                    break
+                self.dispatch(connection, line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in list(connection.sessions):
+                self.drop(session_id)
+            for session_id in connection.watching:
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    session.watchers.discard(connection)
+            writer.close()
+
+    def dispatch(self, connection: Connection, line: bytes) -> None:
+        """Traite tout de suite new / stats ; met les requêtes de session en file."""
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            op = request["op"]
+        except (ValueError, TypeError, KeyError):
+            connection.send({"error": "requête illisible"})
+            return
+        SERVER_REQUESTS.inc(op)
+        request_id = request.get("id")
+
+        if op == "new":
+            connection.send(self.new_session(connection, request, request_id))
+            return
+        if op == "stats":
+            connection.send(self.stats(request_id))
+            return
+
+        session_id = request.get("session")
+        session = self.sessions.get(session_id) if isinstance(session_id, int) else None
+        # Seul le propriétaire joue ; tout le monde peut suivre une session
+        if session is None or (session.connection is not connection and op not in _WATCH_OPS):
+            connection.send({"id": request_id, "error": "session inconnue"})
+            return
+        if len(session.inbox) >= self.queue_size:
+            SERVER_BUSY.inc()
+            connection.send({"id": request_id, "session": session.id, "error": "busy"})
+            return
+        session.inbox.append((connection, request))
+        if not session.scheduled:
+            session.scheduled = True
+            self._ready.append(session)
+            self._wakeup.set()
+
+    def new_session(self, connection: Connection, request: dict, request_id=None) -> dict:
+        if len(self.sessions) >= self.max_sessions:
+            return {"id": request_id, "error": "trop de sessions"}
+        seed = request.get("seed")
+        if not isinstance(seed, int):
+            seed = random.randrange(1 << 32)
+        updates = request.get("updates", "view")
+        if updates not in ("view", "delta"):
+            return {"id": request_id, "error": f"mode de mises à jour inconnu : {updates!r}"}
+        tracker = ChangeTracker() if updates == "delta" else None
+        session = Session(self._next_id, seed, connection, tracker)
+        self._next_id += 1
+        engine = GameEngine.new_game(seed)
+        self.sessions[session.id] = session
+        self.store.put(session.id, engine)
+        connection.sessions.add(session.id)
+        SERVER_SESSIONS.set(len(self.sessions))
+        if tracker is not None:
+            return {"id": request_id, "session": session.id, "seed": seed, **_resync(tracker, engine)}
+        return {"id": request_id, "session": session.id, "seed": seed, **view(engine)}
+
+    def drop(self, session_id: int) -> None:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        session.closed = True
+        session.inbox.clear()
+        session.connection.sessions.discard(session_id)
+        for watcher in session.watchers:
+            watcher.watching.discard(session_id)
+            watcher.send({"session": session_id, "closed": session_id})
+        session.watchers.clear()
+        self.store.discard(session_id)
+        SERVER_SESSIONS.set(len(self.sessions))
+
+    def stats(self, request_id=None) -> dict:
+        return {
+            "id": request_id,
+            "sessions": len(self.sessions),
+            "requests": self.requests,
+            "busy": SERVER_BUSY.get(),
+            "rss": process_rss(),
+            **self.store.stats(),
+        }
+
+    # ---------- Worker : sessions servies à tour de rôle ----------
+
+    async def _work(self) -> None:
+        ready = self._ready
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            done = 0
+            while ready:
+                session = ready.popleft()
+                if session.closed or not session.inbox:
+                    session.scheduled = False
+                    continue
+                self.handle(session, *session.inbox.popleft())
+                if session.inbox:
+                    ready.append(session)
+                else:
+                    session.scheduled = False
+                done += 1
+                if done % WORKER_BATCH == 0:
+                    await asyncio.sleep(0)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(IDLE_SWEEP_S)
+            # Par lots : les requêtes en cours passent entre deux lots
+            while self.store.evict_idle(max_count=WORKER_BATCH) == WORKER_BATCH:
+                await asyncio.sleep(0)
+
+    def handle(self, session: Session, connection: Connection, request: dict) -> None:
+        t0 = time.perf_counter()
+        request_id = request.get("id")
+        try:
+            engine = self.store.get(session.id)
+        except (OSError, ValueError):
+            # Snapshot d'une session évincée illisible : la session est perdue
+            self.drop(session.id)
+            connection.send({"id": request_id, "session": session.id, "error": "session perdue"})
+            return
+
+        tracker = session.tracker
+        if tracker is not None:
+            tracker.begin(engine)
+        try:
+            reply = self.apply(session, engine, connection, request)
+        except (TypeError, ValueError) as e:
+            reply = {"error": str(e)}
+        frame = tracker.commit(engine) if tracker is not None else None
+
+        if frame is not None:
+            data = base64.b64encode(frame).decode("ascii")
+            for watcher in session.watchers:
+                watcher.send({"session": session.id, "d": data})
+        if reply is None:
+            # État après l'action : vue complète, ou trame (mode delta)
+            if tracker is None:
+                reply = view(engine)
+            else:
+                reply = {"seq": tracker.seq, "d": data} if frame is not None else {"seq": tracker.seq}
+        reply["id"] = request_id
+        connection.send(reply)
+        SERVER_ACTION_LATENCY.observe(time.perf_counter() - t0)
+
+    def apply(self, session: Session, engine: GameEngine, connection: Connection,
+              request: dict) -> dict | None:
+        """Exécute une requête de session ; None : répondre par l'état après l'action."""
+        op = request["op"]
+        if op == "act":
+            action = request.get("action")
+            if not isinstance(action, int) or not 0 <= action < NUM_ACTIONS:
+                raise ValueError(f"action invalide : {action!r}")
+            engine.apply_action(action)
+        elif op == "travel":
+            r, c = request.get("r"), request.get("c")
+            if not isinstance(r, int) or not isinstance(c, int):
+                raise ValueError("travel : r et c entiers attendus")
+            engine.travel_to(r, c)
+        elif op == "close":
+            self.drop(session.id)
+            return {"closed": session.id}
+        elif op == "view":
+            return view(engine)
+        elif op in _WATCH_OPS:
+            if session.tracker is None:
+                raise ValueError("session sans mises à jour incrémentales (new avec updates=delta)")
+            if op == "unwatch":
+                session.watchers.discard(connection)
+                connection.watching.discard(session.id)
+                return {"unwatched": session.id}
+            if op == "watch" and connection is not session.connection:
+                session.watchers.add(connection)
+                connection.watching.add(session.id)
+            return {"session": session.id, **_resync(session.tracker, engine)}
+        else:
+            raise ValueError(f"opération inconnue : {op!r}")
+        return None
+
+
+_WATCH_OPS = ("watch", "unwatch", "resync")
+
+
+def _resync(tracker: ChangeTracker, engine: GameEngine) -> dict:
+    return {"seq": tracker.seq, "snapshot": base64.b64encode(tracker.resync(engine)).decode("ascii")}
+
+
+async def serve(host: str, port: int, unix_path: str | None,
+                queue_size: int = SESSION_QUEUE_SIZE, store: SessionStore | None = None) -> None:
+    server = GameServer(queue_size, store=store)
+    address = await server.start(host, port, unix_path)
+    # Première ligne lue par server_bench.py pour trouver l'adresse
+    print(f"Serveur prêt : {address}", flush=True)
+    stop = asyncio.Event()
+    try:
+        # Arrêt propre sur SIGTERM (server_bench.py) : sessions évincées supprimées
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveur de parties (JSON par ligne).")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="0 : port libre")
+    parser.add_argument("--unix", default=None, help="socket Unix au lieu de TCP")
+    parser.add_argument("--queue-size", type=int, default=SESSION_QUEUE_SIZE,
+                        help="requêtes en attente par session avant 'busy'")
+    parser.add_argument("--memory-mb", type=float, default=None,
+                        help="plafond des parties en mémoire (au-delà : éviction LRU sur disque)")
+    parser.add_argument("--idle-s", type=float, default=None, help="éviction après N s sans requête")
+    parser.add_argument("--spill-dir", default=None, help="dossier des sessions évincées (temporaire sinon)")
+    args = parser.parse_args(argv)
+
+    max_hot = None
+    if args.memory_mb is not None:
+        max_hot = max(1, int(args.memory_mb * 2**20 // SESSION_MEMORY_ESTIMATE))
+    store = SessionStore(args.spill_dir, max_hot, args.idle_s)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.queue_size, store))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+# server_bench.py
+import asyncio
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from server import SESSION_QUEUE_SIZE, encode
+from state_updates import RemoteGame
+
+"""
+Générateur de charge pour server.py.
+
+Lance un serveur dans un sous-processus (ou se connecte à --connect), ouvre
+--sessions parties simultanées réparties sur --connections connexions, puis
+les fait jouer au hasard pendant --duration secondes (une requête en vol par
+session ; une partie terminée est fermée et remplacée). Mesures :
+- sessions ouvertes par seconde (montée en charge, puis parties rejouées) ;
+- latence d'une action vue du client : p50, p99, max ;
+- mémoire du serveur par session (RSS, avant / après les parties) ;
+- octets reçus par action : vue complète, ou trames (--updates delta, le
+  client tient alors une copie de chaque partie avec state_updates.RemoteGame).
+
+Avant la charge, une session envoie d'un coup 4 × SESSION_QUEUE_SIZE actions :
+le serveur doit en refuser une partie ("busy") et répondre à toutes.
+
+    python server_bench.py --sessions 10000 --duration 10
+    python server_bench.py --sessions 10000 --updates delta
+    python server_bench.py --sessions 10000 --active 1000 --memory-mb 40 --idle-s 2   # éviction
+    python server_bench.py --connect tcp:127.0.0.1:7878 --sessions 1000
+
+Code de sortie 1 si une réponse est une erreur inattendue ou si la
+contre-pression n'a pas été observée.
+"""
+
+READY_PREFIX = "Serveur prêt : "
+
+
+class Client:
+    """Une connexion : requêtes numérotées, réponses rendues par id."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: dict[int, asyncio.Future] = {}
+        self.received = 0       # octets reçus
+        self.on_push = None     # messages sans id (sessions suivies avec watch)
+        self._next_id = 0
+        self._task = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, address: str) -> "Client":
+        kind, _, rest = address.partition(":")
+        if kind == "unix":
+            reader, writer = await asyncio.open_unix_connection(rest)
+        else:
+            host, _, port = rest.rpartition(":")
+            reader, writer = await asyncio.open_connection(host, int(port))
+        return cls(reader, writer)
+
+    def send(self, message: dict) -> asyncio.Future:
+        self._next_id += 1
+        message["id"] = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self._next_id] = future
+        self.writer.write(encode(message))
+        return future
+
+    async def request(self, message: dict) -> dict:
+        future = self.send(message)
+        await self.writer.drain()
+        return await future
+
+    async def _read(self) -> None:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            self.received += len(line)
+            reply = json.loads(line)
+            if reply.get("id") is None and self.on_push is not None:
+                self.on_push(reply)
+                continue
+            future = self.pending.pop(reply.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("connexion fermée par le serveur"))
+
+    async def close(self) -> None:
+        self.writer.close()
+        self._task.cancel()
+
+
+class Bench:
+    """Compteurs partagés par les sessions simulées."""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.actions = 0
+        self.games = 0
+        self.errors = 0
+        self.samples: list[str] = []    # premières erreurs, affichées à la fin
+
+    def error(self, reply: dict) -> None:
+        self.errors += 1
+        if len(self.samples) < 10:
+            self.samples.append(json.dumps(reply, ensure_ascii=False))
+
+
+async def check_backpressure(client: Client, queue_size: int) -> tuple[int, int]:
+    """Rafale sur une seule session : (réponses 'busy', réponses reçues)."""
+    opened = await client.request({"op": "new", "seed": 0})
+    burst = [client.send({"op": "act", "session": opened["session"], "action": 8})
+             for _ in range(4 * queue_size)]
+    await client.writer.drain()
+    replies = await asyncio.gather(*burst)
+    await client.request({"op": "close", "session": opened["session"]})
+    return sum(reply.get("error") == "busy" for reply in replies), len(replies)
+
+
+class _Mirror:
+    """État d'une session en mode delta, vu comme une vue (state, legal)."""
+
+    def __init__(self, reply: dict):
+        self.remote = RemoteGame(base64.b64decode(reply["snapshot"]))
+
+    def get(self, key: str):
+        engine = self.remote.engine
+        return engine.state if key == "state" else engine.legal_actions()
+
+    def __getitem__(self, key: str):
+        return self.get(key)
+
+
+async def play(client: Client, state: dict, bench: Bench, rng: random.Random,
+               deadline: float, think_s: float, updates: str = "view") -> None:
+    """Une session simulée : actions au hasard, partie rejouée à chaque fin."""
+    session = state["session"]
+    if updates == "delta":
+        state = _Mirror(state)
+    if think_s:
+        await asyncio.sleep(rng.random() * think_s)    # départs étalés
+    while time.perf_counter() < deadline:
+        if state.get("state") == "END" or not state.get("legal"):
+            await client.request({"op": "close", "session": session})
+            bench.games += 1
+            state = await client.request({"op": "new", "seed": rng.getrandbits(32), "updates": updates})
+            session = state.get("session")
+            if session is None:
+                bench.error(state)
+                return
+            if updates == "delta":
+                state = _Mirror(state)
+        t0 = time.perf_counter()
+        reply = await client.request({"op": "act", "session": session,
+                                      "action": rng.choice(state["legal"])})
+        bench.latencies.append(time.perf_counter() - t0)
+        if "error" in reply:
+            bench.error(reply)
+            return
+        bench.actions += 1
+        if updates == "view":
+            state = reply
+        elif "d" in reply and not state.remote.apply(base64.b64decode(reply["d"])):
+            bench.error(reply)
+            return
+        if think_s:
+            await asyncio.sleep(think_s)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run(address: str, sessions: int, connections: int, duration: float,
+              think_s: float, queue_size: int, seed: int, active: int | None = None,
+              updates: str = "view") -> int:
+    clients = [await Client.connect(address) for _ in range(connections)]
+    bench = Bench()
+    rng = random.Random(seed)
+
+    busy, burst = await check_backpressure(clients[0], queue_size)
+    print(f"Contre-pression : {busy}/{burst} actions d'une rafale refusées (busy), "
+          f"{burst}/{burst} réponses")
+
+    before = await clients[0].request({"op": "stats"})
+
+    # Montée en charge : toutes les sessions ouvertes en même temps
+    t0 = time.perf_counter()
+    states = await asyncio.gather(*(
+        clients[i % connections].request({"op": "new", "seed": rng.getrandbits(32), "updates": updates})
+        for i in range(sessions)
+    ))
+    ramp = time.perf_counter() - t0
+    for state in states:
+        if "session" not in state:
+            bench.error(state)
+    opened = await clients[0].request({"op": "stats"})
+    print(f"{opened['sessions']} sessions ouvertes en {ramp:.2f} s ({sessions / ramp:,.0f} sessions/s)")
+
+    # Les sessions au-delà de --active restent ouvertes sans jouer (inactives)
+    playing = [state for state in states if "session" in state][:active]
+    received = sum(client.received for client in clients)
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    await asyncio.gather(*(
+        play(clients[i % connections], state, bench, random.Random(rng.getrandbits(64)),
+             deadline, think_s, updates)
+        for i, state in enumerate(playing)
+    ))
+    elapsed = time.perf_counter() - t0
+    received = sum(client.received for client in clients) - received
+    after = await clients[0].request({"op": "stats"})
+
+    latencies = sorted(bench.latencies)
+    print(f"{bench.actions} actions en {elapsed:.2f} s ({bench.actions / elapsed:,.0f} actions/s), "
+          f"{bench.games} parties finies rejouées ({bench.games / elapsed:,.0f} sessions/s)")
+    print(f"Latence d'une action (client, {len(playing)} sessions en vol) : "
+          f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000 if latencies else 0:.2f} ms")
+    print(f"Réponses ({updates}) : {received / max(1, bench.actions):.1f} octets reçus par action")
+    if before["rss"]:
+        print(f"Mémoire du serveur : {(opened['rss'] - before['rss']) / sessions / 1024:.1f} Kio par session "
+              f"à l'ouverture, {(after['rss'] - before['rss']) / max(1, after['sessions']) / 1024:.1f} Kio "
+              f"après les parties ({after['rss'] / 2**20:.0f} Mio au total)")
+    if after.get("evictions"):
+        print(f"Sessions : {after['hot']} en mémoire, {after['cold']} sur disque, "
+              f"{after['hit_rate']:.1%} des accès en mémoire, {after['evictions']} évictions")
+
+    for client in clients:
+        await client.close()
+    for message in bench.samples:
+        print(f"Erreur : {message}")
+    print(f"{bench.errors} erreurs")
+    return 1 if bench.errors or busy == 0 else 0
+
+
+def start_server(queue_size: int, directory: str, tcp: bool,
+                 extra: list[str] = ()) -> tuple[subprocess.Popen, str]:
+    """Serveur dans un sous-processus ; adresse lue sur sa sortie."""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+               "--queue-size", str(queue_size), *extra]
+    command += ["--port", "0"] if tcp else ["--unix", os.path.join(directory, "blueprince.sock")]
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, env=env)
+    for line in process.stdout:
+        if line.startswith(READY_PREFIX):
+            return process, line[len(READY_PREFIX):].strip()
+    process.wait()
+    raise RuntimeError("le serveur s'est arrêté avant d'écouter")
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Charge sur le serveur de parties.")
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--active", type=int, default=None, help="sessions qui jouent (les autres restent inactives)")
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes de jeu")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause entre deux actions d'une session")
+    parser.add_argument("--queue-size", type=int, default=SESSION_QUEUE_SIZE)
+    parser.add_argument("--updates", choices=("view", "delta"), default="view",
+                        help="réponses : vue complète ou trames incrémentales")
+    parser.add_argument("--connect", default=None, help="adresse d'un serveur déjà lancé (tcp:hôte:port, unix:chemin)")
+    parser.add_argument("--tcp", action="store_true", help="serveur lancé sur TCP plutôt qu'un socket Unix")
+    parser.add_argument("--memory-mb", type=float, default=None, help="plafond mémoire des parties du serveur")
+    parser.add_argument("--idle-s", type=float, default=None, help="éviction des sessions inactives du serveur")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    extra = []
+    if args.memory_mb is not None:
+        extra += ["--memory-mb", str(args.memory_mb)]
+    if args.idle_s is not None:
+        extra += ["--idle-s", str(args.idle_s)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        address = args.connect
+        if address is None:
+            process, address = start_server(args.queue_size, directory,
+                                            args.tcp or not hasattr(asyncio, "start_unix_server"), extra)
+        try:
+            return asyncio.run(run(address, args.sessions, args.connections, args.duration,
+                                   args.think_ms / 1000, args.queue_size, args.seed, args.active,
+                                   args.updates))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# session_store.py
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import snapshot
+from engine import GameEngine
+from metrics import (
+    SESSION_LOOKUPS, SESSION_EVICTIONS, SESSION_STORE_ERRORS, SESSIONS_HOT, SESSIONS_COLD,
+    SESSION_EVICT_LATENCY, SESSION_REHYDRATE_LATENCY,
+)
+
+"""
+Sessions du serveur : les parties actives en mémoire, les autres sur disque.
+
+SessionStore garde au plus max_hot parties (GameEngine) en mémoire, dans
+l'ordre de leur dernier usage (LRU). Au-delà, ou après max_idle_s secondes
+sans requête (evict_idle), la partie la moins récemment jouée est écrite en
+snapshot (snapshot.save : manoir, portes, inventaire, pioche, offres,
+générateur ; ~2,7 Kio) puis libérée. get() la recharge sans que le client
+s'en aperçoive (mêmes tirages, même suite de partie).
+
+Les fichiers ne sont qu'un débordement de la mémoire : pas de fsync, et ils
+sont supprimés au rechargement ou à la fermeture de la session.
+
+Métriques : consultations (hit en mémoire / miss sur disque), évictions
+(cap / idle), latences d'éviction et de rechargement.
+
+    python session_store.py --sessions 5000 --max-hot 500    # vérification
+"""
+
+# Mémoire résidente d'une session du serveur (mesurée par server_bench.py,
+# partie en cours) : convertit un plafond en Mio en nombre de sessions
+SESSION_MEMORY_ESTIMATE = 16 * 1024
+
+SESSION_SUFFIX = ".sav"
+
+
+class SessionStore:
+    """Parties par clé : LRU en mémoire, snapshots sur disque au-delà de max_hot."""
+
+    def __init__(self, directory: str | None = None, max_hot: int | None = None,
+                 max_idle_s: float | None = None):
+        self.max_hot = max_hot
+        self.max_idle_s = max_idle_s
+        self._directory = directory
+        self._temporary = directory is None
+        # clé -> (partie, instant du dernier usage), du moins au plus récent
+        self.hot: OrderedDict[int, tuple[GameEngine, float]] = OrderedDict()
+        # clé -> messages affichés (snapshot.load les remet à zéro)
+        self.cold: dict[int, tuple[str, str]] = {}
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.hot or key in self.cold
+
+    def __len__(self) -> int:
+        return len(self.hot) + len(self.cold)
+
+    @property
+    def directory(self) -> str:
+        """Dossier des snapshots (temporaire, créé à la première éviction, si non fourni)."""
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="blueprince-sessions-")
+        return self._directory
+
+    def path(self, key: int) -> str:
+        return os.path.join(self.directory, f"{key}{SESSION_SUFFIX}")
+
+    # ---------- Accès ----------
+
+    def put(self, key: int, engine: GameEngine) -> None:
+        """Nouvelle partie (ou remplacement), la plus récemment utilisée."""
+        self.discard(key)
+        self.hot[key] = (engine, time.monotonic())
+        self._enforce_cap()
+        self._update_gauges()
+
+    def get(self, key: int) -> GameEngine:
+        """
+        Partie de clé key, rechargée depuis le disque si elle a été évincée.
+        KeyError si la clé est inconnue ; OSError / ValueError si le snapshot
+        est illisible (la session est alors perdue et retirée).
+        """
+        entry = self.hot.get(key)
+        if entry is not None:
+            SESSION_LOOKUPS.inc("hit")
+            self.hot[key] = (entry[0], time.monotonic())
+            self.hot.move_to_end(key)
+            return entry[0]
+
+        messages = self.cold.pop(key)
+        SESSION_LOOKUPS.inc("miss")
+        t0 = time.perf_counter()
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                engine = snapshot.load(f.read())
+        except (OSError, ValueError):
+            SESSION_STORE_ERRORS.inc("rehydrate")
+            self._remove(path)
+            self._update_gauges()
+            raise
+        self._remove(path)
+        engine.message, engine.shop_message = messages
+        self.hot[key] = (engine, time.monotonic())
+        SESSION_REHYDRATE_LATENCY.observe(time.perf_counter() - t0)
+        self._enforce_cap(keep=key)
+        self._update_gauges()
+        return engine
+
+    def discard(self, key: int) -> None:
+        """Oublie la partie (fin de session), en mémoire comme sur disque."""
+        if self.hot.pop(key, None) is None and self.cold.pop(key, None) is not None:
+            self._remove(self.path(key))
+        self._update_gauges()
+
+    # ---------- Éviction ----------
+
+    def evict(self, key: int, reason: str = "cap") -> bool:
+        """Écrit la partie sur disque et la libère ; False si l'écriture échoue."""
+        engine, _ = self.hot[key]
+        t0 = time.perf_counter()
+        try:
+            with open(self.path(key), "wb") as f:
+                f.write(snapshot.save(engine))
+        except OSError:
+            SESSION_STORE_ERRORS.inc("evict")
+            return False
+        del self.hot[key]
+        self.cold[key] = (engine.message, engine.shop_message)
+        SESSION_EVICTIONS.inc(reason)
+        SESSION_EVICT_LATENCY.observe(time.perf_counter() - t0)
+        return True
+
+    def evict_idle(self, now: float | None = None, max_count: int | None = None) -> int:
+        """
+        Évince les parties inactives depuis max_idle_s (au plus max_count, pour
+        rendre la main entre deux lots) ; retourne leur nombre.
+        """
+        if self.max_idle_s is None:
+            return 0
+        limit = (time.monotonic() if now is None else now) - self.max_idle_s
+        evicted = 0
+        # Ordre LRU : on s'arrête à la première partie encore active
+        while self.hot and evicted != max_count:
+            key, (_, used) = next(iter(self.hot.items()))
+            if used > limit or not self.evict(key, "idle"):
+                break
+            evicted += 1
+        self._update_gauges()
+        return evicted
+
+    def _enforce_cap(self, keep: int | None = None) -> None:
+        if self.max_hot is None:
+            return
+        while len(self.hot) > self.max_hot:
+            key = next(iter(self.hot))
+            if key == keep or not self.evict(key):
+                break
+
+    def close(self) -> None:
+        """Supprime les snapshots restants (et le dossier s'il est temporaire)."""
+        for key in list(self.cold):
+            self.discard(key)
+        if self._temporary and self._directory is not None:
+            try:
+                os.rmdir(self._directory)
+            except OSError:
+                pass
+            self._directory = None
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _update_gauges(self) -> None:
+        SESSIONS_HOT.set(len(self.hot))
+        SESSIONS_COLD.set(len(self.cold))
+
+    def stats(self) -> dict:
+        hits, misses = SESSION_LOOKUPS.get("hit"), SESSION_LOOKUPS.get("miss")
+        return {
+            "hot": len(self.hot),
+            "cold": len(self.cold),
+            "hit_rate": hits / (hits + misses) if hits + misses else 1.0,
+            "evictions": SESSION_EVICTIONS.get("cap") + SESSION_EVICTIONS.get("idle"),
+        }
+
+
+# ---------- Vérification : python session_store.py ----------
+
+def main(argv=None) -> int:
+    import argparse
+    import random
+    from bots import RandomPolicy
+    from fork_bench import state_digest
+
+    parser = argparse.ArgumentParser(description="Éviction / rechargement des sessions vérifiés.")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--max-hot", type=int, default=500)
+    parser.add_argument("--actions", type=int, default=50_000, help="actions jouées sur des sessions au hasard")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(directory, args.max_hot)
+        # Témoins jamais évincés : même graine, mêmes actions
+        reference = {}
+        policies = {}
+        for key in range(args.sessions):
+            store.put(key, GameEngine.new_game(key))
+            reference[key] = GameEngine.new_game(key)
+            policies[key] = RandomPolicy(key)
+
+        # Accès biaisés : quelques sessions très actives, les autres rarement
+        keys = list(range(args.sessions))
+        weights = [1 / (k + 1) for k in keys]
+        diverged = set()
+        for key in rng.choices(keys, weights, k=args.actions):
+            engine = store.get(key)
+            twin = reference[key]
+            if twin.state == "END" or key in diverged:
+                continue
+            action = policies[key].choose(twin)
+            twin.apply_action(action)
+            engine.apply_action(action)
+            if engine.state_hash() != twin.state_hash():
+                print(f"session {key} : état différent après rechargement")
+                failures += 1
+                diverged.add(key)
+
+        # Inactives depuis 0 s : toutes évincées, puis rechargées pour comparer
+        store.max_idle_s = 0.0
+        idle = store.evict_idle()
+        if store.hot:
+            print(f"{len(store.hot)} sessions inactives non évincées")
+            failures += 1
+        for key in keys:
+            if key not in diverged and state_digest(store.get(key)) != state_digest(reference[key]):
+                print(f"session {key} : état final différent")
+                failures += 1
+        store.close()
+        leftover = [name for name in os.listdir(directory) if name.endswith(SESSION_SUFFIX)]
+
+    stats = store.stats()
+    print(f"{args.sessions} sessions, {args.max_hot} en mémoire au plus, {args.actions} actions : "
+          f"{stats['hit_rate']:.1%} en mémoire, {stats['evictions']} évictions (dont {idle} inactives) ; "
+          f"éviction {SESSION_EVICT_LATENCY.sum / max(1, SESSION_EVICT_LATENCY.count) * 1e6:.0f} µs, "
+          f"rechargement {SESSION_REHYDRATE_LATENCY.sum / max(1, SESSION_REHYDRATE_LATENCY.count) * 1e6:.0f} µs "
+          f"(p99 ≤ {SESSION_REHYDRATE_LATENCY.quantile(0.99) * 1e3:.2f} ms) ; {failures} erreurs")
+    if leftover:
+        print(f"{len(leftover)} snapshots non supprimés")
+    return 1 if failures or leftover else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
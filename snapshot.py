@@ -0,0 +1,434 @@
+# snapshot.py
+import random
+import struct
+import sys
+import time
+
+from door import Door, DoorLockLevel
+from engine import GameEngine, OFFER_CACHE_SIZE
+from history import SEARCHED, DUG
+from items import (
+    Key, Die, Gem, Food,
+    Shovel, Hammer, LockpickKit, MetalDetector, RabbitFoot,
+)
+from manoir import Manor, DIR_VECTORS
+from offers import OfferCache
+from player import Player
+from random_manager import RandomManager, LazyRandom
+from room import Room, RoomType
+from room_data import ALL_ROOMS, clone_room
+from zobrist import zkey, stock_key, K_MARK
+
+"""
+Sauvegarde / chargement d'une partie dans un format binaire fixe (snapshot).
+
+Tout est en petit-boutiste, à position connue (struct) :
+
+    en-tête    b"BPS1", lignes, colonnes, joueur (r, c), phase, victoire,
+               curseur du choix, direction et case en attente, ressources
+               (5 × int16), objets permanents (masque), nombres de portes,
+               d'objets, de cartes proposées et d'offres
+    grille     2 octets par case : modèle (0 = vide, sinon indice + 1 dans
+               TEMPLATES) et (coût en gemmes << 1 | visitée)
+    pioche     1 octet par modèle de ALL_ROOMS (stock restant)
+    fouillées / creusées   masque de bits des cases
+    portes     2 octets : case, (sens S/E | niveau << 1 | ouverte << 3),
+               chaque porte une seule fois (côté S ou E)
+    objets     1 octet par consommable (indice dans CONSUMABLES)
+    cartes     2 octets par carte proposée (modèle, coût)
+    offres     case, nombre de cartes, puis 2 octets par carte (ordre LRU)
+    hasard     type (aucun / graine d'un LazyRandom jamais tiré / état complet
+               du Mersenne Twister, 625 × uint32 + gauss)
+
+Une partie tient en 150 à 300 octets, plus 2,5 Kio pour l'état complet du
+générateur (incompressible) quand il a déjà servi ; save(engine, rng=False)
+l'omet (branches d'exploration qui tirent leur propre hasard, comme fork).
+
+    python snapshot.py --games 200    # aller-retour vérifié, tailles et temps
+"""
+
+MAGIC = b"BPS1"
+
+# Modèles des salles (indice + 1 dans la grille)
+TEMPLATES: list[Room] = [Room.from_type(RoomType.ENTRANCE), Room.from_type(RoomType.ANTECHAMBER)] + ALL_ROOMS
+_TEMPLATE_IDS = {tpl.name: i + 1 for i, tpl in enumerate(TEMPLATES)}
+
+# Consommables connus du moteur : (classe, nom, pas rendus)
+CONSUMABLES = (
+    (Key, "Clé", 0), (Die, "Dé", 0), (Gem, "Gemme", 0),
+    (Food, "Apple", 2), (Food, "Banana", 3), (Food, "Cake", 10),
+    (Food, "Ration de voyage", 4), (Food, "Fruits frais", 5), (Food, "Collation", 3),
+    (Food, "Encas", 3), (Food, "Conserves enterrées", 4),
+)
+_CONSUMABLE_IDS = {(cls, name, steps): i for i, (cls, name, steps) in enumerate(CONSUMABLES)}
+
+PERMANENTS = (Shovel, Hammer, LockpickKit, MetalDetector, RabbitFoot)
+
+STATES = ("PLAY", "PICK", "SHOP", "END")
+DIRS = ("N", "S", "E", "W")
+NONE = 0xFF
+
+RNG_NONE, RNG_SEED, RNG_STATE = 0, 1, 2
+
+_HEAD = struct.Struct("<4s9B5hB4B")
+_STATE_OFFSET = 8           # octet de la phase dans _HEAD (suivi de win, pick_idx, direction, case)
+_RNG_STATE = struct.Struct("<625I?d")
+_SEED = struct.Struct("<q")
+
+
+def _cell(engine_or_manor, rc) -> int:
+    return NONE if rc is None else rc[0] * engine_or_manor.cols + rc[1]
+
+
+def item_code(item) -> int:
+    key = (type(item), item.name, getattr(item, "steps_restored", 0))
+    try:
+        return _CONSUMABLE_IDS[key]
+    except KeyError:
+        raise ValueError(f"objet inconnu du format de sauvegarde : {item.name}") from None
+
+
+def new_item(i: int):
+    cls, name, steps = CONSUMABLES[i]
+    return Food(name, steps) if cls is Food else cls()
+
+
+# ---------- Sauvegarde ----------
+
+def save(engine: GameEngine, rng: bool = True) -> bytes:
+    """Snapshot binaire de la partie (rng=False : sans le générateur aléatoire)."""
+    manor, player = engine.manor, engine.player
+    inv = player.inventory
+    cols = manor.cols
+
+    grid = bytearray()
+    for row in manor.grid:
+        for room in row:
+            if room is None:
+                grid += b"\0\0"
+            else:
+                grid.append(_TEMPLATE_IDS[room.name])
+                grid.append(room.gem_cost << 1 | room.visited)
+
+    doors = bytearray()
+    for (r, c, dir_), door in manor.doors.items():
+        if dir_ == "S" or dir_ == "E":
+            doors.append(r * cols + c)
+            doors.append((dir_ == "E") | door.lock_level.value << 1 | door.is_open << 3)
+
+    items = bytes(item_code(item) for item in inv.items)
+
+    picks = bytearray()
+    for room in engine.pick_rooms:
+        picks.append(_TEMPLATE_IDS[room.name])
+        picks.append(room.gem_cost)
+
+    offers = bytearray()
+    for dest, offer in engine.offers.items():
+        offers.append(dest[0] * cols + dest[1])
+        offers.append(len(offer))
+        for name, gem_cost in offer:
+            offers.append(_TEMPLATE_IDS[name])
+            offers.append(gem_cost)
+
+    perms = 0
+    for bit, cls in enumerate(PERMANENTS):
+        if cls in inv.permanent_items:
+            perms |= 1 << bit
+
+    mask_size = (manor.rows * cols + 7) // 8
+    searched = sum(1 << (r * cols + c) for r, c in engine.searched_rooms)
+    dug = sum(1 << (r * cols + c) for r, c in engine.dug_rooms)
+
+    out = bytearray(_HEAD.pack(
+        MAGIC, manor.rows, cols, player.r, player.c,
+        STATES.index(engine.state), engine.win, engine.pick_idx,
+        NONE if engine._pending_dir is None else DIRS.index(engine._pending_dir),
+        _cell(manor, engine._pending_dest),
+        inv.steps, inv.gold, inv.gems, inv.keys, inv.dice, perms,
+        len(doors) // 2, len(items), len(picks) // 2, len(engine.offers),
+    ))
+    out += grid
+    out += bytes(engine.room_stock[tpl.name] for tpl in ALL_ROOMS)
+    out += searched.to_bytes(mask_size, "little")
+    out += dug.to_bytes(mask_size, "little")
+    out += doors
+    out += items
+    out += picks
+    out += offers
+    out += _save_rng(engine.random if rng else None)
+    return bytes(out)
+
+
+def _save_rng(rand) -> bytes:
+    if rand is None:
+        return bytes((RNG_NONE,))
+    if isinstance(rand, LazyRandom) and rand._real is None:
+        return bytes((RNG_SEED,)) + _SEED.pack(rand._seed)
+    if isinstance(rand, LazyRandom):
+        rand = rand._real
+    version, state, gauss = rand.getstate()
+    return bytes((RNG_STATE,)) + _RNG_STATE.pack(*state, gauss is not None, gauss or 0.0)
+
+
+# ---------- Chargement ----------
+
+def load(data: bytes, rand: random.Random | None = None) -> GameEngine:
+    """Nouvelle partie (GameEngine) dans l'état sauvegardé."""
+    engine = GameEngine.__new__(GameEngine)
+    engine.history = None
+    engine.blocked_table = None
+    engine.checkpoints = 0
+    engine._fork_key = id(engine)
+    restore(engine, data, rand)
+    return engine
+
+
+def restore(engine: GameEngine, data: bytes, rand: random.Random | None = None) -> None:
+    """
+    Remplace l'état de engine par celui du snapshot (manoir, joueur et
+    générateur neufs : les forks existants ne sont pas touchés).
+    rand : générateur à utiliser si le snapshot n'en contient pas.
+    ValueError si data est tronqué ou corrompu ; engine n'est alors pas modifié.
+    """
+    try:
+        _restore(engine, data, rand)
+    except (struct.error, IndexError, KeyError) as e:
+        raise ValueError(f"sauvegarde tronquée ou corrompue : {e}") from e
+
+
+def _restore(engine: GameEngine, data: bytes, rand: random.Random | None) -> None:
+    if len(data) < _HEAD.size or data[:4] != MAGIC:
+        raise ValueError("pas une sauvegarde (en-tête BPS1 absent)")
+    (magic, rows, cols, pr, pc, state, win, pick_idx, pending_dir, pending_dest,
+     steps, gold, gems, keys, dice, perms,
+     n_doors, n_items, n_picks, n_offers) = _HEAD.unpack_from(data)
+    pos = _HEAD.size
+
+    # Générateur posé à la fin, une fois sa position connue
+    manor = Manor(rows, cols, rng=None)
+    n_cells = rows * cols
+    for i in range(n_cells):
+        tpl_id = data[pos + 2 * i]
+        if not tpl_id:
+            continue
+        flags = data[pos + 2 * i + 1]
+        room = clone_room(TEMPLATES[tpl_id - 1])
+        room.gem_cost = flags >> 1
+        room.visited = bool(flags & 1)
+        manor.set_room(i // cols, i % cols, room)
+    pos += 2 * n_cells
+
+    room_stock = {tpl.name: data[pos + i] for i, tpl in enumerate(ALL_ROOMS)}
+    pos += len(ALL_ROOMS)
+
+    mask_size = (n_cells + 7) // 8
+    searched = int.from_bytes(data[pos:pos + mask_size], "little")
+    dug = int.from_bytes(data[pos + mask_size:pos + 2 * mask_size], "little")
+    pos += 2 * mask_size
+
+    for i in range(n_doors):
+        cell, flags = data[pos + 2 * i], data[pos + 2 * i + 1]
+        r, c = divmod(cell, cols)
+        dir_ = "E" if flags & 1 else "S"
+        dr, dc = DIR_VECTORS[dir_]
+        door = Door(DoorLockLevel((flags >> 1) & 3))
+        door.is_open = bool(flags & 8)
+        manor.put_door((r, c, dir_), (r + dr, c + dc, "W" if dir_ == "E" else "N"), door)
+    pos += 2 * n_doors
+
+    items = [new_item(i) for i in data[pos:pos + n_items]]
+    pos += n_items
+
+    pick_rooms = []
+    for i in range(n_picks):
+        room = clone_room(TEMPLATES[data[pos + 2 * i] - 1])
+        room.gem_cost = data[pos + 2 * i + 1]
+        pick_rooms.append(room)
+    pos += 2 * n_picks
+
+    offers = OfferCache(OFFER_CACHE_SIZE)
+    entries = []
+    for _ in range(n_offers):
+        dest = divmod(data[pos], cols)
+        count = data[pos + 1]
+        pos += 2
+        entries.append((dest, tuple((TEMPLATES[data[pos + 2 * k] - 1].name, data[pos + 2 * k + 1])
+                                    for k in range(count))))
+        pos += 2 * count
+    offers.restore(entries)
+
+    saved_rand = _load_rng(data, pos)
+    if saved_rand is not None:
+        rand = saved_rand
+    elif rand is None:
+        rand = random.Random()
+    manor.rng = rand
+
+    player = Player(pr, pc)
+    inv = player.inventory
+    inv.steps, inv.gold, inv.gems, inv.keys, inv.dice = steps, gold, gems, keys, dice
+    inv.set_items(items, (cls for bit, cls in enumerate(PERMANENTS) if perms >> bit & 1))
+
+    # Octets d'état vérifiés avant de toucher à engine
+    if state >= len(STATES):
+        raise ValueError(f"phase de jeu inconnue : {state}")
+    if pending_dir != NONE and pending_dir >= len(DIRS):
+        raise ValueError(f"direction en attente inconnue : {pending_dir}")
+    if pending_dest != NONE and pending_dest >= n_cells:
+        raise ValueError(f"case en attente hors de la grille : {pending_dest}")
+    searched_rooms = _cells_of(searched, cols)
+    dug_rooms = _cells_of(dug, cols)
+
+    h = 0
+    for name, count in room_stock.items():
+        h ^= stock_key(name, count)
+    for kind, cells in ((SEARCHED, searched_rooms), (DUG, dug_rooms)):
+        for r, c in cells:
+            h ^= zkey(K_MARK, kind, r, c)
+
+    engine.random = rand
+    engine.manor = manor
+    engine.player = player
+    engine.rng = RandomManager(player, rand)
+    engine.room_templates = {tpl.name: tpl for tpl in ALL_ROOMS}
+    engine.room_stock = room_stock
+    engine.offers = offers
+    engine.searched_rooms = searched_rooms
+    engine.dug_rooms = dug_rooms
+    engine.state = STATES[state]
+    engine.win = bool(win)
+    engine.pick_rooms = pick_rooms
+    engine.pick_idx = pick_idx
+    engine._pending_dir = None if pending_dir == NONE else DIRS[pending_dir]
+    engine._pending_dest = None if pending_dest == NONE else divmod(pending_dest, cols)
+    engine.message = ""
+    engine.shop_message = ""
+    engine._zobrist = h
+
+    # Ce qui dépendait de l'ancienne partie
+    engine._ops = None
+    engine._planner = None
+    engine._forks = 0
+    engine.action_log = None
+    engine.analytics = None
+    if engine.history is not None:
+        engine.history.clear()
+
+
+def _cells_of(mask: int, cols: int) -> set[tuple[int, int]]:
+    cells = set()
+    while mask:
+        low = mask & -mask
+        cells.add(divmod(low.bit_length() - 1, cols))
+        mask ^= low
+    return cells
+
+
+def _load_rng(data: bytes, pos: int):
+    kind = data[pos]
+    if kind == RNG_NONE:
+        return None
+    if kind == RNG_SEED:
+        return LazyRandom(_SEED.unpack_from(data, pos + 1)[0])
+    if kind == RNG_STATE:
+        values = _RNG_STATE.unpack_from(data, pos + 1)
+        rand = random.Random()
+        rand.setstate((3, values[:625], values[626] if values[625] else None))
+        return rand
+    raise ValueError(f"type de générateur inconnu : {kind}")
+
+
+# ---------- Vérification : python snapshot.py --games 200 ----------
+
+def _corrupted(data: bytes):
+    """Variantes invalides d'une sauvegarde : (description, octets)."""
+    for name, offset, value in (("phase", _STATE_OFFSET, len(STATES)),
+                                ("direction en attente", _STATE_OFFSET + 3, len(DIRS)),
+                                ("case en attente", _STATE_OFFSET + 4, 0xFE)):
+        bad = bytearray(data)
+        bad[offset] = value
+        yield name, bytes(bad)
+    yield "tronquée", data[:len(data) - 5]
+
+
+def main(argv=None) -> int:
+    import argparse
+    from bots import RandomPolicy
+    from fork_bench import state_digest
+
+    parser = argparse.ArgumentParser(description="Aller-retour save / load vérifié.")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--tail", type=int, default=30,
+                        help="actions jouées après chargement pour comparer la suite")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    sizes = []
+    save_s = load_s = 0.0
+    count = 0
+    for seed in range(args.games):
+        engine = GameEngine.new_game(seed)
+        policy = RandomPolicy(seed)
+        while engine.state != "END":
+            t0 = time.perf_counter()
+            data = save(engine)
+            t1 = time.perf_counter()
+            copy = load(data)
+            t2 = time.perf_counter()
+            save_s += t1 - t0
+            load_s += t2 - t1
+            count += 1
+            sizes.append(len(save(engine, rng=False)))
+
+            if state_digest(copy) != state_digest(engine) or copy.state_hash() != engine.state_hash() \
+                    or copy.random.getstate() != engine.random.getstate() or save(copy) != data:
+                print(f"graine {seed} : état chargé différent après {count} snapshots")
+                failures += 1
+                break
+            engine.apply_action(policy.choose(engine))
+
+        # La suite de la partie chargée est identique à celle de l'original
+        engine = GameEngine.new_game(seed)
+        policy = RandomPolicy(seed)
+        for _ in range(20):
+            if engine.state == "END":
+                break
+            engine.apply_action(policy.choose(engine))
+        copy = load(save(engine))
+        for tail_policy, game in ((RandomPolicy(-seed), engine), (RandomPolicy(-seed), copy)):
+            for _ in range(args.tail):
+                if game.state == "END":
+                    break
+                game.apply_action(tail_policy.choose(game))
+        if state_digest(copy) != state_digest(engine):
+            print(f"graine {seed} : la partie chargée ne joue pas comme l'original")
+            failures += 1
+
+        # Sauvegarde corrompue : ValueError, et la partie en cours n'est pas touchée
+        data = save(engine)
+        other = GameEngine.new_game(seed + args.games)
+        before = (state_digest(other), other.state_hash())
+        for name, bad in _corrupted(data):
+            try:
+                restore(other, bad)
+            except ValueError:
+                pass
+            else:
+                print(f"graine {seed} : sauvegarde corrompue acceptée ({name})")
+                failures += 1
+                break
+            if (state_digest(other), other.state_hash()) != before:
+                print(f"graine {seed} : partie modifiée par une sauvegarde corrompue ({name})")
+                failures += 1
+                break
+
+    print(f"{args.games - failures}/{args.games} parties correctes ; "
+          f"snapshot sans hasard {min(sizes)}-{max(sizes)} octets (moyenne {sum(sizes) / len(sizes):.0f}), "
+          f"+{_RNG_STATE.size + 1} avec l'état du générateur ; "
+          f"save {save_s / count * 1e6:.1f} µs, load {load_s / count * 1e6:.1f} µs")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+# solver.py
+import argparse
+import pickle
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from door import DoorLockLevel
+from engine import GameEngine
+from items import Food
+from manoir import DIR_VECTORS, opposite_dir
+from room import RoomType
+from zobrist import TranspositionTable
+
+"""
+Oracle de solvabilité : une graine peut-elle être gagnée en jouant
+parfaitement, et en combien de déplacements au minimum ?
+
+Avec une graine, la partie est déterministe : les tirages (salles proposées,
+fouilles, portes) ne dépendent que de la suite des actions. Le solveur
+explore donc l'arbre exact des actions du moteur (toutes les actions
+légales), chaque fils étant un fork avec une copie du générateur.
+
+- Approfondissement itératif sur le nombre de déplacements (salles entrées) :
+  borne = distance de Manhattan à l'antichambre, puis +1 tant que rien n'est
+  trouvé. La première borne gagnante est le minimum.
+- Parcours en profondeur, mémoïsé (TranspositionTable) par (hash d'état,
+  état du générateur) : un état déjà prouvé perdant avec au moins autant de
+  déplacements restants n'est pas réexploré.
+- Coupes (toutes admissibles : elles ne coupent jamais une partie gagnable) :
+  * déplacements restants < distance de Manhattan à antechamber_rc ;
+  * pas restants + pas récupérables < distance de Manhattan ;
+  * clés nécessaires (portes à double tour sur le meilleur chemin possible)
+    > clés obtenables. Les gains futurs sont majorés par salle visitable
+    (MAX_STEPS_PER_ROOM, MAX_KEYS_PER_ROOM).
+- Les sous-arbres des premières actions sont répartis dans un pool de
+  processus, borne par borne.
+
+Si une borne n'a coupé aucune branche sur le nombre de déplacements, l'arbre
+a été parcouru en entier : la graine est prouvée impossible. Avec la limite
+de nœuds atteinte, le résultat n'est plus exact (voir Solution.exact).
+
+    python solver.py --seeds 0 20          # code de sortie 1 si une solution ne rejoue pas
+"""
+
+SOLVER_NODE_LIMIT = 200_000     # nœuds par sous-arbre et par borne
+SOLVER_MAX_MOVES = 40
+SOLVER_TABLE_SIZE = 1 << 18
+FANOUT_DEPTH = 2                # profondeur des préfixes répartis entre processus
+
+# Majorants des gains d'une salle (effet d'entrée + fouille + creusage + boutique)
+MAX_STEPS_PER_ROOM = 32
+MAX_KEYS_PER_ROOM = 3
+
+WIN, FAIL, LIMIT = "win", "fail", "limit"
+
+
+@dataclass
+class Solution:
+    """Résultat de l'oracle pour une graine."""
+    seed: int
+    solvable: bool | None           # None : indéterminé (limite de nœuds / de déplacements)
+    min_moves: int | None = None    # déplacements de la ligne trouvée
+    exact: bool = False             # min_moves est le minimum prouvé
+    line: list[int] = field(default_factory=list)   # actions d'une partie gagnante
+    nodes: int = 0
+    elapsed_s: float = 0.0
+
+
+def _copy_random(rand) -> random.Random:
+    copy = random.Random()
+    copy.setstate(rand.getstate())
+    return copy
+
+
+def _distance(engine: GameEngine) -> int:
+    ar, ac = engine.manor.antechamber_rc
+    return abs(engine.player.r - ar) + abs(engine.player.c - ac)
+
+
+def keys_needed(engine: GameEngine) -> int:
+    """
+    Minorant du nombre de clés à dépenser pour atteindre l'antichambre :
+    plus court chemin (0-1) en portes à double tour. Une case vide peut
+    recevoir n'importe quelle salle ; un niveau 1 compte 0 (kit possible).
+    """
+    manor = engine.manor
+    ante_row = manor.antechamber_rc[0]
+    special = (RoomType.ENTRANCE, RoomType.ANTECHAMBER)
+    start = (engine.player.r, engine.player.c)
+    best = {start: 0}
+    queue = deque([start])
+
+    while queue:
+        r, c = queue.popleft()
+        cost = best[(r, c)]
+        if (r, c) == manor.antechamber_rc:
+            return cost
+        here = manor.grid[r][c]
+        for dir_, (dr, dc) in DIR_VECTORS.items():
+            nr, nc = r + dr, c + dc
+            if not manor.in_bounds(nr, nc):
+                continue
+            there = manor.grid[nr][nc]
+            if here is not None and dir_ not in here.doors:
+                continue
+            if there is not None and opposite_dir(dir_) not in there.doors:
+                continue
+
+            door = manor.doors.get((r, c, dir_))
+            if door is not None:
+                step = int(not door.is_open and door.lock_level == DoorLockLevel.DOUBLE_LOCKED)
+            elif (here is not None and here.room_type in special) or \
+                    (there is not None and there.room_type in special):
+                step = 0
+            else:
+                step = int(int((r + nr) / 2) == ante_row)
+
+            if cost + step < best.get((nr, nc), cost + step + 1):
+                best[(nr, nc)] = cost + step
+                if step:
+                    queue.append((nr, nc))
+                else:
+                    queue.appendleft((nr, nc))
+    return 1 << 30   # antichambre inaccessible
+
+
+class _Search:
+    """Une recherche en profondeur bornée (un sous-arbre, une borne)."""
+
+    def __init__(self, bound: int, node_limit: int):
+        self.bound = bound
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.cut = False        # une branche a été coupée par la borne
+        self.table = TranspositionTable(SOLVER_TABLE_SIZE)
+
+    def feasible(self, engine: GameEngine, remaining: int, dist: int) -> bool:
+        """Coupes sur les pas et les clés (majorants des gains à venir)."""
+        inv = engine.player.inventory
+        rooms = remaining + 1
+        food = sum(item.steps_restored for item in inv.items if isinstance(item, Food))
+        if engine.player.steps + food + inv.gold // 3 * 4 + MAX_STEPS_PER_ROOM * rooms < dist:
+            return False
+        return keys_needed(engine) <= inv.keys + inv.gold // 5 + MAX_KEYS_PER_ROOM * rooms
+
+    def dfs(self, engine: GameEngine, moves: int, on_path: set) -> list[int] | None:
+        """Ligne gagnante depuis engine en au plus bound déplacements, sinon None."""
+        if engine.state == "END":
+            return [] if engine.win else None
+
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise _NodeLimit
+
+        dist = _distance(engine)
+        remaining = self.bound - moves
+        if dist > remaining:
+            self.cut = True
+            return None
+        if not self.feasible(engine, remaining, dist):
+            return None
+
+        key = (engine.state_hash(), hash(engine.random.getstate()))
+        proven = self.table.get(key)
+        if (proven is not None and proven >= remaining) or key in on_path:
+            return None
+
+        on_path.add(key)
+        position = (engine.player.r, engine.player.c)
+        for action, child in _children(engine, key):
+            moved = (child.player.r, child.player.c) != position
+            line = self.dfs(child, moves + moved, on_path)
+            if line is not None:
+                on_path.discard(key)
+                return [action] + line
+        on_path.discard(key)
+
+        self.table.put(key, remaining)
+        return None
+
+
+class _NodeLimit(Exception):
+    pass
+
+
+def _children(engine: GameEngine, key: tuple | None = None):
+    """(action, fork après l'action) pour chaque action légale qui change l'état."""
+    if key is None:
+        key = (engine.state_hash(), hash(engine.random.getstate()))
+    for action in engine.legal_actions():
+        child = engine.fork(_copy_random(engine.random))
+        child.apply_action(action)
+        if (child.state_hash(), hash(child.random.getstate())) != key:
+            yield action, child
+
+
+def _expand(root: GameEngine, depth: int) -> list[tuple[list[int], GameEngine, int]]:
+    """Préfixes d'actions de longueur <= depth : (actions, partie, déplacements)."""
+    frontier = [([], root, 0)]
+    for _ in range(depth):
+        nxt = []
+        for prefix, engine, moves in frontier:
+            if engine.state == "END":
+                nxt.append((prefix, engine, moves))
+                continue
+            position = (engine.player.r, engine.player.c)
+            for action, child in _children(engine):
+                moved = (child.player.r, child.player.c) != position
+                nxt.append((prefix + [action], child, moves + moved))
+        frontier = nxt
+    return frontier
+
+
+def _solve_subtree(payload: bytes, moves: int, bound: int, node_limit: int):
+    """Tâche d'un processus : (statut, ligne, nœuds, coupé par la borne)."""
+    engine = pickle.loads(payload)
+    search = _Search(bound, node_limit)
+    try:
+        line = search.dfs(engine, moves, set())
+    except _NodeLimit:
+        return LIMIT, None, search.nodes, True
+    if line is not None:
+        return WIN, line, search.nodes, search.cut
+    return FAIL, None, search.nodes, search.cut
+
+
+def _moves_of(seed: int, line: list[int]) -> tuple[bool, int]:
+    """Rejoue line depuis la graine : (victoire, nombre de déplacements)."""
+    engine = GameEngine.new_game(seed)
+    moves = 0
+    for action in line:
+        position = (engine.player.r, engine.player.c)
+        engine.apply_action(action)
+        moves += (engine.player.r, engine.player.c) != position
+    return engine.win, moves
+
+
+def solve(seed: int, max_moves: int = SOLVER_MAX_MOVES, node_limit: int = SOLVER_NODE_LIMIT,
+          workers: int | None = None, pool: ProcessPoolExecutor | None = None) -> Solution:
+    """
+    Cherche la partie gagnante la plus courte (en déplacements) pour seed.
+    workers=0 : tout dans le processus courant ; pool : pool déjà ouvert.
+    """
+    t0 = time.perf_counter()
+    root = GameEngine.new_game(seed)
+    # Partagé par tous les forks (is_player_blocked ne dépend que de l'état)
+    root.blocked_table = TranspositionTable(SOLVER_TABLE_SIZE)
+    prefixes = _expand(root, FANOUT_DEPTH)
+    payloads = [pickle.dumps(engine) for _, engine, _ in prefixes]
+
+    own_pool = None
+    if pool is None and workers != 0:
+        pool = own_pool = ProcessPoolExecutor(workers)
+
+    solution = Solution(seed, None)
+    exact = True
+    try:
+        for bound in range(_distance(root), max_moves + 1):
+            args = [(payload, moves, bound, node_limit) for payload, (_, _, moves) in zip(payloads, prefixes)]
+            if pool is None:
+                results = [_solve_subtree(*a) for a in args]
+            else:
+                results = list(pool.map(_solve_subtree, *zip(*args)))
+
+            solution.nodes += sum(nodes for _, _, nodes, _ in results)
+            lines = [prefix + line for (prefix, _, _), (status, line, _, _) in zip(prefixes, results)
+                     if status == WIN]
+            if lines:
+                best = min(lines, key=lambda line: (_moves_of(seed, line)[1], len(line)))
+                solution.solvable = True
+                solution.line = best
+                solution.min_moves = _moves_of(seed, best)[1]
+                solution.exact = exact
+                break
+            if any(status == LIMIT for status, *_ in results):
+                exact = False
+            elif exact and not any(cut for *_, cut in results):
+                # Rien n'a été coupé par la borne : arbre entièrement parcouru
+                solution.solvable = False
+                solution.exact = True
+                break
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+    solution.elapsed_s = time.perf_counter() - t0
+    return solution
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Oracle de solvabilité des graines.")
+    parser.add_argument("--seeds", type=int, nargs=2, default=(0, 10), metavar=("DEBUT", "FIN"))
+    parser.add_argument("--max-moves", type=int, default=SOLVER_MAX_MOVES)
+    parser.add_argument("--node-limit", type=int, default=SOLVER_NODE_LIMIT)
+    parser.add_argument("--workers", type=int, default=None, help="processus (0 = aucun)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    pool = ProcessPoolExecutor(args.workers) if args.workers != 0 else None
+    try:
+        for seed in range(*args.seeds):
+            sol = solve(seed, args.max_moves, args.node_limit, args.workers, pool)
+            if sol.solvable:
+                # La ligne trouvée doit gagner en rejouant depuis la graine
+                won, moves = _moves_of(seed, sol.line)
+                if not won or moves != sol.min_moves:
+                    failures += 1
+                    print(f"graine {seed} : la ligne trouvée ne rejoue pas une victoire")
+                    continue
+                verdict = f"gagnable en {sol.min_moves} déplacements" + ("" if sol.exact else " (borne sup.)")
+            elif sol.solvable is False:
+                verdict = "impossible"
+            else:
+                verdict = "indéterminé"
+            print(f"graine {seed:5d} : {verdict:36s} {sol.nodes:9,d} nœuds, {sol.elapsed_s:6.1f} s")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
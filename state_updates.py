@@ -0,0 +1,403 @@
+# state_updates.py
+import sys
+
+import snapshot
+from action_log import write_varint, read_varint
+from door import Door, DoorLockLevel
+from engine import GameEngine
+from history import CELL, NEW_DOOR, DOOR_OPEN, VISITED, STOCK, SEARCHED, DUG
+from manoir import DIR_VECTORS
+from room_data import clone_room
+
+"""
+Mises à jour incrémentales d'une partie pour un client distant ou un
+spectateur : après chaque action, seulement ce qui a changé.
+
+ChangeTracker s'appuie sur les modifications que le moteur signale déjà
+pour l'annulation (history.py : Manor.set_room, portes créées / ouvertes,
+salles visitées, pioche, fouilles) et compare le petit état restant
+(position, ressources, objets, phase, cartes, messages). Il faut donc une
+partie sans historique (enable_history).
+
+Trame de mises à jour (entiers en varint, cases et portes codées comme dans
+snapshot.py) :
+    seq | champs (masque) | sections des champs présents, dans l'ordre :
+    CELLS    n, (case, modèle ou 0, coût << 1 | visitée) × n
+    DOORS    n, (case S/E, E | niveau << 1 | ouverte << 3, ou 0xFF : retirée) × n
+    RES      masque (pas, or, gemmes, clés, dés), valeurs changées
+    PLAYER   r, c
+    PHASE    état, victoire, curseur
+    ITEMS    n, codes des consommables × n, permanents (bits)
+    PICKS    n, (modèle, coût) × n
+    MARKS    n, (case << 2 | creusée << 1 | présente) × n
+    STOCK    n, (modèle, restant) × n
+    MESSAGE / SHOP_MESSAGE   longueur, UTF-8
+
+Une action courante tient en 3 à 10 octets plus son message. seq augmente
+de 1 par trame : un client qui constate un trou demande une resynchronisation
+(resync : seq, messages, snapshot.save sans générateur, ~200 octets).
+
+    python state_updates.py --games 200    # client et spectateur vérifiés, octets par action
+"""
+
+F_CELLS, F_DOORS, F_RES, F_PLAYER, F_PHASE, F_ITEMS, F_PICKS, F_MARKS, F_STOCK, \
+    F_MESSAGE, F_SHOP_MESSAGE = (1 << i for i in range(11))
+
+DOOR_REMOVED = 0xFF
+
+_TEMPLATE_IDS = {tpl.name: i + 1 for i, tpl in enumerate(snapshot.TEMPLATES)}
+_MARK_KINDS = (SEARCHED, DUG)
+
+
+def _scalars(engine: GameEngine) -> tuple:
+    """Petit état comparé avant / après chaque action (même découpage que la trame)."""
+    player = engine.player
+    inv = player.inventory
+    return (
+        (inv.steps, inv.gold, inv.gems, inv.keys, inv.dice),
+        (player.r, player.c),
+        (engine.state, engine.win, engine.pick_idx),
+        (tuple(inv.items), frozenset(inv.permanent_items)),
+        tuple((room.name, room.gem_cost) for room in engine.pick_rooms),
+        engine.message,
+        engine.shop_message,
+    )
+
+
+def _door_key(r: int, c: int, dir_: str) -> tuple[int, int, str]:
+    """Clé d'une porte vue depuis sa case nord / ouest (côté S / E)."""
+    if dir_ == "N" or dir_ == "W":
+        dr, dc = DIR_VECTORS[dir_]
+        return r + dr, c + dc, "S" if dir_ == "N" else "E"
+    return r, c, dir_
+
+
+def _write_text(out: bytearray, text: str) -> None:
+    data = text.encode()
+    write_varint(out, len(data))
+    out += data
+
+
+def _read_text(data, i: int) -> tuple[str, int]:
+    n, i = read_varint(data, i)
+    return bytes(data[i:i + n]).decode(), i + n
+
+
+class ChangeTracker:
+    """Numérote et encode les changements d'une partie, action par action."""
+
+    __slots__ = ("seq", "_before")
+
+    def __init__(self):
+        self.seq = 0
+        self._before: tuple | None = None
+
+    def begin(self, engine: GameEngine) -> None:
+        if engine.history is not None:
+            raise ValueError("suivi des changements impossible avec l'historique d'annulation")
+        engine._ops = engine.manor._ops = []
+        self._before = _scalars(engine)
+
+    def commit(self, engine: GameEngine) -> bytes | None:
+        """Trame des changements depuis begin() ; None si rien de visible n'a changé."""
+        ops = engine._ops
+        engine._ops = engine.manor._ops = None
+        before, self._before = self._before, None
+        after = _scalars(engine)
+
+        cells, doors, marks, stock = set(), set(), set(), set()
+        for op in ops:
+            kind = op[0]
+            if kind == CELL or kind == VISITED:
+                cells.add((op[1], op[2]))
+            elif kind == NEW_DOOR:
+                doors.add(_door_key(*op[1]))
+            elif kind == DOOR_OPEN:
+                doors.add(_door_key(op[1], op[2], op[3]))
+            elif kind == STOCK:
+                stock.add(op[1])
+            elif kind == SEARCHED or kind == DUG:
+                marks.add((kind, op[1]))
+
+        fields = 0
+        body = bytearray()
+        manor, cols = engine.manor, engine.manor.cols
+
+        if cells:
+            fields |= F_CELLS
+            write_varint(body, len(cells))
+            for r, c in sorted(cells):
+                room = manor.grid[r][c]
+                body.append(r * cols + c)
+                if room is None:
+                    body += b"\0\0"
+                else:
+                    body.append(_TEMPLATE_IDS[room.name])
+                    body.append(room.gem_cost << 1 | room.visited)
+        if doors:
+            fields |= F_DOORS
+            write_varint(body, len(doors))
+            for r, c, dir_ in sorted(doors):
+                door = manor.doors.get((r, c, dir_))
+                body.append(r * cols + c)
+                body.append(DOOR_REMOVED if door is None else
+                            (dir_ == "E") | door.lock_level.value << 1 | door.is_open << 3)
+        res0, res1 = before[0], after[0]
+        if res0 != res1:
+            fields |= F_RES
+            changed = [i for i in range(5) if res0[i] != res1[i]]
+            body.append(sum(1 << i for i in changed))
+            for i in changed:
+                write_varint(body, res1[i])
+        if before[1] != after[1]:
+            fields |= F_PLAYER
+            body += bytes(after[1])
+        if before[2] != after[2]:
+            fields |= F_PHASE
+            state, win, pick_idx = after[2]
+            body += bytes((snapshot.STATES.index(state), win, pick_idx))
+        if before[3] != after[3]:
+            fields |= F_ITEMS
+            items, perms = after[3]
+            write_varint(body, len(items))
+            body += bytes(snapshot.item_code(item) for item in items)
+            body.append(sum(1 << bit for bit, cls in enumerate(snapshot.PERMANENTS) if cls in perms))
+        if before[4] != after[4]:
+            fields |= F_PICKS
+            write_varint(body, len(after[4]))
+            for name, gem_cost in after[4]:
+                body.append(_TEMPLATE_IDS[name])
+                body.append(gem_cost)
+        if marks:
+            fields |= F_MARKS
+            write_varint(body, len(marks))
+            for kind, (r, c) in sorted(marks):
+                present = (r, c) in (engine.searched_rooms if kind == SEARCHED else engine.dug_rooms)
+                write_varint(body, (r * cols + c) << 2 | (kind == DUG) << 1 | present)
+        if stock:
+            fields |= F_STOCK
+            write_varint(body, len(stock))
+            for name in sorted(stock):
+                body.append(_TEMPLATE_IDS[name])
+                body.append(engine.room_stock[name])
+        if before[5] != after[5]:
+            fields |= F_MESSAGE
+            _write_text(body, after[5])
+        if before[6] != after[6]:
+            fields |= F_SHOP_MESSAGE
+            _write_text(body, after[6])
+
+        if not fields:
+            return None
+        self.seq += 1
+        out = bytearray()
+        write_varint(out, self.seq)
+        write_varint(out, fields)
+        return bytes(out + body)
+
+    def resync(self, engine: GameEngine) -> bytes:
+        """Trame de resynchronisation : seq courant, messages, snapshot sans générateur."""
+        out = bytearray()
+        write_varint(out, self.seq)
+        _write_text(out, engine.message)
+        _write_text(out, engine.shop_message)
+        return bytes(out) + snapshot.save(engine, rng=False)
+
+
+# ---------- Côté client / spectateur ----------
+
+class RemoteGame:
+    """
+    Copie d'affichage d'une partie distante, tenue à jour par les trames.
+    engine sert au dessin (ui.py) et à legal_actions() ; il n'a pas de
+    générateur ni d'offres mémorisées : il ne joue pas lui-même.
+    """
+
+    def __init__(self, frame: bytes | None = None):
+        self.engine: GameEngine | None = None
+        self.seq = 0
+        if frame is not None:
+            self.resync(frame)
+
+    def resync(self, frame: bytes) -> None:
+        seq, i = read_varint(frame, 0)
+        message, i = _read_text(frame, i)
+        shop_message, i = _read_text(frame, i)
+        engine = snapshot.load(frame[i:])
+        engine.message, engine.shop_message = message, shop_message
+        self.engine, self.seq = engine, seq
+
+    def apply(self, frame: bytes) -> bool:
+        """Applique une trame ; False si elle ne suit pas la précédente (resync nécessaire)."""
+        seq, i = read_varint(frame, 0)
+        if self.engine is None or seq != self.seq + 1:
+            return False
+        fields, i = read_varint(frame, i)
+        engine = self.engine
+        manor, player = engine.manor, engine.player
+        inv, cols = player.inventory, manor.cols
+
+        if fields & F_CELLS:
+            n, i = read_varint(frame, i)
+            for _ in range(n):
+                cell, tpl_id, flags = frame[i], frame[i + 1], frame[i + 2]
+                i += 3
+                room = None
+                if tpl_id:
+                    room = clone_room(snapshot.TEMPLATES[tpl_id - 1])
+                    room.gem_cost, room.visited = flags >> 1, bool(flags & 1)
+                manor.set_room(*divmod(cell, cols), room)
+        if fields & F_DOORS:
+            n, i = read_varint(frame, i)
+            for _ in range(n):
+                cell, flags = frame[i], frame[i + 1]
+                i += 2
+                _apply_door(manor, *divmod(cell, cols), flags)
+        if fields & F_RES:
+            mask = frame[i]
+            i += 1
+            values = [inv.steps, inv.gold, inv.gems, inv.keys, inv.dice]
+            for k in range(5):
+                if mask >> k & 1:
+                    values[k], i = read_varint(frame, i)
+            inv.steps, inv.gold, inv.gems, inv.keys, inv.dice = values
+        if fields & F_PLAYER:
+            player.r, player.c = frame[i], frame[i + 1]
+            i += 2
+        if fields & F_PHASE:
+            engine.state = snapshot.STATES[frame[i]]
+            engine.win, engine.pick_idx = bool(frame[i + 1]), frame[i + 2]
+            i += 3
+        if fields & F_ITEMS:
+            n, i = read_varint(frame, i)
+            items = [snapshot.new_item(code) for code in frame[i:i + n]]
+            perms = frame[i + n]
+            i += n + 1
+            inv.set_items(items, (cls for bit, cls in enumerate(snapshot.PERMANENTS) if perms >> bit & 1))
+        if fields & F_PICKS:
+            n, i = read_varint(frame, i)
+            rooms = []
+            for _ in range(n):
+                room = clone_room(snapshot.TEMPLATES[frame[i] - 1])
+                room.gem_cost = frame[i + 1]
+                rooms.append(room)
+                i += 2
+            engine.pick_rooms = rooms
+        if fields & F_MARKS:
+            n, i = read_varint(frame, i)
+            for _ in range(n):
+                value, i = read_varint(frame, i)
+                kind = _MARK_KINDS[value >> 1 & 1]
+                rc = divmod(value >> 2, cols)
+                marked = rc in (engine.searched_rooms if kind == SEARCHED else engine.dug_rooms)
+                if value & 1 and not marked:
+                    engine.mark_cell(kind, rc)
+                elif not value & 1 and marked:
+                    engine.unmark_cell(kind, rc)
+        if fields & F_STOCK:
+            n, i = read_varint(frame, i)
+            for _ in range(n):
+                engine.set_stock(snapshot.TEMPLATES[frame[i] - 1].name, frame[i + 1])
+                i += 2
+        if fields & F_MESSAGE:
+            engine.message, i = _read_text(frame, i)
+        if fields & F_SHOP_MESSAGE:
+            engine.shop_message, i = _read_text(frame, i)
+
+        self.seq = seq
+        return True
+
+
+def _apply_door(manor, r: int, c: int, flags: int) -> None:
+    dir_ = "E" if flags & 1 else "S"
+    dr, dc = DIR_VECTORS[dir_]
+    key, key2 = (r, c, dir_), (r + dr, c + dc, "W" if dir_ == "E" else "N")
+    door = manor.doors.get(key)
+    if flags == DOOR_REMOVED:
+        if door is not None:
+            manor.drop_door(key, key2)
+        return
+    level = DoorLockLevel((flags >> 1) & 3)
+    if door is not None and door.lock_level == level:
+        manor.set_door_open((r, c), dir_, bool(flags & 8))
+        return
+    if door is not None:
+        manor.drop_door(key, key2)
+    door = Door(level)
+    door.is_open = bool(flags & 8)
+    manor.put_door(key, key2, door)
+
+
+# ---------- Vérification : python state_updates.py ----------
+
+def visible_digest(engine: GameEngine) -> tuple:
+    """state_digest sans les offres mémorisées (jamais envoyées), plus les messages."""
+    from fork_bench import state_digest
+
+    digest = state_digest(engine)
+    return digest[:8] + digest[9:] + (engine.message, engine.shop_message)
+
+
+def main(argv=None) -> int:
+    import argparse
+    import random
+    from bots import RandomPolicy
+    from server import view, encode
+
+    parser = argparse.ArgumentParser(description="Mises à jour incrémentales vérifiées.")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--loss", type=float, default=0.02, help="part des trames perdues par le client")
+    args = parser.parse_args(argv)
+
+    failures = resyncs = actions = frames = 0
+    frame_bytes = text_bytes = view_bytes = 0
+    snapshot_bytes = []
+    loss = random.Random(0)
+    for seed in range(args.games):
+        engine = GameEngine.new_game(seed)
+        policy = RandomPolicy(seed)
+        tracker = ChangeTracker()
+        client = RemoteGame(tracker.resync(engine))
+        spectator = None
+        while engine.state != "END":
+            tracker.begin(engine)
+            engine.apply_action(policy.choose(engine))
+            frame = tracker.commit(engine)
+            actions += 1
+            view_bytes += len(encode(view(engine)))    # réponse du serveur en mode vue
+            if frame is not None:
+                frames += 1
+                frame_bytes += len(frame)
+                text_bytes += len(engine.message.encode()) if engine.message else 0
+                # Client : trame perdue de temps en temps, puis trou détecté -> resync
+                if loss.random() >= args.loss and not client.apply(frame):
+                    data = tracker.resync(engine)
+                    snapshot_bytes.append(len(data))
+                    client.resync(data)
+                    resyncs += 1
+                if spectator is not None and not spectator.apply(frame):
+                    print(f"graine {seed} : trame refusée par le spectateur")
+                    failures += 1
+                    break
+            if spectator is None and tracker.seq >= 10:
+                spectator = RemoteGame(tracker.resync(engine))   # arrive en cours de partie
+
+            if client.seq == tracker.seq and visible_digest(client.engine) != visible_digest(engine):
+                print(f"graine {seed} : client différent après {actions} actions")
+                failures += 1
+                break
+            if spectator is not None and visible_digest(spectator.engine) != visible_digest(engine):
+                print(f"graine {seed} : spectateur différent après {actions} actions")
+                failures += 1
+                break
+
+    print(f"{args.games - failures}/{args.games} parties suivies à l'identique "
+          f"(client avec {args.loss:.0%} de trames perdues : {resyncs} resynchronisations ; spectateur)")
+    print(f"{actions} actions, {frames} trames : {frame_bytes / max(1, actions):.1f} octets par action "
+          f"(dont messages {text_bytes / max(1, actions):.1f}) ; vue complète JSON {view_bytes / max(1, actions):.0f} "
+          f"octets ; resync {sum(snapshot_bytes) / max(1, len(snapshot_bytes)):.0f} octets")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,7 @@ Ce module contient tout l'affichage (UI) :
 - Menu de sélection de salle (pulsing sur la carte sélectionnée)
 - Fenêtre de boutique
 - Écran de fin de partie
+- Frise temporelle de la visionneuse de rejeu
 """
 
 # Couleurs associées aux "types/couleurs" de salles
@@ -319,7 +320,7 @@ def _pulse_width(phase: float, w_min: int = 2, w_max: int = 8) -> int:
     return int(round(w_min + t * (w_max - w_min)))
 
 
-def draw_pick_screen_pulse(surface, three_rooms, selected_idx, phase: float):
+def draw_pick_screen_pulse(surface, three_rooms, selected_idx, phase: float, estimates=None):
     grid_width = COLS * TILE
     grid_height = ROWS * TILE
 
@@ -372,6 +373,25 @@ def draw_pick_screen_pulse(surface, three_rooms, selected_idx, phase: float):
         t_doors = FONT_SM.render(f"Portes: {doors}", True, BLACK)
         surface.blit(t_doors, t_doors.get_rect(center=(rect.centerx, rect.centery + 30)))
 
+        if estimates is not None and i < len(estimates):
+            _draw_card_estimate(surface, rect, estimates[i])
+
+
+def _draw_card_estimate(surface, rect: pygame.Rect, estimate):
+    """Victoire estimée / pas restants (pick_estimates.py), affinés au fil des frames."""
+    if estimate is None:
+        lines = ["Trop cher"]
+    elif estimate.games == 0:
+        lines = ["Victoire: …"]
+    else:
+        lines = [f"Victoire: {estimate.win_rate:.0%}", f"Pas fin: {estimate.mean_steps:.0f}"]
+
+    y = rect.top + 52
+    for line in lines:
+        txt = FONT_SM.render(line, True, BLACK)
+        surface.blit(txt, txt.get_rect(center=(rect.centerx, y)))
+        y += txt.get_height() + 2
+
 
 def _draw_card_cost(surface, rect: pygame.Rect, cost: int):
     if cost < 0:
@@ -432,7 +452,8 @@ def draw_shop_window(surface, inventory, shop_message: str = ""):
         surface.blit(msg, (rect.left + 24, y))
 
 
-def draw_end_screen(surface, win=True):
+def draw_end_screen(surface, win=True, lines=()):
+    """Fin de partie ; lines : classements déjà calculés (voir profiles.Leaderboard.lines)."""
     overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
     overlay.fill((0, 0, 0, 220))
     surface.blit(overlay, (0, 0))
@@ -441,4 +462,37 @@ def draw_end_screen(surface, win=True):
     title = FONT_LG.render(text, True, color)
     press = FONT_MD.render("Entrée pour rejouer", True, WHITE)
     surface.blit(title, title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 16)))
-    surface.blit(press, press.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 26)))
\ No newline at end of file
+    surface.blit(press, press.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 26)))
+    for i, line in enumerate(lines):
+        txt = FONT_SM.render(line, True, WHITE)
+        surface.blit(txt, txt.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 64 + i * 22)))
+
+
+def draw_race_panel(surface, lines):
+    """Course (race.py) : état de l'adversaire, délai d'entrée, résultat, en haut à droite."""
+    if not lines:
+        return
+    width = max(FONT_SM.size(line)[0] for line in lines) + 16
+    panel = pygame.Surface((width, len(lines) * 18 + 10), pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 170))
+    rect = panel.get_rect(topright=(WIDTH - 8, 8))
+    surface.blit(panel, rect)
+    for i, line in enumerate(lines):
+        color = YELLOW if i == len(lines) - 1 and i >= 2 else WHITE
+        surface.blit(FONT_SM.render(line, True, color), (rect.left + 8, rect.top + 5 + i * 18))
+
+
+def draw_timeline(surface, rect: pygame.Rect, index: int, total: int, label: str = ""):
+    """Frise de rejeu : barre de progression, curseur sur l'action courante, libellé."""
+    pygame.draw.rect(surface, (32, 34, 44), rect)
+    bar = rect.inflate(-32, -24)
+    pygame.draw.rect(surface, GRAY, bar, border_radius=4)
+    if total > 0:
+        done = bar.copy()
+        done.width = round(bar.width * index / total)
+        pygame.draw.rect(surface, BLUE, done, border_radius=4)
+        x = bar.left + done.width
+        pygame.draw.line(surface, WHITE, (x, rect.top + 6), (x, rect.bottom - 6), 3)
+    if label:
+        txt = FONT_SM.render(label, True, WHITE)
+        surface.blit(txt, txt.get_rect(midright=(rect.right - 24, rect.top + 10)))
@@ -0,0 +1,144 @@
+# watchdog.py
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+"""
+Chien de garde des frames lentes (diagnostic, désactivé par défaut).
+
+- Un thread secondaire échantillonne la pile du thread principal
+  (sys._current_frames) à basse fréquence, uniquement pendant une frame.
+- Si une frame de Game.run dépasse le budget (ex : 2 × l'intervalle FPS),
+  les piles échantillonnées pendant CETTE frame sont écrites dans un fichier
+  au format "collapsed stack" (une ligne "f1;f2;f3 N" par pile), lisible
+  directement par flamegraph.pl ou speedscope.
+"""
+
+
+def collapse_stack(frame) -> str:
+    """Transforme une pile Python en ligne 'fichier:fonction;...' (racine à gauche)."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+class FrameWatchdog(threading.Thread):
+    """Échantillonne la pile du thread principal et vide les frames trop longues."""
+
+    def __init__(
+        self,
+        budget_s: float,
+        sample_interval_s: float = 0.005,
+        out_dir: str = "slow_frames",
+        max_dumps: int = 50,
+    ):
+        super().__init__(name="frame-watchdog", daemon=True)
+        self.budget_s = budget_s
+        self.sample_interval_s = sample_interval_s
+        self.out_dir = out_dir
+        self.max_dumps = max_dumps
+
+        # Le watchdog est créé depuis le thread qui fait tourner Game.run
+        self._target_ident = threading.get_ident()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        # Échantillons de la frame en cours (None = hors frame, on n'échantillonne pas)
+        self._samples: Counter[str] = Counter()
+        self._frame_start: float | None = None
+
+        # Statistiques
+        self.frame_index = 0
+        self.slow_frames = 0
+        self.dumps_written = 0
+        self.worst_frame_s = 0.0
+
+    # ----------------------------
+    # Côté thread principal
+    # ----------------------------
+
+    def frame_start(self) -> None:
+        """À appeler au début de chaque frame."""
+        with self._lock:
+            self._samples = Counter()
+            self._frame_start = time.perf_counter()
+        self.frame_index += 1
+
+    def frame_end(self) -> float:
+        """
+        À appeler à la fin du travail de la frame (avant clock.tick).
+        Retourne la durée de la frame en secondes.
+        """
+        with self._lock:
+            start = self._frame_start
+            samples = self._samples
+            self._frame_start = None
+
+        if start is None:
+            return 0.0
+
+        duration = time.perf_counter() - start
+        self.worst_frame_s = max(self.worst_frame_s, duration)
+
+        if duration > self.budget_s:
+            self.slow_frames += 1
+            if self.dumps_written < self.max_dumps:
+                self._dump(samples, duration)
+
+        return duration
+
+    def stop(self) -> None:
+        """Arrête le thread d'échantillonnage."""
+        self._stop_event.set()
+
+    # ----------------------------
+    # Côté thread d'échantillonnage
+    # ----------------------------
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.sample_interval_s):
+            frame = sys._current_frames().get(self._target_ident)
+            if frame is None:
+                # Le thread principal n'existe plus
+                return
+
+            stack = collapse_stack(frame)
+            del frame
+
+            with self._lock:
+                if self._frame_start is not None:
+                    self._samples[stack] += 1
+
+    # ----------------------------
+    # Écriture des flamegraphs
+    # ----------------------------
+
+    def _dump(self, samples: Counter, duration: float) -> str | None:
+        """Écrit les piles de la frame lente au format collapsed stack."""
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            ms = int(duration * 1000)
+            path = os.path.join(self.out_dir, f"frame_{self.frame_index:06d}_{ms}ms.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print("Erreur écriture flamegraph:", e)
+            return None
+
+        self.dumps_written += 1
+        return path
+
+    def report(self) -> str:
+        """Petit résumé texte des frames observées."""
+        return (
+            f"Frames: {self.frame_index} | lentes (> {self.budget_s * 1000:.1f} ms): "
+            f"{self.slow_frames} | pire: {self.worst_frame_s * 1000:.1f} ms | "
+            f"flamegraphs écrits: {self.dumps_written}"
+        )
@@ -0,0 +1,222 @@
+# zobrist.py
+import zlib
+from collections import OrderedDict
+
+"""
+Hachage de Zobrist (64 bits) de l'état d'une partie + table de transposition.
+
+Chaque élément d'état a une clé aléatoire fixe ; le hash d'un état est le
+XOR des clés de ses éléments. Une modification ne coûte donc qu'un ou deux
+XOR, faits là où elle a lieu :
+- Manor.zobrist      : salles posées (modèle par case) et portes (niveau, ouverte),
+                       mis à jour par set_room / put_door / drop_door / open_door ;
+- Inventory          : objets permanents (XOR) et consommables (somme, car un
+                       même objet peut être présent plusieurs fois),
+                       mis à jour par add_item / use_item / set_items ;
+- GameEngine         : pioche restante et salles fouillées / creusées
+                       (set_stock, mark_cell, unmark_cell).
+Les éléments de taille fixe (position, 5 ressources, phase, cartes proposées)
+sont mêlés au moment de GameEngine.state_hash() : O(1) aussi.
+Ne sont pas hachés : le générateur aléatoire, les offres mémorisées, les
+messages et les drapeaux visited (toute salle posée est aussitôt visitée).
+
+Les clés sont dérivées d'une graine fixe (splitmix64) : même hash pour le
+même état d'un processus à l'autre (tables partagées, sauvegardes).
+
+Vérification (hash incrémental == hash recalculé) : python zobrist.py
+"""
+
+MASK64 = (1 << 64) - 1
+ZOBRIST_SEED = 0x5EED_B1E_9121CE
+
+# Familles de clés
+K_CELL, K_DOOR, K_PLAYER, K_RES, K_PERM, K_ITEM, K_STOCK, K_PHASE, K_PICK, K_MARK = range(1, 11)
+
+# Ressources de l'inventaire (ordre des clés K_RES)
+RESOURCES = ("steps", "gold", "gems", "keys", "dice")
+
+
+def _splitmix64(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+_KEYS: dict[tuple, int] = {}
+
+
+def zkey(*parts) -> int:
+    """Clé 64 bits déterministe pour un élément d'état (entiers / chaînes)."""
+    key = _KEYS.get(parts)
+    if key is None:
+        key = ZOBRIST_SEED
+        for part in parts:
+            if isinstance(part, str):
+                part = zlib.crc32(part.encode())
+            key = _splitmix64(key ^ (part & MASK64))
+        _KEYS[parts] = key
+    return key
+
+
+def cell_key(r: int, c: int, room) -> int:
+    return zkey(K_CELL, r, c, room.name)
+
+
+_CANONICAL = {"S": None, "E": None, "N": ("S", -1, 0), "W": ("E", 0, -1)}
+
+
+def door_key(key: tuple[int, int, str], level: int, is_open: bool) -> int:
+    """Clé d'une porte, identique pour ses deux sens (r, c, "N") == (r-1, c, "S")."""
+    r, c, dir_ = key
+    flip = _CANONICAL[dir_]
+    if flip is not None:
+        dir_, dr, dc = flip
+        r, c = r + dr, c + dc
+    return zkey(K_DOOR, r, c, dir_, level, int(is_open))
+
+
+def item_key(item) -> int:
+    return zkey(K_ITEM, item.name, getattr(item, "steps_restored", 0))
+
+
+def perm_key(cls) -> int:
+    return zkey(K_PERM, cls.__name__)
+
+
+def stock_key(name: str, count: int) -> int:
+    return zkey(K_STOCK, name, count)
+
+
+def compute_hash(engine) -> int:
+    """Hash recalculé entièrement (référence pour vérifier le hash incrémental)."""
+    from history import SEARCHED, DUG
+    manor, inv = engine.manor, engine.player.inventory
+    h = 0
+    for r, row in enumerate(manor.grid):
+        for c, room in enumerate(row):
+            if room is not None:
+                h ^= cell_key(r, c, room)
+    for key, door in manor.doors.items():
+        if key[2] in ("S", "E"):
+            h ^= door_key(key, door.lock_level.value, door.is_open)
+    for name, count in engine.room_stock.items():
+        h ^= stock_key(name, count)
+    for kind, cells in ((SEARCHED, engine.searched_rooms), (DUG, engine.dug_rooms)):
+        for r, c in cells:
+            h ^= zkey(K_MARK, kind, r, c)
+    for cls in inv.permanent_items:
+        h ^= perm_key(cls)
+    h ^= sum(item_key(item) for item in inv.items) & MASK64
+    return h ^ engine._scalar_hash()
+
+
+class TranspositionTable:
+    """
+    Résultats déjà calculés, indexés par hash d'état, bornés (LRU).
+    Partagée entre forks : solveurs, mémo de is_player_blocked, doublons
+    d'états en Monte-Carlo.
+    """
+
+    def __init__(self, max_entries: int = 1 << 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._entries
+
+    def get(self, key: int, default=None):
+        value = self._entries.get(key, default)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def put(self, key: int, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# ---------- Vérification ----------
+
+def hashed_digest(engine) -> tuple:
+    """Résumé exact des seuls éléments hachés (pour compter les vraies collisions)."""
+    manor, inv = engine.manor, engine.player.inventory
+    return (
+        tuple(room.name if room is not None else None for row in manor.grid for room in row),
+        tuple(sorted((key, door.lock_level.value, door.is_open) for key, door in manor.doors.items())),
+        (inv.steps, inv.gold, inv.gems, inv.keys, inv.dice),
+        tuple(sorted(item_key(item) for item in inv.items)),
+        tuple(sorted(cls.__name__ for cls in inv.permanent_items)),
+        (engine.player.r, engine.player.c), engine.state,
+        engine._pending_dest if engine.state == "PICK" else None,
+        tuple((room.name, room.gem_cost) for room in engine.pick_rooms) if engine.state == "PICK" else (),
+        tuple(sorted(engine.room_stock.items())),
+        tuple(sorted(engine.searched_rooms)), tuple(sorted(engine.dug_rooms)),
+    )
+
+
+def main(argv=None) -> int:
+    import argparse
+    from engine import GameEngine
+    from bots import RandomPolicy
+
+    parser = argparse.ArgumentParser(description="Vérification du hash de Zobrist incrémental.")
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    seen: dict[int, tuple] = {}
+    collisions = 0
+    for seed in range(args.games):
+        engine = GameEngine.new_game(seed)
+        engine.enable_history()
+        policy = RandomPolicy(seed)
+        ok = True
+        steps = 0
+        while engine.state != "END" and steps < 2000:
+            engine.apply_action(policy.choose(engine))
+            steps += 1
+            if steps % 25 == 0:
+                # Passe par un fork et par undo / redo : le hash doit suivre
+                engine = engine.fork(engine.random)
+                engine.enable_history()
+            if steps % 7 == 0 and engine.undo():
+                engine.redo()
+
+            h = engine.state_hash()
+            if h != compute_hash(engine):
+                ok = False
+                break
+            digest = hashed_digest(engine)
+            if seen.setdefault(h, digest) != digest:
+                collisions += 1
+        if not ok:
+            failures += 1
+            print(f"graine {seed} : hash incrémental faux après {steps} actions")
+
+    print(f"Hash incrémental : {args.games - failures}/{args.games} parties correctes, "
+          f"{len(seen)} états distincts, {collisions} collisions")
+    return 1 if failures or collisions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())